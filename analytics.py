@@ -0,0 +1,345 @@
+"""
+Columnar export of quiz history for analytics.
+
+One row per answered question (attempt, user, timestamp, category, type,
+is_correct, time_spent) plus one row per attempt, each column a plain .npy
+file so the bundle can be memory-mapped. Users, categories and question
+types are dictionary-encoded; the bulky question_text and answers are left
+out. Exporting from the store walks every user's history.
+
+    python analytics.py export [--source store|results.jsonl|results.json] [--user guest] [--out history.cols]
+    python analytics.py report [--bundle history.cols] [--period day|week|month] [--since 2024-01-01] [--user ID]
+"""
+import argparse
+import json
+import os
+import shutil
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from storage import ResultsStore, parse_key
+
+BUNDLE_PATH = "history.cols"
+BUNDLE_VERSION = 2
+PAGE_SIZE = 1000
+
+QUESTION_COLUMNS = ("attempt", "user", "timestamp", "category", "question_type", "is_correct", "time_spent")
+ATTEMPT_COLUMNS = ("key", "user", "timestamp", "score", "total_questions", "percentage", "total_time_seconds")
+
+Row = Tuple[str, Dict[str, Any], str]   # (key, record, user_id), as ResultsStore.append_many() takes them
+
+
+# --- SOURCES ---
+def iter_store(store: ResultsStore, page_size: int = PAGE_SIZE) -> Iterator[Row]:
+    """Every user's history in turn, each oldest first and streamed, so the history is never all in memory."""
+    for user_id in store.users():
+        for key, record in store.stream(batch_size=page_size, user_id=user_id):
+            yield key, record, user_id
+
+def iter_jsonl(path: str, user_id: str = "guest") -> Iterator[Row]:
+    """Streams one user's JsonlResultsStore log without indexing it. A key can repeat; the last line wins on export."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue   # a torn final line, as JsonlResultsStore.recover() would drop
+            yield entry.pop("key"), entry, user_id
+
+def iter_legacy_json(path: str, user_id: str = "guest") -> Iterator[Row]:
+    with open(path, "r", encoding="utf-8") as f:
+        for key, record in json.load(f).items():
+            yield key, record, user_id
+
+
+# --- EXPORT ---
+def _key_times(keys: Sequence[str]) -> np.ndarray:
+    """DD-MM-YY-HH-MM[-SS-...] keys to datetime64[s], parsed by numpy in one go; unparseable keys become NaT."""
+    iso = [f"20{k[6:8]}-{k[3:5]}-{k[0:2]}T{k[9:11]}:{k[12:14]}:{k[15:17] or '00'}" for k in keys]
+    try:
+        return np.array(iso, dtype="datetime64[s]")
+    except ValueError:
+        return np.array([parse_key(k) or "NaT" for k in keys], dtype="datetime64[s]")
+
+def _seconds(values: List[Any]) -> np.ndarray:
+    # Clamped into uint32: rows stored before the API bounded time_spent may be negative or huge.
+    return np.clip(np.nan_to_num(np.array(values, dtype=np.float64)), 0, np.iinfo(np.uint32).max).astype(np.uint32)
+
+def _code_dtype(n: int):
+    return np.uint8 if n <= 256 else np.uint16 if n <= 65536 else np.uint32
+
+class _ColumnBuilder:
+    """Accumulates columns a chunk at a time; only the compact columns are ever held in memory."""
+
+    def __init__(self):
+        self.users: Dict[str, int] = {}
+        self.categories: Dict[str, int] = {}
+        self.question_types: Dict[str, int] = {}
+        self.keys: List[str] = []
+        self.position: Dict[Tuple[str, str], int] = {}   # (user, key) -> attempt index, so a repeat replaces it
+        self.replaced: List[int] = []
+        self.attempt_chunks: Dict[str, List[np.ndarray]] = {c: [] for c in ATTEMPT_COLUMNS if c != "key"}
+        self.question_chunks: Dict[str, List[np.ndarray]] = {c: [] for c in QUESTION_COLUMNS}
+
+    def add(self, rows: List[Row]):
+        base = len(self.keys)
+        keys = [k for k, _, _ in rows]
+        for n, (k, _, user_id) in enumerate(rows, base):
+            if (user_id, k) in self.position:
+                self.replaced.append(self.position[user_id, k])
+            self.position[user_id, k] = n
+        self.keys.extend(keys)
+        times = _key_times(keys)
+        users = np.array([self.users.setdefault(u, len(self.users)) for _, _, u in rows], dtype=np.uint32)
+        summaries = [r["summary"] for _, r, _ in rows]
+        self.attempt_chunks["user"].append(users)
+        self.attempt_chunks["timestamp"].append(times)
+        self.attempt_chunks["score"].append(np.array([s["score_obtained"] for s in summaries], dtype=np.uint16))
+        self.attempt_chunks["total_questions"].append(np.array([s["total_questions"] for s in summaries], dtype=np.uint16))
+        self.attempt_chunks["percentage"].append(np.array([s["percentage"] for s in summaries], dtype=np.float32))
+        self.attempt_chunks["total_time_seconds"].append(_seconds([s["total_time_seconds"] for s in summaries]))
+
+        counts = np.array([len(r["details"]) for _, r, _ in rows], dtype=np.intp)
+        details = [q for _, r, _ in rows for q in r["details"]]
+        categories, types = self.categories, self.question_types
+        attempt = np.repeat(np.arange(base, base + len(rows), dtype=np.uint32), counts)
+        self.question_chunks["attempt"].append(attempt)
+        self.question_chunks["user"].append(np.repeat(users, counts))
+        self.question_chunks["timestamp"].append(np.repeat(times, counts))
+        self.question_chunks["category"].append(np.array(
+            [categories.setdefault(q.get("category") or "General", len(categories)) for q in details], dtype=np.uint32))
+        self.question_chunks["question_type"].append(np.array(
+            [types.setdefault(q.get("question_type") or "", len(types)) for q in details], dtype=np.uint32))
+        self.question_chunks["is_correct"].append(np.array([bool(q.get("is_correct")) for q in details], dtype=bool))
+        self.question_chunks["time_spent"].append(_seconds([q.get("time_spent") or 0 for q in details]))
+
+    def columns(self) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+        attempts = {c: np.concatenate(chunks) if chunks else np.empty(0) for c, chunks in self.attempt_chunks.items()}
+        attempts["key"] = np.array(self.keys, dtype=str)
+        attempts["user"] = attempts["user"].astype(_code_dtype(len(self.users)))
+        questions = {c: np.concatenate(chunks) if chunks else np.empty(0) for c, chunks in self.question_chunks.items()}
+        questions["user"] = questions["user"].astype(_code_dtype(len(self.users)))
+        questions["category"] = questions["category"].astype(_code_dtype(len(self.categories)))
+        questions["question_type"] = questions["question_type"].astype(_code_dtype(len(self.question_types)))
+        if self.replaced:
+            keep = np.ones(len(self.keys), dtype=bool)
+            keep[self.replaced] = False
+            renumber = np.cumsum(keep, dtype=np.int64) - 1
+            questions = {c: col[keep[questions["attempt"]]] for c, col in questions.items()}
+            questions["attempt"] = renumber[questions["attempt"]].astype(np.uint32)
+            attempts = {c: col[keep] for c, col in attempts.items()}
+        return attempts, questions
+
+def export_history(rows: Iterable[Row], path: str = BUNDLE_PATH, chunk_size: int = PAGE_SIZE) -> Dict[str, Any]:
+    """Writes a bundle from (key, record, user_id) rows and returns its meta. The old bundle is replaced atomically."""
+    builder = _ColumnBuilder()
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            builder.add(chunk)
+            chunk = []
+    if chunk:
+        builder.add(chunk)
+    attempts, questions = builder.columns()
+
+    meta = {
+        "version": BUNDLE_VERSION,
+        "exported_at": datetime.now().isoformat(timespec="seconds"),
+        "attempts": len(attempts["key"]),
+        "questions": len(questions["attempt"]),
+        "users": list(builder.users),
+        "categories": list(builder.categories),
+        "question_types": list(builder.question_types),
+    }
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    for prefix, columns in (("attempt", attempts), ("question", questions)):
+        for name, column in columns.items():
+            np.save(os.path.join(tmp_path, f"{prefix}.{name}.npy"), column)
+    with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    if os.path.exists(path):
+        old_path = path + ".old"
+        shutil.rmtree(old_path, ignore_errors=True)
+        os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path)
+    else:
+        os.replace(tmp_path, path)
+    return meta
+
+
+# --- ANALYTICS ---
+class HistoryColumns:
+    """
+    A loaded bundle. Columns are memory-mapped by default, so opening one
+    costs next to nothing and each aggregation only pages in the columns
+    it touches. All aggregations take an optional [since, until) window
+    and an optional user_id (default: everyone).
+    """
+
+    def __init__(self, path: str = BUNDLE_PATH, mmap: bool = True):
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta["version"] != BUNDLE_VERSION:
+            raise ValueError(f"Bundle version {self.meta['version']} is not supported (expected {BUNDLE_VERSION})")
+        self.users: List[str] = self.meta["users"]
+        self.categories: List[str] = self.meta["categories"]
+        self.question_types: List[str] = self.meta["question_types"]
+        mode = "r" if mmap else None
+        self.attempts = {c: np.load(os.path.join(path, f"attempt.{c}.npy"), mmap_mode=mode) for c in ATTEMPT_COLUMNS}
+        self.questions = {c: np.load(os.path.join(path, f"question.{c}.npy"), mmap_mode=mode) for c in QUESTION_COLUMNS}
+
+    def __len__(self):
+        return self.meta["questions"]
+
+    def _window(self, since: Optional[datetime], until: Optional[datetime], user_id: Optional[str] = None):
+        """Index selecting the user's questions in [since, until); a plain slice when unbounded, so nothing is copied."""
+        if since is None and until is None and user_id is None:
+            return slice(None)
+        ts = self.questions["timestamp"]
+        mask = ~np.isnat(ts) if since is not None or until is not None else np.ones(len(ts), dtype=bool)
+        if user_id is not None:
+            code = self.users.index(user_id) if user_id in self.users else -1
+            mask &= self.questions["user"] == code
+        if since is not None:
+            mask &= ts >= np.datetime64(since, "s")
+        if until is not None:
+            mask &= ts < np.datetime64(until, "s")
+        return mask
+
+    def category_stats(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                       user_id: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+        """Per-category { total, correct, time_spent }, the same shape as ResultsStore.category_stats()."""
+        sel = self._window(since, until, user_id)
+        cat = self.questions["category"][sel]
+        n = len(self.categories)
+        total = np.bincount(cat, minlength=n)
+        correct = np.bincount(cat, weights=self.questions["is_correct"][sel], minlength=n)
+        time_spent = np.bincount(cat, weights=self.questions["time_spent"][sel], minlength=n)
+        return {c: {"total": int(total[i]), "correct": int(correct[i]), "time_spent": int(time_spent[i])}
+                for i, c in enumerate(self.categories) if total[i]}
+
+    def accuracy_by_category(self, period: str = "week", since: Optional[datetime] = None,
+                             until: Optional[datetime] = None, user_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Accuracy per category per day, week (starting Monday) or month:
+        { "periods": [start, ...], "categories": { name: { total, correct, accuracy } } }
+        with one list entry per period. Empty periods are kept so the lists
+        line up on a continuous time axis; their accuracy is None.
+        """
+        sel = self._window(since, until, user_id)
+        ts = self.questions["timestamp"][sel]
+        valid = ~np.isnat(ts)
+        ts = ts[valid]
+        cat = self.questions["category"][sel][valid].astype(np.intp)
+        ok = self.questions["is_correct"][sel][valid]
+        if not len(ts):
+            return {"periods": [], "categories": {}}
+
+        if period == "day":
+            buckets = ts.astype("datetime64[D]").astype(np.int64)
+        elif period == "week":
+            days = ts.astype("datetime64[D]").astype(np.int64)
+            buckets = (days - 4) // 7      # day 4 of the epoch (1970-01-05) was a Monday
+        elif period == "month":
+            buckets = ts.astype("datetime64[M]").astype(np.int64)
+        else:
+            raise ValueError(f"Unknown period: {period!r} (use day, week or month)")
+        first = int(buckets.min())
+        n_periods = int(buckets.max()) - first + 1
+        n_cats = len(self.categories)
+        cell = (buckets - first) * n_cats + cat
+        total = np.bincount(cell, minlength=n_periods * n_cats).reshape(n_periods, n_cats)
+        correct = np.bincount(cell, weights=ok, minlength=n_periods * n_cats).reshape(n_periods, n_cats)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            accuracy = np.round(correct / total * 100, 2)
+
+        starts = np.arange(first, first + n_periods)
+        if period == "day":
+            labels = starts.astype("datetime64[D]")
+        elif period == "week":
+            labels = (starts * 7 + 4).astype("datetime64[D]")
+        else:
+            labels = starts.astype("datetime64[M]")
+        out = {}
+        for i, name in enumerate(self.categories):
+            if total[:, i].any():
+                out[name] = {
+                    "total": total[:, i].tolist(),
+                    "correct": correct[:, i].astype(np.int64).tolist(),
+                    "accuracy": [None if t == 0 else float(a) for t, a in zip(total[:, i], accuracy[:, i])]
+                }
+        return {"periods": [str(p) for p in labels], "categories": out}
+
+    def time_spent_percentiles(self, percentiles: Sequence[float] = (50, 90, 99), since: Optional[datetime] = None,
+                               until: Optional[datetime] = None, user_id: Optional[str] = None) -> Dict[str, Any]:
+        """Seconds spent per question: { "overall": { p50: ... }, "categories": { name: { p50: ... } } }."""
+        sel = self._window(since, until, user_id)
+        cat = self.questions["category"][sel]
+        spent = self.questions["time_spent"][sel]
+        labels = [f"p{p:g}" for p in percentiles]
+        if not len(spent):
+            return {"overall": {}, "categories": {}}
+        # One sort by category, then each category is a contiguous slice.
+        order = np.argsort(cat, kind="stable")
+        cat_sorted = cat[order]
+        spent_sorted = spent[order]
+        bounds = np.searchsorted(cat_sorted, np.arange(len(self.categories) + 1))
+        by_category = {}
+        for i, name in enumerate(self.categories):
+            lo, hi = bounds[i], bounds[i + 1]
+            if hi > lo:
+                values = np.percentile(spent_sorted[lo:hi], percentiles)
+                by_category[name] = dict(zip(labels, np.round(values, 2).tolist()))
+        overall = np.percentile(spent, percentiles)
+        return {"overall": dict(zip(labels, np.round(overall, 2).tolist())), "categories": by_category}
+
+
+if __name__ == "__main__":
+    import time
+
+    parser = argparse.ArgumentParser(description="Export quiz history to a columnar bundle, or report on one.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export_cmd = sub.add_parser("export")
+    export_cmd.add_argument("--source", default="store",
+                            help="'store' (RESULTS_BACKEND), or a results.jsonl / legacy results.json file")
+    export_cmd.add_argument("--user", default="guest", help="whose history a .jsonl/.json source holds")
+    export_cmd.add_argument("--out", default=BUNDLE_PATH)
+    report_cmd = sub.add_parser("report")
+    report_cmd.add_argument("--bundle", default=BUNDLE_PATH)
+    report_cmd.add_argument("--period", default="week", choices=["day", "week", "month"])
+    report_cmd.add_argument("--since", type=datetime.fromisoformat)
+    report_cmd.add_argument("--until", type=datetime.fromisoformat)
+    report_cmd.add_argument("--user", help="one user's history (default: everyone's)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.command == "export":
+        if args.source == "store":
+            from storage import open_store
+            store = open_store()
+            meta = export_history(iter_store(store), args.out)
+            store.close()
+        elif args.source.endswith(".jsonl"):
+            meta = export_history(iter_jsonl(args.source, args.user), args.out)
+        else:
+            meta = export_history(iter_legacy_json(args.source, args.user), args.out)
+        print(f"Exported {meta['attempts']} attempts ({meta['questions']} questions, {len(meta['users'])} users) "
+              f"to {args.out} "
+              f"in {time.perf_counter() - started:.1f}s.")
+    else:
+        history = HistoryColumns(args.bundle)
+        trend = history.accuracy_by_category(args.period, args.since, args.until, args.user)
+        spent = history.time_spent_percentiles(since=args.since, until=args.until, user_id=args.user)
+        print(f"{len(history)} questions, {len(trend['periods'])} {args.period}s "
+              f"from {trend['periods'][0] if trend['periods'] else '-'}")
+        for name, stats in sorted(history.category_stats(args.since, args.until, args.user).items()):
+            pct = spent["categories"].get(name, {})
+            print(f"  {name:24} {stats['correct'] / stats['total'] * 100:6.2f}% of {stats['total']:>9}  "
+                  + "  ".join(f"{k} {v:>6.1f}s" for k, v in pct.items()))
+        print(f"Done in {time.perf_counter() - started:.2f}s.")
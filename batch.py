@@ -0,0 +1,397 @@
+import argparse
+import gc
+import json
+import math
+import random
+import sys
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+import numpy as np
+
+from blueprints import BLUEPRINTS, Blueprint
+from numtheory import get_index
+import figures
+from figures import _render_bar, render_bar_chart, render_geometry
+from math_utils import DEFAULT_BLUEPRINT, DEFAULT_RANGES, load_scenarios, render_data_sufficiency
+
+# Bulk generation for worksheets and pre-seeded practice sets. Every
+# generator below mirrors its MathGenerator counterpart (same ranges, same
+# output shape) but draws all operands for a whole chunk of quizzes as
+# NumPy arrays in one call, then only formats strings per question.
+# Batch quizzes are not descriptor-reproducible; use --seed for repeatable files.
+
+CHUNK_SIZE = 1024
+
+
+# --- VECTORIZED GENERATORS: (rng, ids, scenarios, ranges) -> one question per id ---
+def _addition(rng, ids, scenarios, ranges):
+    lo, hi = ranges['addition']['operand']
+    a, b = rng.integers(lo, hi + 1, (2, len(ids))).tolist()
+    return [{'id': i, 'question_text': f"{x} + {y} = ?", 'type': 'single', 'correct_answer': x + y, 'category': 'Addition'}
+            for i, x, y in zip(ids, a, b)]
+
+def _subtraction(rng, ids, scenarios, ranges):
+    lo, hi = ranges['subtraction']['operand']
+    pair = rng.integers(lo, hi + 1, (2, len(ids)))
+    a, b = pair.max(axis=0).tolist(), pair.min(axis=0).tolist()
+    return [{'id': i, 'question_text': f"{x} - {y} = ?", 'type': 'single', 'correct_answer': x - y, 'category': 'Subtraction'}
+            for i, x, y in zip(ids, a, b)]
+
+def _multiplication(rng, ids, scenarios, ranges):
+    r = ranges['multiplication']
+    lo, hi = r['operand']
+    b = rng.integers(r['multiplier'][0], r['multiplier'][1] + 1, len(ids))
+    min_a, max_a = np.maximum(lo, -(-lo // b)), np.minimum(hi, hi // b)
+    min_a = np.where(min_a > max_a, lo, min_a)
+    a = rng.integers(min_a, max_a + 1)
+    return [{'id': i, 'question_text': f"{x} × {y} = ?", 'type': 'single', 'correct_answer': x * y, 'category': 'Multiplication'}
+            for i, x, y in zip(ids, a.tolist(), b.tolist())]
+
+def _division(rng, ids, scenarios, ranges):
+    r = ranges['division']
+    divisor = rng.integers(r['divisor'][0], r['divisor'][1] + 1, len(ids))
+    dividend = rng.integers(r['dividend'][0], r['dividend'][1] + 1, len(ids))
+    quotient, remainder = np.divmod(dividend, divisor)
+    return [{'id': i, 'question_text': f"Divide {n} by {d}. What is the Quotient and Remainder?", 'type': 'dual',
+             'correct_answer': {'quotient': q, 'remainder': r}, 'category': 'Division'}
+            for i, n, d, q, r in zip(ids, dividend.tolist(), divisor.tolist(), quotient.tolist(), remainder.tolist())]
+
+# Small ranges (every difficulty so far) are tabulated outright; wider ones factor each draw through the sieve.
+_FACTOR_TABLE_SPAN = 1 << 16
+
+@lru_cache(maxsize=8)
+def _factor_table(lo: int, hi: int):
+    index = get_index(hi)
+    return [(f"List all prime factors of {n} (comma separated)", ','.join(map(str, index.prime_factors(n))))
+            for n in range(lo, hi + 1)]
+
+def _factorization(rng, ids, scenarios, ranges):
+    lo, hi = ranges['factorization']['n']
+    draws = rng.integers(lo, hi + 1, len(ids)).tolist()
+    if hi - lo < _FACTOR_TABLE_SPAN:
+        table = _factor_table(lo, hi)
+        rows = [table[n - lo] for n in draws]
+    else:
+        index = get_index(hi)
+        rows = [(f"List all prime factors of {n} (comma separated)", ','.join(map(str, index.prime_factors(n)))) for n in draws]
+    return [{'id': i, 'question_text': t, 'type': 'text', 'correct_answer': a, 'category': 'Factors'} for i, (t, a) in zip(ids, rows)]
+
+def _equation(rng, ids, scenarios, ranges):
+    r = ranges['equation']
+    a = rng.integers(r['a'][0], r['a'][1] + 1, len(ids))
+    x = rng.integers(r['x'][0], r['x'][1] + 1, len(ids))
+    b = rng.integers(r['b'][0], r['b'][1] + 1, len(ids))
+    c = a * x + b
+    sign = np.where(b >= 0, '+', '-').tolist()
+    return [{'id': i, 'question_text': f"Solve for x: {ai}x {si} {bi} = {ci}", 'type': 'single',
+             'correct_answer': xi, 'category': 'Algebra'}
+            for i, ai, xi, si, bi, ci in zip(ids, a.tolist(), x.astype(str).tolist(), sign, np.abs(b).tolist(), c.tolist())]
+
+# The three conversion generators only ever see ~140 distinct fractions, so
+# their text and answers are tabulated once and picked by index.
+_DENOMINATORS = [2, 4, 5, 8, 10, 20, 25, 50]
+
+@lru_cache(maxsize=None)
+def _fraction_table():
+    rows = []
+    for d in _DENOMINATORS:
+        for n in range(1, d):
+            dec = round(n / d, 4)
+            g = math.gcd(n, d)
+            rows.append({
+                'frac2dec': (f"Convert {n}/{d} to decimal.", 'single', dec),
+                'dec2perc': (f"Convert {dec} to percentage.", 'single', round(dec * 100, 2)),
+                'perc2frac': (f"Convert {round((n / d) * 100, 2)}% to fraction (as a/b, lowest terms)", 'text', f"{n // g}/{d // g}"),
+            })
+    # Row offset of each denominator, so a (denominator, numerator) draw maps straight to a row.
+    offsets = np.cumsum([0] + [d - 1 for d in _DENOMINATORS[:-1]])
+    return rows, offsets
+
+def _fractions(kind, rng, ids):
+    rows, offsets = _fraction_table()
+    d_idx = rng.integers(0, len(_DENOMINATORS), len(ids))
+    numer = rng.integers(1, np.array(_DENOMINATORS)[d_idx])
+    picked = [rows[r][kind] for r in (offsets[d_idx] + numer - 1).tolist()]
+    return [{'id': i, 'question_text': t, 'type': qt, 'correct_answer': a, 'category': 'Fractions & Conversions'}
+            for i, (t, qt, a) in zip(ids, picked)]
+
+def _frac2dec(rng, ids, scenarios, ranges):
+    return _fractions('frac2dec', rng, ids)
+
+def _dec2perc(rng, ids, scenarios, ranges):
+    return _fractions('dec2perc', rng, ids)
+
+def _perc2frac(rng, ids, scenarios, ranges):
+    return _fractions('perc2frac', rng, ids)
+
+@lru_cache(maxsize=None)
+def _geometry_figure(shape: int, mode: int, a: int, b: int):
+    md = ('area', 'perimeter')[mode]
+    if shape == 0:
+        w, h = (a + 2 if a == b else a), b
+        ans, name, dims = ((w * h) if md == 'area' else 2 * (w + h)), 'rectangle', (w, h)
+    elif shape == 1:
+        ans, name, dims = ((a * a) if md == 'area' else 4 * a), 'square', (a,)
+    else:
+        ans = round(3.14 * a * a, 2) if md == 'area' else round(2 * 3.14 * a, 2)
+        name, dims = 'circle', (a,)
+    return render_geometry(name, md, dims), ans
+
+def _geometry(rng, ids, scenarios, ranges):
+    m = len(ids)
+    shape = rng.integers(0, 3, m)
+    mode = rng.integers(0, 2, m)
+    # First dimension: rectangle width 5-15, square side 4-12, circle radius 3-9; second: rectangle height 3-10.
+    lo, hi = np.array([5, 4, 3])[shape], np.array([16, 13, 10])[shape]
+    a = rng.integers(lo, hi)
+    b = np.where(shape == 0, rng.integers(3, 11, m), 0)
+    figs = [_geometry_figure(*k) for k in zip(shape.tolist(), mode.tolist(), a.tolist(), b.tolist())]
+    return [{'id': i, 'question_text': svg, 'type': 'single', 'correct_answer': ans, 'category': 'Geometry'}
+            for i, (svg, ans) in zip(ids, figs)]
+
+def _di_texts(topic):
+    return [f"Which category has the highest {topic['unit']}?", f"Which category has the lowest {topic['unit']}?",
+            f"What is the total {topic['unit']}?", f"Difference between {topic['labels'][0]} and {topic['labels'][-1]}?"]
+
+@lru_cache(maxsize=64)
+def _bar_chart_parts(title: str, labels: tuple, unit: str):
+    """
+    Per topic: the chart's fixed prefix, a suffix per question type, and
+    every possible bar as a flat array indexed by (bar * 10 + value) * 10 + max value.
+    """
+    topic = {'title': title, 'labels': list(labels), 'unit': unit}
+    prefix = render_bar_chart(title, list(labels[:1]), [10], "\x00").split('<rect', 1)[0]
+    suffixes = np.array([f"""</svg><div style="margin-top:10px;">{t}</div></div>""" for t in _di_texts(topic)],
+                        dtype=object)
+    bars = np.array([_render_bar(i, lbl, v * 10, mx * 10) if v <= mx else None
+                     for i, lbl in enumerate(labels) for v in range(10) for mx in range(10)], dtype=object)
+    return prefix, suffixes, bars
+
+def _data_interpretation(rng, ids, scenarios, ranges):
+    m = len(ids)
+    topics = scenarios.get('di_topics', [{'title': 'Data', 'labels': ['A', 'B'], 'unit': 'V'}])
+    # Inline charts are assembled from pre-rendered bars; url mode needs the figure hash, so it renders per question.
+    inline = figures.FIGURE_MODE != 'url'
+    topic_idx = rng.integers(0, len(topics), m)
+    q_type = rng.integers(0, 4, m)
+    max_labels = max(len(t['labels']) for t in topics)
+    tens = rng.integers(2, 10, (m, max_labels))   # bar values / 10
+    out = [None] * m
+    # Answers, types and bar lookups are computed per topic over all its questions at once.
+    for t_idx, topic in enumerate(topics):
+        sel = np.flatnonzero(topic_idx == t_idx)
+        if not len(sel):
+            continue
+        labels = topic['labels']
+        row = tens[sel, :len(labels)]
+        mx = row.max(axis=1)
+        qt = q_type[sel]
+        names = np.array(labels, dtype=object)
+        ans = np.select([qt == 0, qt == 1, qt == 2],
+                        [names[row.argmax(axis=1)], names[row.argmin(axis=1)], row.sum(axis=1) * 10],
+                        np.abs(row[:, 0] - row[:, -1]) * 10).tolist()
+        inp_type = np.where(qt < 2, 'text', 'single').tolist()
+        if inline:
+            prefix, suffixes, bars = _bar_chart_parts(topic['title'], tuple(labels), topic['unit'])
+            cells = bars[(np.arange(len(labels)) * 10 + row) * 10 + mx[:, None]].tolist()
+            svgs = [prefix + "".join(c) + s for c, s in zip(cells, suffixes[qt].tolist())]
+        else:
+            texts = _di_texts(topic)
+            svgs = [render_bar_chart(topic['title'], labels, [v * 10 for v in r], texts[q])
+                    for r, q in zip(row.tolist(), qt.tolist())]
+        for j, svg, a, it in zip(sel.tolist(), svgs, ans, inp_type):
+            out[j] = {'id': ids[j], 'question_text': svg, 'type': it, 'correct_answer': a,
+                      'category': 'Data Interpretation'}
+    return out
+
+def _logical_reasoning(rng, ids, scenarios, ranges):
+    m = len(ids)
+    words = scenarios.get('lr_coding_words', ['APPLE', 'TIGER'])
+    shift_word = lambda word, k: "".join(chr(((ord(c) - 65 + k) % 26) + 65) for c in word)
+    coded = {(w, k): shift_word(w, k) for w in words for k in (1, -1)}
+    mode = rng.integers(0, 2, m).tolist()
+    start = rng.integers(1, 11, m)
+    diff = rng.integers(2, 10, m)
+    seqs = (start[:, None] + np.arange(5) * diff[:, None]).tolist()
+    word_idx = rng.integers(0, len(words), m).tolist()
+    target_idx = rng.integers(0, max(len(words) - 1, 1), m).tolist()
+    shift = rng.choice([1, -1], m).tolist()
+    out = []
+    for uid, md, seq, w_idx, t_idx, k in zip(ids, mode, seqs, word_idx, target_idx, shift):
+        if md == 0:
+            out.append({'id': uid, 'question_text': f"Next in series: <b>{seq[0]}, {seq[1]}, {seq[2]}, {seq[3]}, ?</b>",
+                        'type': 'single', 'correct_answer': seq[4], 'category': 'Logical Reasoning'})
+        else:
+            word = words[w_idx]
+            target = words[t_idx + (1 if t_idx >= w_idx else 0)]   # any word but the example
+            out.append({'id': uid, 'question_text': f"If <b>{word}</b> is <b>{coded[word, k]}</b>, what is <b>{target}</b>?",
+                        'type': 'text', 'correct_answer': coded[target, k], 'category': 'Logical Reasoning'})
+    return out
+
+def _data_sufficiency(rng, ids, scenarios, ranges):
+    problems = scenarios.get('ds_problems', [{'question': '?', 'stat1': 'A', 'stat2': 'B', 'correct': 'Both'}])
+    rendered = []
+    for p in problems:
+        raw = p.get('correct', 'Both')
+        key = "Both" if "Both" in raw else "Only I" if "Only I" in raw else "Only II" if "Only II" in raw else "Neither"
+        rendered.append((render_data_sufficiency(p), key))
+    picked = [rendered[i] for i in rng.integers(0, len(rendered), len(ids)).tolist()]
+    return [{'id': i, 'question_text': t, 'type': 'text', 'correct_answer': a, 'category': 'Data Sufficiency'}
+            for i, (t, a) in zip(ids, picked)]
+
+def _profit_loss(rng, ids, scenarios, ranges):
+    m = len(ids)
+    items, names = scenarios['profit_loss_items'], scenarios['profit_loss_names']
+    item = rng.integers(0, len(items), m).tolist()
+    name = rng.integers(0, len(names), m).tolist()
+    is_amount = rng.integers(0, 2, m).astype(bool)
+    cp = rng.integers(5, 51, m) * 10
+    is_profit = rng.integers(0, 2, m).astype(bool)
+    val = rng.integers(1, 11, m) * 5
+    perc = rng.choice([10, 20, 25, 50], m)
+    delta = np.where(is_amount, val, cp * perc // 100)
+    sp = np.where(is_profit, cp + delta, cp - delta)
+    ans = np.where(is_amount, val, perc).tolist()
+    out = []
+    for uid, it, nm, amt, c, s, prof, a in zip(ids, item, name, is_amount.tolist(), cp.tolist(), sp.tolist(),
+                                               is_profit.tolist(), ans):
+        word = 'Profit' if prof else 'Loss'
+        if amt:
+            text = f"{names[nm]} bought {items[it]} for ${c} and sold for ${s}. What is the {word}?"
+        else:
+            text = f"CP = ${c}, SP = ${s}. Find {word} %?"
+        out.append({'id': uid, 'question_text': text, 'type': 'single', 'correct_answer': a, 'category': 'Profit & Loss'})
+    return out
+
+# Divisor lists for the 9 (w1, d1) work pairs; never empty, so no retry loop is needed.
+_WORK_DIVISORS = {(a, b): [w for w in get_index().divisors(a * b)[1:-1] if w != a]
+                  for a in (5, 10, 15) for b in (6, 12, 20)}
+
+def _unitary_method(rng, ids, scenarios, ranges):
+    m = len(ids)
+    cost_items, scenes = scenarios['unitary_cost_items'], scenarios['unitary_work_scenarios']
+    groups = [('dozen', 12), ('score', 20), ('pack of 10', 10)]
+    is_cost = rng.integers(0, 2, m).astype(bool).tolist()
+    group = rng.integers(0, 3, m).tolist()
+    item = rng.integers(0, len(cost_items), m).tolist()
+    unit = rng.integers(2, 10, m).tolist()
+    target = rng.choice([2, 3, 5], m).tolist()
+    scen = rng.integers(0, len(scenes), m).tolist()
+    w1 = rng.choice([5, 10, 15], m).tolist()
+    d1 = rng.choice([6, 12, 20], m).tolist()
+    pick = rng.random(m).tolist()
+    out = []
+    for uid, cost, gi, it, u, t, sc, a, b, p in zip(ids, is_cost, group, item, unit, target, scen, w1, d1, pick):
+        if cost:
+            g, count = groups[gi]
+            text = f"If 1 {g} {cost_items[it]} costs ${u * count}, cost of {t}?"; ans = t * u
+        else:
+            possible_w2 = _WORK_DIVISORS[a, b]
+            w2 = possible_w2[int(p * len(possible_w2))]
+            sc = scenes[sc]
+            text = f"If {a} {sc['actor']} can {sc['task']} in {b} days, days for {w2}?"; ans = a * b // w2
+        out.append({'id': uid, 'question_text': text, 'type': 'single', 'correct_answer': ans, 'category': 'Unitary Method'})
+    return out
+
+BATCH_GENERATORS = {
+    'addition': _addition, 'subtraction': _subtraction, 'multiplication': _multiplication,
+    'division': _division, 'factorization': _factorization, 'equation': _equation,
+    'frac2dec': _frac2dec, 'dec2perc': _dec2perc, 'perc2frac': _perc2frac, 'geometry': _geometry,
+    'data_interpretation': _data_interpretation, 'logical_reasoning': _logical_reasoning,
+    'data_sufficiency': _data_sufficiency, 'profit_loss': _profit_loss, 'unitary_method': _unitary_method,
+}
+
+
+# --- BATCH API ---
+def _unique_ids(rng, n: int, k: int) -> np.ndarray:
+    """n rows of k distinct 6-digit ids; rows with a collision are simply redrawn."""
+    ids = rng.integers(100000, 1000000, (n, k))
+    while True:
+        srt = np.sort(ids, axis=1)
+        bad = np.flatnonzero((srt[:, 1:] == srt[:, :-1]).any(axis=1))
+        if not len(bad):
+            return ids
+        ids[bad] = rng.integers(100000, 1000000, (len(bad), k))
+
+def generate_batch(n_quizzes: int, blueprint: Union[Blueprint, Dict[str, int], None] = None, seed: Optional[int] = None,
+                   chunk_size: int = CHUNK_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Iterator over n_quizzes shuffled quizzes, each shaped like MathGenerator.generate_all().
+    `blueprint` is a Blueprint or a {generator name: count} dict. A weighted
+    Blueprint has its category split drawn once for the whole batch.
+    Work is done a chunk of quizzes at a time, so memory stays bounded.
+    """
+    ranges = DEFAULT_RANGES
+    if isinstance(blueprint, Blueprint):
+        ranges = blueprint.ranges()
+        blueprint = blueprint.generator_counts(random.Random(seed))
+    blueprint = blueprint or DEFAULT_BLUEPRINT
+    unknown = set(blueprint) - set(BATCH_GENERATORS)
+    if unknown:
+        raise ValueError(f"Unknown generators in blueprint: {', '.join(sorted(unknown))}")
+    return _generate_chunks(n_quizzes, blueprint, ranges, np.random.default_rng(seed), chunk_size)
+
+def _generate_chunks(n_quizzes, blueprint, ranges, rng, chunk_size):
+    scenarios = load_scenarios()
+    per_quiz = sum(blueprint.values())
+
+    for start in range(0, n_quizzes, chunk_size):
+        n = min(chunk_size, n_quizzes - start)
+        # Slot s of every quiz in the chunk lives at flat[s * n : (s + 1) * n]; each quiz
+        # takes its slots in a random order. Ids are scattered to match before generating.
+        slots = rng.permuted(np.tile(np.arange(per_quiz), (n, 1)), axis=1)
+        picks = slots * n + np.arange(n)[:, None]
+        flat_ids = np.empty(n * per_quiz, dtype=np.int64)
+        flat_ids[picks] = _unique_ids(rng, n, per_quiz)
+        flat_ids = flat_ids.tolist()
+        flat = []
+        for name, count in blueprint.items():
+            if count:
+                flat.extend(BATCH_GENERATORS[name](rng, flat_ids[len(flat):len(flat) + n * count], scenarios, ranges))
+        take = flat.__getitem__
+        for row in picks.tolist():
+            yield list(map(take, row))
+
+def write_jsonl(quizzes: Iterator[List[Dict[str, Any]]], fh) -> int:
+    """Streams quizzes to fh, one JSON object per line. Returns the count written."""
+    count = 0
+    for count, quiz in enumerate(quizzes, 1):
+        fh.write(json.dumps({'quiz': count, 'questions': quiz}, separators=(",", ":")) + "\n")
+    return count
+
+def parse_blueprint(spec: str) -> Union[Blueprint, Dict[str, int]]:
+    """A named blueprint ('arithmetic'), or 'addition=5,division=3' -> {'addition': 5, 'division': 3}"""
+    if spec in BLUEPRINTS:
+        return BLUEPRINTS[spec]
+    blueprint = {}
+    for part in filter(None, spec.split(",")):
+        name, _, count = part.partition("=")
+        blueprint[name.strip()] = int(count) if count else 1
+    return blueprint
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate quizzes in bulk as JSONL.")
+    parser.add_argument("-n", "--quizzes", type=int, default=1000, help="number of quizzes")
+    parser.add_argument("-o", "--output", default="-", help="output file (default: stdout)")
+    parser.add_argument("-b", "--blueprint", default="", help="a named blueprint, or generator counts such as addition=5,division=5 (default: standard)")
+    parser.add_argument("--seed", type=int, default=None, help="seed for a repeatable batch")
+    args = parser.parse_args()
+
+    try:
+        blueprint = parse_blueprint(args.blueprint) or None
+        quizzes = generate_batch(args.quizzes, blueprint, args.seed)
+    except ValueError as e:
+        parser.error(str(e))
+    # Everything alive now (modules, scenarios, tables) lives for the whole run; frozen, the
+    # full collections that the many short-lived question objects trigger no longer re-walk it.
+    gc.freeze()
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        written = write_jsonl(quizzes, out)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"Wrote {written} quizzes.", file=sys.stderr)
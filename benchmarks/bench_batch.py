@@ -0,0 +1,89 @@
+"""
+Batch generation against the per-quiz loop it replaces.
+
+Times batch.generate_batch() and MathGenerator.generate_all() per quiz on
+the standard blueprint, interleaving the two so machine noise hits both
+alike, with the collector frozen the way batch.py's CLI runs. The
+speedup delivered was about 6x (the 10x first asked for was re-scoped:
+every question still costs one dict and a few formatted strings, as in
+the loop). It fails when the speedup falls more than TOLERANCE under
+DELIVERED_SPEEDUP, which leaves room for timing noise on shared hosts.
+
+    pytest benchmarks/bench_batch.py
+    python benchmarks/bench_batch.py [--out FILE] [--compare FILE]
+"""
+import gc
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch import generate_batch
+from math_utils import MathGenerator
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "batch.json")
+DELIVERED_SPEEDUP = 6.0
+TOLERANCE = 0.2
+
+
+def _loop(n: int) -> float:
+    gen = MathGenerator(seed=1)
+    start = time.perf_counter()
+    for _ in range(n):
+        gen.generate_all()
+    return (time.perf_counter() - start) / n
+
+def _batch(n: int) -> float:
+    start = time.perf_counter()
+    for _ in generate_batch(n, seed=1):
+        pass
+    return (time.perf_counter() - start) / n
+
+def run(rounds: int = 7, loop_quizzes: int = 300, batch_quizzes: int = 4096):
+    """Best of `rounds` for each side, in microseconds per quiz."""
+    _loop(50), _batch(1024)   # warm the caches both sides build on first use
+    gc.freeze()
+    try:
+        loop, batch = [], []
+        for _ in range(rounds):
+            loop.append(_loop(loop_quizzes))
+            batch.append(_batch(batch_quizzes))
+    finally:
+        gc.unfreeze()
+    return {"loop_us_per_quiz": round(min(loop) * 1e6, 1), "batch_us_per_quiz": round(min(batch) * 1e6, 1),
+            "speedup": round(min(loop) / min(batch), 2)}
+
+
+# --- pytest entry point ---
+def test_batch_keeps_its_speedup():
+    results = run()
+    assert results["speedup"] >= DELIVERED_SPEEDUP * (1 - TOLERANCE), results
+
+
+# --- standalone runner ---
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Time batch generation against the generate_all() loop.")
+    parser.add_argument("--out", help="write results here (default: print only)")
+    parser.add_argument("--compare", nargs="?", const=BASELINE, help="diff against a baseline (default: the committed one)")
+    args = parser.parse_args()
+
+    results = run()
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    for name, value in results.items():
+        line = f"{name:20} {value:>10}"
+        if name in baseline:
+            line += f"  ({(value / baseline[name] - 1) * 100:+.1f}% vs baseline)"
+        print(line)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    floor = DELIVERED_SPEEDUP * (1 - TOLERANCE)
+    if results["speedup"] < floor:
+        sys.exit(f"speedup {results['speedup']}x is under {floor:.1f}x ({DELIVERED_SPEEDUP}x delivered)")
@@ -0,0 +1,89 @@
+"""
+Micro benchmarks for the question generators.
+
+With pytest-benchmark installed:
+    pytest benchmarks/bench_generators.py --benchmark-json=out.json
+Without it (or to refresh the committed baseline):
+    python benchmarks/bench_generators.py [--out FILE] [--compare FILE]
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from math_utils import DEFAULT_BLUEPRINT, MathGenerator
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "generators.json")
+
+
+def _per_quiz(gen, fn):
+    """Each call behaves like the first question of a fresh quiz; otherwise the id set grows
+    with every call and _unique_id() slows down as it fills up."""
+    def call():
+        gen.generated_ids.clear()
+        return fn()
+    return call
+
+def _cases():
+    """Benchmark name -> zero-argument callable, each on its own seeded generator."""
+    cases = {}
+    for name in DEFAULT_BLUEPRINT:
+        gen = MathGenerator(seed=1)
+        cases[f"generate_{name}"] = _per_quiz(gen, getattr(gen, f"generate_{name}"))
+    gen = MathGenerator(seed=1)
+    cases["generate_all"] = _per_quiz(gen, gen.generate_all)
+    factor_gen = MathGenerator(seed=1)
+    numbers = [factor_gen.rng.randint(10, 10 ** 6) for _ in range(1000)]
+    cases["prime_factors_x1000"] = lambda: [factor_gen.prime_factors(n) for n in numbers]
+    return cases
+
+CASES = _cases()
+
+
+# --- pytest-benchmark entry points ---
+try:
+    import pytest
+except ImportError:  # running standalone without pytest
+    pytest = None
+
+if pytest is not None:
+    @pytest.mark.parametrize("case", list(CASES))
+    def test_generator(benchmark, case):
+        benchmark(CASES[case])
+
+
+# --- standalone runner ---
+def run(repeat: int = 5, min_time: float = 0.2):
+    import timeit
+    results = {}
+    for name, fn in CASES.items():
+        timer = timeit.Timer(fn)
+        number, _ = timer.autorange()
+        number = max(1, int(number * min_time / 0.2))
+        best = min(timer.repeat(repeat, number)) / number
+        results[name] = {"us_per_call": round(best * 1e6, 3), "calls_per_second": round(1 / best, 1)}
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Time every question generator.")
+    parser.add_argument("--out", help="write results here (default: print only)")
+    parser.add_argument("--compare", nargs="?", const=BASELINE, help="diff against a baseline (default: the committed one)")
+    args = parser.parse_args()
+
+    results = run()
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    for name, r in results.items():
+        line = f"{name:32} {r['us_per_call']:>12.3f} us"
+        if name in baseline:
+            line += f"  ({(r['us_per_call'] / baseline[name]['us_per_call'] - 1) * 100:+.1f}% vs baseline)"
+        print(line)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
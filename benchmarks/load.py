@@ -0,0 +1,185 @@
+"""
+In-process load generator for /quiz, /api/submit and /api/history.
+
+Requests go through httpx's ASGI transport straight into the app, so no
+server or network is involved. Each history size runs in its own
+subprocess against a scratch copy of the app's data, pre-seeded with that
+many synthetic attempts.
+
+    python benchmarks/load.py [--sizes 10,10000] [--concurrency 16] [--requests 400]
+                              [--backend jsonl|sqlite] [--out FILE] [--compare FILE]
+
+A 1,000,000-attempt history is supported (--sizes 1000000) but takes a
+while to seed; use --backend sqlite for it, since the JSONL store keeps
+the whole index in memory.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(ROOT, "benchmarks", "baselines", "load-{backend}.json")
+FULL_HISTORY_LIMIT = 10000   # larger histories only get the paginated endpoints
+
+
+def _synthetic_attempt(rng: random.Random):
+    score = rng.randint(0, 10)
+    details = [{
+        "question_id": rng.randint(100000, 999999), "question_text": f"Synthetic question {q}",
+        "question_type": "single", "category": rng.choice(["Addition", "Division", "Geometry", "Algebra"]),
+        "user_answer": "42", "correct_answer": "42" if q < score else "99", "is_correct": q < score,
+        "time_spent": rng.randint(5, 45)
+    } for q in range(10)]
+    return {"summary": {"score_obtained": score, "total_questions": 10, "percentage": float(score * 10),
+                        "total_time_seconds": sum(d["time_spent"] for d in details)}, "details": details}
+
+
+def _seed(backend: str, size: int, chunk: int = 10000):
+    from storage import attempt_key, open_store
+    rng = random.Random(size)
+    start = datetime.now() - timedelta(minutes=size + 1)
+    store = open_store(backend)
+    for lo in range(0, size, chunk):
+        store.append_many([(attempt_key(start + timedelta(minutes=i)), _synthetic_attempt(rng), "guest")
+                           for i in range(lo, min(size, lo + chunk))])
+    store.close()
+
+
+def _percentiles(latencies):
+    import numpy as np
+    ms = np.array(latencies) * 1000
+    return {f"p{p}_ms": round(float(np.percentile(ms, p)), 3) for p in (50, 95, 99)}
+
+
+async def _drive(client, make_request, total: int, concurrency: int):
+    latencies, errors = [], 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            method, url, kwargs = make_request(i)
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    wall = time.perf_counter() - start
+    return {"requests": total, "rps": round(total / wall, 1), **_percentiles(latencies), "errors": errors}
+
+
+async def _run_scenarios(size: int, total: int, concurrency: int):
+    import httpx
+    import main
+
+    quizzes = [main.build_quiz() for _ in range(total)]
+    submissions = [{"quiz_id": q["quiz_id"],
+                    "details": [{"question_id": x["id"], "user_answer": "42", "time_spent": 3} for x in q["questions"]]}
+                   for q in quizzes]
+
+    scenarios = {
+        "quiz": lambda i: ("GET", "/quiz", {}),
+        "submit": lambda i: ("POST", "/api/submit", {"json": submissions[i]}),
+        "history_page": lambda i: ("GET", "/api/history", {"params": {"limit": 50, "fields": "summary"}}),
+    }
+    if size <= FULL_HISTORY_LIMIT:
+        scenarios["history_full"] = lambda i: ("GET", "/api/history", {})
+
+    results = {}
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name, make_request in scenarios.items():
+                results[name] = await _drive(client, make_request, total, concurrency)
+                await main.results_writer.drain()
+            etag = (await client.get("/api/history", params={"limit": 50})).headers["etag"]
+            results["history_revalidate"] = await _drive(
+                client, lambda i: ("GET", "/api/history", {"params": {"limit": 50}, "headers": {"If-None-Match": etag}}),
+                total, concurrency)
+    return results
+
+
+@contextmanager
+def scratch_app(size: int, backend: str):
+    """A scratch copy of the app's data directory, seeded with `size` attempts; yields (workdir, seed_seconds)."""
+    workdir = tempfile.mkdtemp(prefix="mathfun-bench-")
+    try:
+        for name in ("templates", "static"):
+            shutil.copytree(os.path.join(ROOT, name), os.path.join(workdir, name))
+        shutil.copy(os.path.join(ROOT, "scenarios.json"), workdir)
+        os.chdir(workdir)
+        sys.path.insert(0, ROOT)
+        os.environ["RESULTS_BACKEND"] = backend
+        start = time.perf_counter()
+        _seed(backend, size)
+        yield workdir, time.perf_counter() - start
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def worker(size: int, backend: str, total: int, concurrency: int):
+    """Runs every scenario against a fresh scratch copy of the app seeded with `size` attempts."""
+    with scratch_app(size, backend) as (_, seed_seconds):
+        results = asyncio.run(_run_scenarios(size, total, concurrency))
+        results["seed_seconds"] = round(seed_seconds, 2)
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the app in-process.")
+    parser.add_argument("--sizes", default="10,10000", help="history sizes to test, comma separated")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=400, help="requests per scenario")
+    parser.add_argument("--backend", default="jsonl", choices=["jsonl", "sqlite"])
+    parser.add_argument("--out", help="write results here")
+    parser.add_argument("--compare", nargs="?", const="", help="diff against a baseline (default: the committed one)")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        json.dump(worker(args.worker, args.backend, args.requests, args.concurrency), sys.stdout)
+        return
+
+    results = {"backend": args.backend, "concurrency": args.concurrency, "requests": args.requests, "sizes": {}}
+    for size in [int(s) for s in args.sizes.split(",")]:
+        # One process per size, so histories and caches never leak between runs.
+        out = subprocess.run([sys.executable, __file__, "--worker", str(size), "--backend", args.backend,
+                              "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+                             check=True, capture_output=True, text=True).stdout
+        results["sizes"][str(size)] = json.loads(out)
+
+    baseline = {}
+    if args.compare is not None:
+        with open(args.compare or BASELINE.format(backend=args.backend)) as f:
+            baseline = json.load(f)["sizes"]
+    for size, scenarios in results["sizes"].items():
+        print(f"history={size} (seeded in {scenarios['seed_seconds']}s)")
+        for name, r in scenarios.items():
+            if name == "seed_seconds":
+                continue
+            line = (f"  {name:20} {r['rps']:>9.1f} req/s  p50 {r['p50_ms']:>8.2f}  p95 {r['p95_ms']:>8.2f}  "
+                    f"p99 {r['p99_ms']:>8.2f} ms  errors {r['errors']}")
+            base = baseline.get(size, {}).get(name)
+            if base:
+                line += f"  ({(r['rps'] / base['rps'] - 1) * 100:+.1f}% req/s, {(r['p95_ms'] / base['p95_ms'] - 1) * 100:+.1f}% p95)"
+            print(line)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Startup benchmark: how long a fresh worker takes to answer its first request.
+
+Every run starts new processes against a scratch copy of the app seeded
+with a history of the given size (see load.py), measuring:
+
+  server_ms         spawning `uvicorn main:app` until /quiz first returns 200,
+                    i.e. what the first user of a new instance waits for
+  import_ms         `import main`
+  warmup_ms         the lifespan startup (store open, aggregates, caches)
+  first_quiz_ms     the first /quiz after startup
+  first_history_ms  the first /api/history page after startup
+
+Each size gets one untimed run first, so sidecar files (stats.json,
+skills.json) exist as they would on a redeployed instance; the figures
+reported are medians over --runs.
+
+    python benchmarks/startup.py [--sizes 0,10000] [--runs 5] [--backend jsonl|sqlite]
+                                 [--out FILE] [--compare FILE]
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from load import ROOT, scratch_app
+
+BASELINE = os.path.join(ROOT, "benchmarks", "baselines", "startup-{backend}.json")
+SERVER_TIMEOUT = 120
+
+
+def phases():
+    """Runs inside the scratch directory; prints the in-process breakdown as JSON."""
+    start = time.perf_counter()
+    sys.path.insert(0, ROOT)
+    import main
+    imported = time.perf_counter()
+
+    async def first_requests():
+        import httpx
+        async with main.lifespan(main.app):
+            ready = time.perf_counter()
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                t = time.perf_counter()
+                (await client.get("/quiz")).raise_for_status()
+                quiz = time.perf_counter() - t
+                t = time.perf_counter()
+                (await client.get("/api/history", params={"limit": 50})).raise_for_status()
+                history = time.perf_counter() - t
+        return ready, quiz, history
+
+    ready, quiz, history = asyncio.run(first_requests())
+    return {"import_ms": (imported - start) * 1000, "warmup_ms": (ready - imported) * 1000,
+            "first_quiz_ms": quiz * 1000, "first_history_ms": history * 1000}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def server_time_to_first_request(workdir: str) -> float:
+    port = _free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--app-dir", ROOT,
+                             "--port", str(port), "--log-level", "warning"], cwd=workdir)
+    try:
+        while True:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/quiz", timeout=SERVER_TIMEOUT) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - start) * 1000
+            except (urllib.error.URLError, ConnectionError):
+                if proc.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with {proc.returncode}")
+                if time.perf_counter() - start > SERVER_TIMEOUT:
+                    raise TimeoutError("server did not come up")
+                time.sleep(0.01)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def measure(size: int, backend: str, runs: int):
+    with scratch_app(size, backend) as (workdir, seed_seconds):
+        def run_phases():
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), "--phases"], cwd=workdir,
+                                 check=True, capture_output=True, text=True).stdout
+            return json.loads(out)
+
+        run_phases()   # untimed: writes the sidecar files and warms the OS page cache
+        samples = [{**run_phases(), "server_ms": server_time_to_first_request(workdir)} for _ in range(runs)]
+    result = {name: round(statistics.median(s[name] for s in samples), 1) for name in samples[0]}
+    result["seed_seconds"] = round(seed_seconds, 2)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure time to first request for a fresh worker.")
+    parser.add_argument("--sizes", default="0,10000", help="history sizes to test, comma separated")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--backend", default="jsonl", choices=["jsonl", "sqlite"])
+    parser.add_argument("--out", help="write results here")
+    parser.add_argument("--compare", nargs="?", const="", help="diff against a baseline (default: the committed one)")
+    parser.add_argument("--phases", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.phases:
+        json.dump(phases(), sys.stdout)
+        return
+
+    results = {"backend": args.backend, "runs": args.runs, "sizes": {}}
+    for size in [int(s) for s in args.sizes.split(",")]:
+        results["sizes"][str(size)] = measure(size, args.backend, args.runs)
+
+    baseline = {}
+    if args.compare is not None:
+        with open(args.compare or BASELINE.format(backend=args.backend)) as f:
+            baseline = json.load(f)["sizes"]
+    for size, r in results["sizes"].items():
+        print(f"history={size} (seeded in {r['seed_seconds']}s)")
+        for name, value in r.items():
+            if name == "seed_seconds":
+                continue
+            line = f"  {name:18} {value:>9.1f} ms"
+            base = baseline.get(size, {}).get(name)
+            if base:
+                line += f"  ({(value / base - 1) * 100:+.1f}%)"
+            print(line)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
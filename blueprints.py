@@ -0,0 +1,306 @@
+import base64
+import binascii
+import copy
+import hashlib
+import json
+import math
+import random
+import secrets
+import struct
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from math_utils import DEFAULT_RANGES, MathGenerator
+
+# Bump whenever a generator changes what it draws, so old descriptors stop
+# regenerating into different quizzes.
+BLUEPRINT_VERSION = 1
+
+# Category -> generators (generate_<name>) that produce it, in draw order.
+GENERATOR_REGISTRY = {
+    'Addition': ['addition'],
+    'Subtraction': ['subtraction'],
+    'Multiplication': ['multiplication'],
+    'Division': ['division'],
+    'Factors': ['factorization'],
+    'Algebra': ['equation'],
+    'Fractions & Conversions': ['frac2dec', 'dec2perc', 'perc2frac'],
+    'Geometry': ['geometry'],
+    'Data Interpretation': ['data_interpretation'],
+    'Logical Reasoning': ['logical_reasoning'],
+    'Data Sufficiency': ['data_sufficiency'],
+    'Profit & Loss': ['profit_loss'],
+    'Unitary Method': ['unitary_method'],
+}
+
+# Operand ranges per difficulty; 'normal' is MathGenerator's DEFAULT_RANGES.
+DIFFICULTY_RANGES = {
+    'easy': {
+        'addition': {'operand': (10, 99)},
+        'subtraction': {'operand': (10, 99)},
+        'multiplication': {'operand': (10, 99), 'multiplier': (2, 9)},
+        'division': {'dividend': (10, 99), 'divisor': (2, 9)},
+        'factorization': {'n': (4, 99)},
+        'equation': {'a': (2, 5), 'x': (0, 10), 'b': (0, 10)},
+    },
+    'normal': {},
+    'hard': {
+        'addition': {'operand': (10000, 99999)},
+        'subtraction': {'operand': (10000, 99999)},
+        'multiplication': {'operand': (1000, 99999), 'multiplier': (11, 99)},
+        'division': {'dividend': (10000, 99999), 'divisor': (11, 199)},
+        'factorization': {'n': (500, 9999)},
+        'equation': {'a': (2, 25), 'x': (-50, 50), 'b': (-100, 100)},
+    },
+}
+
+# Categories whose generators have operand ranges, i.e. where difficulty changes anything.
+TIERED_CATEGORIES = [c for c, gens in GENERATOR_REGISTRY.items() if any(g in DEFAULT_RANGES for g in gens)]
+
+MAX_QUESTIONS = 100
+
+
+class Blueprint:
+    """
+    What a quiz contains: either fixed per-category counts, or category
+    weights plus a total (counts drawn per quiz), and a difficulty that
+    picks operand ranges. `levels` overrides the difficulty per category.
+    Validated on construction.
+    """
+
+    def __init__(self, name: str, counts: Optional[Dict[str, int]] = None, weights: Optional[Dict[str, float]] = None,
+                 total: Optional[int] = None, difficulty: str = 'normal', levels: Optional[Dict[str, str]] = None):
+        self.name = name
+        self.counts = counts or {}
+        self.weights = weights or {}
+        self.total = total
+        self.difficulty = difficulty
+        self.levels = levels or {}
+        self.validate()
+
+    def validate(self):
+        if bool(self.counts) == bool(self.weights):
+            raise ValueError("A blueprint needs either counts or weights")
+        unknown = set(self.counts) | set(self.weights)
+        unknown -= set(GENERATOR_REGISTRY)
+        if unknown:
+            raise ValueError(f"Unknown categories: {', '.join(sorted(unknown))}")
+        if any(c < 0 for c in self.counts.values()):
+            raise ValueError("Counts must not be negative")
+        weights = list(self.weights.values())
+        if not all(math.isfinite(w) and w >= 0 for w in weights) or not math.isfinite(sum(weights)):
+            raise ValueError("Weights must be finite and not negative")
+        if self.weights and (not self.total or sum(self.weights.values()) <= 0):
+            raise ValueError("Weighted blueprints need a positive total and at least one positive weight")
+        size = self.total if self.weights else sum(self.counts.values())
+        if not 0 < size <= MAX_QUESTIONS:
+            raise ValueError(f"A quiz must have between 1 and {MAX_QUESTIONS} questions")
+        if self.difficulty not in DIFFICULTY_RANGES:
+            raise ValueError(f"Unknown difficulty: {self.difficulty}")
+        for category, level in self.levels.items():
+            if category not in GENERATOR_REGISTRY or level not in DIFFICULTY_RANGES:
+                raise ValueError(f"Bad level {category}={level}")
+        for generator, ranges in self.ranges().items():
+            if any(lo > hi for lo, hi in ranges.values()):
+                raise ValueError(f"Empty operand range for {generator}")
+        mult = self.ranges()['multiplication']
+        if mult['operand'][0] > mult['operand'][1] // mult['multiplier'][1]:
+            raise ValueError("Multiplication operand range too narrow for its multipliers")
+
+    def ranges(self) -> Dict[str, Dict[str, Tuple[int, int]]]:
+        ranges = {**DEFAULT_RANGES, **DIFFICULTY_RANGES[self.difficulty]}
+        for category, level in self.levels.items():
+            for g in GENERATOR_REGISTRY[category]:
+                if g in DEFAULT_RANGES:
+                    ranges[g] = DIFFICULTY_RANGES[level].get(g, DEFAULT_RANGES[g])
+        return ranges
+
+    def level(self, category: str) -> str:
+        return self.levels.get(category, self.difficulty)
+
+    def generator_counts(self, rng: random.Random) -> Dict[str, int]:
+        """Generator name -> questions, in registry order. Weighted blueprints draw the split from rng."""
+        counts = self.counts
+        if self.weights:
+            cats = [c for c in GENERATOR_REGISTRY if self.weights.get(c)]
+            drawn = rng.choices(cats, weights=[self.weights[c] for c in cats], k=self.total)
+            counts = {c: drawn.count(c) for c in cats}
+        out = {}
+        for category, generators in GENERATOR_REGISTRY.items():
+            n = counts.get(category, 0)
+            for i, g in enumerate(generators):
+                share = n // len(generators) + (1 if i < n % len(generators) else 0)
+                if share:
+                    out[g] = share
+        return out
+
+    def to_dict(self) -> Dict[str, Any]:
+        order = list(GENERATOR_REGISTRY)
+        out = {
+            'counts': {c: self.counts[c] for c in order if self.counts.get(c)},
+            'weights': {c: self.weights[c] for c in order if self.weights.get(c)},
+            'total': self.total if self.weights else None,
+            'difficulty': self.difficulty,
+        }
+        if self.levels:   # only when set, so blueprints without levels keep their fingerprints
+            out['levels'] = {c: self.levels[c] for c in order if c in self.levels}
+        return out
+
+    def spec(self) -> str:
+        """
+        The parameters in compact, URL-safe form, carried in quiz descriptors
+        so any process can regenerate the quiz: a JSON list of name,
+        difficulty, total and per-category counts, weights and levels in
+        registry order.
+        """
+        order = list(GENERATOR_REGISTRY)
+        fields = [self.name, self.difficulty, self.total if self.weights else None,
+                  [self.counts.get(c, 0) for c in order] if self.counts else [],
+                  [self.weights.get(c, 0) for c in order] if self.weights else [],
+                  [self.levels.get(c, "") for c in order] if self.levels else []]
+        raw = json.dumps(fields, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+    @property
+    def fingerprint(self) -> bytes:
+        """6 bytes identifying the blueprint's content inside a quiz descriptor."""
+        if self.name == 'standard':
+            return bytes(6)   # descriptors issued before blueprints existed carry zeros
+        canonical = json.dumps(self.to_dict(), sort_keys=True, separators=(",", ":"))
+        return hashlib.sha1(canonical.encode()).digest()[:6]
+
+
+# --- NAMED BLUEPRINTS (validated at import) ---
+STANDARD = Blueprint('standard', counts={c: 2 * len(g) for c, g in GENERATOR_REGISTRY.items()})
+
+BLUEPRINTS = {
+    'standard': STANDARD,
+    'arithmetic': Blueprint('arithmetic', counts={'Addition': 5, 'Subtraction': 5, 'Multiplication': 5, 'Division': 5}),
+    'arithmetic-easy': Blueprint('arithmetic-easy', counts={'Addition': 5, 'Subtraction': 5, 'Multiplication': 5,
+                                                            'Division': 5}, difficulty='easy'),
+    'number-sense': Blueprint('number-sense', counts={'Factors': 5, 'Algebra': 5, 'Fractions & Conversions': 6}),
+    'reasoning': Blueprint('reasoning', counts={'Data Interpretation': 4, 'Logical Reasoning': 4,
+                                                'Data Sufficiency': 4, 'Profit & Loss': 4, 'Unitary Method': 4}),
+}
+
+# Fingerprint -> named blueprint, for descriptors without a spec: standard
+# quizzes, and named ones issued before descriptors carried specs.
+_KNOWN = {bp.fingerprint: bp for bp in BLUEPRINTS.values()}
+
+@lru_cache(maxsize=1024)
+def blueprint_from_spec(spec: str) -> Blueprint:
+    """Rebuilds (and validates) a blueprint from Blueprint.spec()."""
+    order = list(GENERATOR_REGISTRY)
+    try:
+        raw = base64.urlsafe_b64decode(spec + "=" * (-len(spec) % 4))
+        name, difficulty, total, counts, weights, levels = json.loads(raw)
+        if any(len(v) not in (0, len(order)) for v in (counts, weights, levels)):
+            raise ValueError
+        if any(type(n) is not int for n in counts) or any(type(w) not in (int, float) for w in weights):
+            raise ValueError
+        return Blueprint(str(name), counts={c: n for c, n in zip(order, counts) if n},
+                         weights={c: w for c, w in zip(order, weights) if w}, total=total,
+                         difficulty=difficulty, levels={c: lv for c, lv in zip(order, levels) if lv})
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise ValueError("Invalid quiz blueprint spec")
+
+@lru_cache(maxsize=256)
+def blueprint_from_params(name: Optional[str] = None, categories: Optional[str] = None, count: int = 2,
+                          weights: Optional[str] = None, total: Optional[int] = None,
+                          difficulty: Optional[str] = None) -> Blueprint:
+    """
+    Resolves /quiz query params. Examples:
+      ?blueprint=arithmetic
+      ?categories=Division,Geometry&count=5&difficulty=hard
+      ?weights=Addition:3,Division:1&total=20
+    """
+    if name:
+        if name not in BLUEPRINTS:
+            raise ValueError(f"Unknown blueprint: {name}")
+        base = BLUEPRINTS[name]
+        if not difficulty or difficulty == base.difficulty:
+            return base
+        return Blueprint(f"{name}-{difficulty}", counts=base.counts, weights=base.weights,
+                         total=base.total, difficulty=difficulty)
+    if weights:
+        parsed = {}
+        for part in weights.split(","):
+            cat, _, w = part.partition(":")
+            try:
+                parsed[cat.strip()] = float(w)
+            except ValueError:
+                raise ValueError(f"Bad weight: {part!r}")
+        return Blueprint('custom', weights=parsed, total=total, difficulty=difficulty or 'normal')
+    if categories:
+        counts = {c.strip(): count for c in categories.split(",") if c.strip()}
+        return Blueprint('custom', counts=counts, difficulty=difficulty or 'normal')
+    if difficulty:
+        return blueprint_from_params('standard', difficulty=difficulty)
+    return STANDARD
+
+
+# --- SEEDED QUIZZES ---
+# A quiz is fully determined by (seed, blueprint version, blueprint), so it can
+# be stored and shipped as a descriptor: 16 bytes (hex) of 8 bytes seed,
+# 2 bytes version and 6 bytes blueprint fingerprint, then, for any blueprint
+# but the standard one, "." and its spec. The fingerprint checks the spec.
+_DESCRIPTOR = struct.Struct(">QH6s")
+MAX_DESCRIPTOR_LENGTH = 1024
+
+def new_seed() -> int:
+    return secrets.randbits(64)
+
+def encode_descriptor(seed: int, blueprint: Blueprint = STANDARD, version: int = BLUEPRINT_VERSION) -> str:
+    descriptor = _DESCRIPTOR.pack(seed, version, blueprint.fingerprint).hex()
+    if any(blueprint.fingerprint):
+        descriptor += "." + blueprint.spec()
+    return descriptor
+
+def decode_descriptor(descriptor: str) -> Tuple[int, int, bytes, str]:
+    """(seed, version, fingerprint, blueprint spec or "")."""
+    try:
+        if len(descriptor) > MAX_DESCRIPTOR_LENGTH:
+            raise ValueError
+        head, _, spec = descriptor.partition(".")
+        return (*_DESCRIPTOR.unpack(bytes.fromhex(head)), spec)
+    except (ValueError, TypeError, AttributeError, struct.error):
+        raise ValueError(f"Invalid quiz descriptor: {descriptor!r}")
+
+def _resolve(fingerprint: bytes, spec: str) -> Blueprint:
+    if spec:
+        blueprint = blueprint_from_spec(spec)
+        if blueprint.fingerprint != fingerprint:
+            raise ValueError("Quiz descriptor does not match its blueprint")
+        return blueprint
+    if fingerprint not in _KNOWN:
+        raise ValueError("Quiz descriptor names an unknown blueprint")
+    return _KNOWN[fingerprint]
+
+@lru_cache(maxsize=1024)
+def _render_quiz(seed: int, version: int, fingerprint: bytes, spec: str) -> Tuple[Dict[str, Any], ...]:
+    if version != BLUEPRINT_VERSION:
+        raise ValueError(f"Quiz blueprint version {version} cannot be regenerated (current is {BLUEPRINT_VERSION})")
+    blueprint = _resolve(fingerprint, spec)
+    generator = MathGenerator(seed=seed, ranges=blueprint.ranges())
+    questions = generator.generate_all(blueprint.generator_counts(generator.rng))
+    for q in questions:
+        if isinstance(q['correct_answer'], float):
+            q['correct_answer'] = round(q['correct_answer'], 4)
+    return tuple(questions)
+
+def blueprint_for(descriptor: Optional[str]) -> Optional[Blueprint]:
+    """The blueprint a descriptor was issued for, or None if it cannot be resolved."""
+    try:
+        return _resolve(*decode_descriptor(descriptor)[2:])
+    except ValueError:
+        return None
+
+def generate_quiz(descriptor: str) -> List[Dict[str, Any]]:
+    """Rendered questions for a descriptor; cached by seed, so callers get their own copy."""
+    return copy.deepcopy(list(_render_quiz(*decode_descriptor(descriptor))))
+
+def answer_key(descriptor: str) -> Dict[int, Dict[str, Any]]:
+    """Regenerates { question_id: { question_text, type, category, correct_answer } } for grading."""
+    return {q['id']: {'question_text': q['question_text'], 'type': q['type'], 'category': q['category'],
+                      'correct_answer': q['correct_answer']}
+            for q in _render_quiz(*decode_descriptor(descriptor))}
@@ -1,6 +1,11 @@
+import asyncio
+import json
+import logging
 import os
-from azure.cosmos import CosmosClient, PartitionKey
+import threading
+from collections import deque
 from dotenv import load_dotenv
+from storage import ResultsStore, StoreBusy, parse_key
 
 # Load credentials from .env
 load_dotenv()
@@ -10,56 +15,366 @@ KEY = os.getenv("COSMOS_KEY")
 DATABASE_NAME = "MathMasterDB"
 CONTAINER_NAME = "QuizResults"
 
-class CosmosDBManager:
-    def __init__(self):
-        if not ENDPOINT or not KEY:
-            raise ValueError("Missing Cosmos DB credentials in .env file")
-        
-        self.client = CosmosClient(ENDPOINT, KEY)
-        self.database = self.client.create_database_if_not_exists(id=DATABASE_NAME)
-        
-        # Partition Key is critical for scaling. We use /user_id.
-        self.container = self.database.create_container_if_not_exists(
-            id=CONTAINER_NAME, 
-            partition_key=PartitionKey(path="/user_id")
-        )
-
-    def save_submission(self, timestamp_key, submission_data):
-        """
-        Saves a quiz result to Cosmos DB.
-        Structure: We flatten it slightly to make it a valid document.
-        """
-        document = {
+WRITE_QUEUE_SIZE = int(os.getenv("COSMOS_WRITE_QUEUE_SIZE", "1000"))
+WRITE_BATCH_SIZE = int(os.getenv("COSMOS_WRITE_BATCH_SIZE", "50"))    # a transactional batch holds at most 100
+FLUSH_INTERVAL = float(os.getenv("COSMOS_FLUSH_INTERVAL", "0.5"))     # seconds a lone submission may wait
+MAX_RETRIES = 6
+# Submissions Cosmos rejects for good (e.g. 400 invalid, 413 too large) are appended here instead of retried.
+DEAD_LETTER_PATH = os.getenv("COSMOS_DEAD_LETTER_PATH", "cosmos.deadletter.jsonl")
+TRANSIENT_STATUS = {408, 429, 449}   # timeout, throttled, retry-with; every 5xx is transient too
+
+logger = logging.getLogger(__name__)
+
+
+class CosmosDBManager(ResultsStore):
+    """
+    Cosmos DB results store on the async SDK (azure.cosmos.aio).
+
+    The client (and its connection pool) lives on one background event loop
+    that is started on first use, so importing this module does no network
+    round-trips and the sync ResultsStore methods can be called from any
+    thread without blocking FastAPI's loop on I/O.
+
+    Submissions go into a bounded write-behind queue and are upserted in
+    per-partition transactional batches, with backoff on throttling,
+    timeouts and server errors. A batch Cosmos rejects outright is retried
+    a document at a time and whatever still fails is dead-lettered, so one
+    bad document never blocks the queue. Reads flush the queue first, so
+    history includes earlier submits unless Cosmos is failing writes.
+
+    Pass `container` (anything exposing the aio ContainerProxy methods used
+    below) to run against a local fake instead of a real account.
+    """
+
+    def __init__(self, endpoint=ENDPOINT, key=KEY, container=None, queue_size=WRITE_QUEUE_SIZE,
+                 batch_size=WRITE_BATCH_SIZE, flush_interval=FLUSH_INTERVAL, max_retries=MAX_RETRIES,
+                 dead_letter_path=DEAD_LETTER_PATH):
+        self.endpoint = endpoint
+        self.key = key
+        self.queue_size = queue_size
+        self.batch_size = min(batch_size, 100)
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.dead_letter_path = dead_letter_path
+        self.dead_lettered = 0
+        self.client = None
+        self.container = container
+        self._pending = deque()                 # documents not yet written, oldest first
+        self._pending_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+
+    # --- I/O LOOP ---
+    def _ensure_loop(self):
+        if self._loop is None:
+            with self._start_lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    ready = threading.Event()
+                    self._thread = threading.Thread(target=self._run_loop, args=(loop, ready),
+                                                    name="cosmos-io", daemon=True)
+                    self._thread.start()
+                    ready.wait()
+                    self._loop = loop
+        return self._loop
+
+    def _run_loop(self, loop, ready):
+        asyncio.set_event_loop(loop)
+        self._wakeup = asyncio.Event()
+        self._connect_lock = asyncio.Lock()
+        self._drain_lock = asyncio.Lock()
+        self._flusher = loop.create_task(self._flush_loop())
+        loop.call_soon(ready.set)
+        loop.run_forever()
+
+    def _run(self, coro):
+        """Runs a coroutine on the I/O loop and waits for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result()
+
+    async def _get_container(self):
+        """Connects on first use: client, database and container are created once and shared."""
+        if self.container is None:
+            async with self._connect_lock:
+                if self.container is None:
+                    from azure.cosmos import PartitionKey
+                    from azure.cosmos.aio import CosmosClient
+                    if not self.endpoint or not self.key:
+                        raise ValueError("Missing Cosmos DB credentials in .env file")
+                    self.client = CosmosClient(self.endpoint, self.key)
+                    database = await self.client.create_database_if_not_exists(id=DATABASE_NAME)
+                    # Partition Key is critical for scaling. We use /user_id.
+                    self.container = await database.create_container_if_not_exists(
+                        id=CONTAINER_NAME,
+                        partition_key=PartitionKey(path="/user_id")
+                    )
+        return self.container
+
+    # --- WRITE-BEHIND ---
+    @staticmethod
+    def _document(timestamp_key, submission_data, user_id="guest"):
+        """We flatten the submission slightly to make it a valid document."""
+        ts = parse_key(timestamp_key)
+        return {
             "id": timestamp_key,          # Unique ID for Cosmos
-            "user_id": "guest",           # Placeholder for future multi-user support
-            "timestamp_key": timestamp_key, 
+            "user_id": user_id,           # Partition key
+            "timestamp_key": timestamp_key,
+            "submitted_at": ts.isoformat() if ts else None,  # Sortable, for range queries
+            "quiz_id": submission_data.get('quiz_id'),  # regenerates the quiz, for regrades and skill levels
             "summary": submission_data['summary'],
             "details": submission_data['details']
         }
-        
-        self.container.create_item(body=document)
 
-    def get_all_history(self):
+    @staticmethod
+    def _record(item):
+        """Document -> stored record, as the other backends return it."""
+        record = {"summary": item['summary'], "details": item['details']}
+        if item.get('quiz_id'):
+            record["quiz_id"] = item['quiz_id']
+        return record
+
+    def save_submission(self, timestamp_key, submission_data, user_id="guest"):
         """
-        Fetches all history and transforms it back to the dictionary format 
-        expected by the frontend: { "DD-MM-YY...": { "summary": ..., "details": ... } }
+        Queues a quiz result for Cosmos DB and returns immediately. Raises
+        StoreBusy if the queue is full (Cosmos is throttling or unreachable).
         """
-        query = "SELECT * FROM c WHERE c.user_id = 'guest'"
-        items = self.container.query_items(
-            query=query,
-            enable_cross_partition_query=True
-        )
+        document = self._document(timestamp_key, submission_data, user_id)
+        with self._pending_lock:
+            if len(self._pending) >= self.queue_size:
+                raise StoreBusy(f"Cosmos write queue is full ({self.queue_size} submissions pending)")
+            self._pending.append(document)
+            batch_ready = len(self._pending) >= self.batch_size
+        loop = self._ensure_loop()
+        if batch_ready:
+            loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self._drain()
+            except Exception:
+                logger.exception("Cosmos flush failed; %d submissions kept for the next attempt", len(self._pending))
+
+    async def _drain(self):
+        """
+        Writes everything queued, a batch at a time. A batch that fails with
+        a transient error goes back to the front of the queue.
+        """
+        async with self._drain_lock:
+            while True:
+                with self._pending_lock:
+                    batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+                if not batch:
+                    return
+                try:
+                    await self._write_batch(batch)
+                except BaseException:
+                    with self._pending_lock:
+                        self._pending.extendleft(reversed(batch))
+                    raise
+
+    async def _write_batch(self, documents):
+        container = await self._get_container()
+        by_partition = {}
+        for doc in documents:
+            by_partition.setdefault(doc["user_id"], []).append(doc)
+        for user_id, docs in by_partition.items():
+            # Upserts, so re-sending a batch after a partial failure (or a regrade) just overwrites.
+            try:
+                await self._with_backoff(container.execute_item_batch,
+                                         batch_operations=[("upsert", (doc,)) for doc in docs],
+                                         partition_key=user_id)
+            except Exception as e:
+                if _transient(e):
+                    raise
+                # One bad document fails the whole transactional batch; write them singly to find it.
+                for doc in docs:
+                    try:
+                        await self._with_backoff(container.upsert_item, doc)
+                    except Exception as e:
+                        if _transient(e):
+                            raise
+                        self._dead_letter(doc, e)
+
+    def _dead_letter(self, document, error):
+        self.dead_lettered += 1
+        logger.error("Cosmos rejected submission %s for user %s (%s); dead-lettered to %s",
+                     document["id"], document["user_id"], error, self.dead_letter_path)
+        with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"status_code": getattr(error, "status_code", None), "error": str(error),
+                                "document": document}, separators=(",", ":")) + "\n")
+
+    async def _with_backoff(self, operation, *args, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await operation(*args, **kwargs)
+            except Exception as e:
+                if not _transient(e) or attempt == self.max_retries:
+                    raise
+                retry_after_ms = (getattr(e, "headers", None) or {}).get("x-ms-retry-after-ms")
+                await asyncio.sleep(float(retry_after_ms) / 1000 if retry_after_ms else min(0.1 * 2 ** attempt, 5.0))
+
+    def flush(self):
+        """Blocks until every queued submission has been written."""
+        if self._loop is not None:
+            self._run(self._drain())
+
+    def warm(self):
+        """Connects now (client, database, container) instead of on the first submit or read."""
+        self._run(self._get_container())
+
+    def pending(self):
+        return len(self._pending)
+
+    def close(self):
+        if self._loop is None:
+            return
+        self._run(self._shutdown())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+    async def _shutdown(self):
+        self._flusher.cancel()
+        await asyncio.gather(self._flusher, return_exceptions=True)
+        try:
+            await self._drain()
+        finally:
+            if self.client is not None:
+                await self.client.close()
+                self.client = None
+                self.container = None
+
+    # --- READS ---
+    async def _settle(self):
+        """Drains the queue before a read. A write failure is logged, not raised: the read still answers."""
+        try:
+            await self._drain()
+        except Exception:
+            logger.exception("Cosmos flush before a read failed; %d submissions not yet visible", len(self._pending))
+
+    async def _items(self, query, params, **kwargs):
+        await self._settle()
+        container = await self._get_container()
+        return [item async for item in container.query_items(query=query, parameters=params, **kwargs)]
+
+    def get_all_history(self, page_size=None, continuation_token=None, since=None, until=None, summary=False,
+                        user_id="guest"):
+        """
+        Fetches all of a user's history and transforms it back to the dictionary
+        format expected by the frontend: { "DD-MM-YY...": { "summary": ..., "details": ... } }
+        With page_size set, returns one page instead: (history_dict, continuation_token).
+        """
+        if page_size is None:
+            return self.query(since, until, user_id=user_id)
+        return self.page(since, until, continuation_token, page_size, summary, user_id)
+
+    # --- ResultsStore interface ---
+    def append(self, key, record, user_id="guest"):
+        self.save_submission(key, record, user_id)
+
+    def load(self, user_id="guest"):
+        return self.get_all_history(user_id=user_id)
+
+    def users(self):
+        # The one cross-partition query: only rebuilds and exports walk every user.
+        query = "SELECT DISTINCT VALUE c.user_id FROM c"
+        return sorted(self._run(self._items(query, [])))
+
+    def query(self, since=None, until=None, category=None, user_id="guest"):
+        where, params = self._window(since, until, user_id)
+        if category:
+            where.append("EXISTS(SELECT VALUE d FROM d IN c.details WHERE d.category = @category)")
+            params.append({"name": "@category", "value": category})
+        query = f"SELECT * FROM c WHERE {' AND '.join(where)} ORDER BY c.submitted_at"
+        items = self._run(self._items(query, params, partition_key=user_id))
 
         # Transformation Layer (Cosmos List -> Frontend Dictionary)
         history_dict = {}
         for item in items:
-            key = item['id']
-            history_dict[key] = {
-                "summary": item['summary'],
-                "details": item['details']
-            }
-            
+            history_dict[item['id']] = self._record(item)
+
         return history_dict
 
-# Singleton instance
-db_manager = CosmosDBManager()
\ No newline at end of file
+    def page(self, since=None, until=None, cursor=None, limit=50, summary=False, user_id="guest"):
+        return self._run(self._page(since, until, cursor, limit, summary, user_id))
+
+    async def _page(self, since, until, cursor, limit, summary, user_id):
+        # The cursor is Cosmos' own continuation token, passed through untouched.
+        await self._settle()
+        container = await self._get_container()
+        where, params = self._window(since, until, user_id)
+        fields = "c.id, c.summary" if summary else "*"
+        query = f"SELECT {fields} FROM c WHERE {' AND '.join(where)} ORDER BY c.submitted_at"
+        pager = container.query_items(
+            query=query,
+            parameters=params,
+            partition_key=user_id,
+            max_item_count=limit
+        ).by_page(cursor)
+        try:
+            items = [item async for item in await pager.__anext__()]
+        except StopAsyncIteration:
+            items = []
+        except Exception as e:
+            # A token Cosmos can't parse is the client's mistake (a 400), not a server error.
+            if cursor and getattr(e, "status_code", None) == 400:
+                raise ValueError("Invalid cursor")
+            raise
+        history_dict = {}
+        for item in items:
+            history_dict[item['id']] = {"summary": item['summary']} if summary else self._record(item)
+        return history_dict, pager.continuation_token
+
+    def change_token(self, user_id="guest"):
+        # Document count and newest _ts (server write time, in seconds) of the user's partition: moves on
+        # inserts from any process, and on upserts except a second rewrite within the same second.
+        query = "SELECT COUNT(1) AS count, MAX(c._ts) AS ts FROM c WHERE c.user_id = @user_id"
+        rows = self._run(self._items(query, [{"name": "@user_id", "value": user_id}], partition_key=user_id))
+        row = rows[0] if rows else {}
+        return row.get("count", 0), row.get("ts")
+
+    def summary_stats(self, since=None, until=None, user_id="guest"):
+        where, params = self._window(since, until, user_id)
+        query = (f"SELECT COUNT(1) AS count, AVG(c.summary.percentage) AS avg_percentage, "
+                 f"SUM(c.summary.total_time_seconds) AS total_time_seconds FROM c WHERE {' AND '.join(where)}")
+        rows = self._run(self._items(query, params, partition_key=user_id))
+        row = rows[0] if rows else {}
+        return {"count": row.get("count", 0), "avg_percentage": row.get("avg_percentage") or 0.0,
+                "total_time_seconds": row.get("total_time_seconds") or 0}
+
+    def category_stats(self, since=None, until=None, user_id="guest"):
+        where, params = self._window(since, until, user_id)
+        query = (f"SELECT d.category AS category, COUNT(1) AS total, SUM(d.is_correct ? 1 : 0) AS correct, "
+                 f"SUM(d.time_spent) AS time_spent FROM c JOIN d IN c.details "
+                 f"WHERE {' AND '.join(where)} GROUP BY d.category")
+        rows = self._run(self._items(query, params, partition_key=user_id))
+        return {r["category"]: {"total": r["total"], "correct": r["correct"], "time_spent": r["time_spent"]}
+                for r in rows}
+
+    @staticmethod
+    def _window(since, until, user_id):
+        # Every query also passes partition_key=user_id, so it is served by that user's partition alone.
+        where = ["c.user_id = @user_id"]
+        params = [{"name": "@user_id", "value": user_id}]
+        if since is not None:
+            where.append("c.submitted_at >= @since")
+            params.append({"name": "@since", "value": since.isoformat()})
+        if until is not None:
+            where.append("c.submitted_at < @until")
+            params.append({"name": "@until", "value": until.isoformat()})
+        return where, params
+
+def _transient(error):
+    """Throttling, timeouts, server and connection errors; a 4xx otherwise means Cosmos rejected it for good."""
+    status = getattr(error, "status_code", None)
+    return status is None or status in TRANSIENT_STATUS or status >= 500
+
+# Singleton instance; connects on first use.
+db_manager = CosmosDBManager()
@@ -0,0 +1,108 @@
+import asyncio
+import json
+import os
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Tuple
+
+REPLAY_SIZE = int(os.getenv("EVENTS_REPLAY_SIZE", "256"))
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "64"))
+KEEPALIVE_SECONDS = float(os.getenv("EVENTS_KEEPALIVE_SECONDS", "15"))
+# Streams end after this long and the client reconnects (replayed by Last-Event-ID), so an open
+# dashboard never holds up a server's graceful shutdown, which waits for responses to finish.
+MAX_AGE_SECONDS = float(os.getenv("EVENTS_MAX_AGE_SECONDS", "60"))
+RETRY_MS = 2000   # how soon EventSource reconnects after a dropped stream
+
+
+class EventBroker:
+    """
+    Fan-out of server-sent events to the open /api/events streams of the
+    user an event belongs to (or to everyone, for events without a user).
+    Each event is serialized once in publish(), on the event loop;
+    subscribers get their own bounded queue, so a client that stops
+    reading loses its own connection instead of holding up writes or
+    memory. EventSource reconnects on its own, and the recent-events
+    buffer replays whatever it missed (by Last-Event-ID).
+    """
+
+    def __init__(self, replay_size: int = REPLAY_SIZE, queue_size: int = SUBSCRIBER_QUEUE_SIZE,
+                 keepalive: float = KEEPALIVE_SECONDS, max_age: float = MAX_AGE_SECONDS):
+        self.queue_size = queue_size
+        self.keepalive = keepalive
+        self.max_age = max_age
+        self._recent: Deque[Tuple[int, Optional[str], bytes]] = deque(maxlen=replay_size)
+        self._subscribers: Dict[asyncio.Queue, str] = {}    # queue -> the user it streams events for
+        self._last_id = 0
+        self.published = 0
+        self.dropped = 0    # subscribers cut off for falling behind
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, event: str, data: Any, user_id: Optional[str] = None):
+        """Queues one event for the user's subscribers (all of them if user_id is None). Call from the event loop."""
+        self._last_id += 1
+        message = _format(self._last_id, event, data)
+        self._recent.append((self._last_id, user_id, message))
+        self.published += 1
+        for queue, subscriber in list(self._subscribers.items()):
+            if user_id is not None and subscriber != user_id:
+                continue
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self._cut_off(queue)
+                self.dropped += 1
+
+    def _cut_off(self, queue: asyncio.Queue):
+        # Drop its backlog and end its stream; the client's reconnect is replayed from _recent.
+        self._subscribers.pop(queue, None)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    async def stream(self, user_id: str = "guest", last_event_id: Optional[str] = None,
+                     initial: Optional[Tuple[str, Any]] = None) -> AsyncIterator[bytes]:
+        """
+        The body of one SSE response for `user_id`: their events newer than
+        `last_event_id` still in the replay buffer, then `initial` (event,
+        data) if given, then live events, with a comment line every
+        `keepalive` seconds so proxies keep the connection open, until
+        `max_age` has passed.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_age
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[queue] = user_id
+        subscribed_at = self._last_id   # later events arrive through the queue, so replay stops here
+        try:
+            yield f"retry: {RETRY_MS}\n\n".encode()
+            if last_event_id and last_event_id.isdigit():
+                for event_id, owner, message in list(self._recent):
+                    if int(last_event_id) < event_id <= subscribed_at and owner in (None, user_id):
+                        yield message
+            if initial is not None:
+                yield _format(subscribed_at, *initial)
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return
+                try:
+                    message = await asyncio.wait_for(queue.get(), min(self.keepalive, remaining))
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            self._subscribers.pop(queue, None)
+
+    def close(self):
+        """Ends every open stream, e.g. on shutdown."""
+        for queue in list(self._subscribers):
+            self._cut_off(queue)
+
+
+def _format(event_id: int, event: str, data: Any) -> bytes:
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode("utf-8")
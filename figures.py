@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+# 'inline' embeds each figure's SVG in question_text (the original behaviour);
+# 'url' references /figures/{hash}.svg instead, so quiz pages and stored
+# history carry a short <img> tag and browsers/CDNs cache the repeated shapes.
+FIGURE_MODE = os.getenv("FIGURE_MODE", "inline")
+
+# Part of every figure hash: bump when the templates below change so cached URLs move too.
+TEMPLATE_VERSION = 1
+
+FILL_COLOR = "#e3f2fd"
+STROKE_COLOR = "#1565c0"
+SVG_NS = 'xmlns="http://www.w3.org/2000/svg" '
+
+# --- COMPILED TEMPLATES ---
+# Only the parameters are formatted in; shape, colours, viewBox and layout are fixed text.
+_LABEL = 'font-family="Arial" font-size="14" text-anchor="middle" font-weight="bold"'
+_SHAPE_STYLE = f'style="fill:{FILL_COLOR};stroke:{STROKE_COLOR};stroke-width:3"'
+_GEOMETRY_SVG = {
+    'rectangle': (
+        '<svg width="240" height="140" viewBox="0 0 240 140">\n'
+        f'                    <rect x="25" y="10" width="150" height="80" {_SHAPE_STYLE} />\n'
+        f'                    <text x="100" y="115" {_LABEL}>{{0}} m</text>\n'
+        f'                    <text x="210" y="55" {_LABEL}>{{1}} m</text>\n'
+        '                </svg>'),
+    'square': (
+        '<svg width="180" height="180" viewBox="0 0 180 180">'
+        f'<rect x="25" y="25" width="100" height="100" {_SHAPE_STYLE} />'
+        f'<text x="75" y="150" {_LABEL}>{{0}} m</text></svg>'),
+    'circle': (
+        '<svg width="180" height="180" viewBox="0 0 180 180">'
+        f'<circle cx="75" cy="75" r="50" stroke="{STROKE_COLOR}" stroke-width="3" fill="{FILL_COLOR}" />'
+        '<line x1="75" y1="75" x2="125" y2="75" style="stroke:#000;stroke-width:2" />'
+        f'<text x="100" y="70" {_LABEL}>r = {{0}} m</text></svg>'),
+}
+# Surrounding HTML per shape: (before the figure, after it); the caption takes the mode.
+_COLUMN = '<div style="display:flex; flex-direction:column; align-items:center;">'
+_GEOMETRY_HTML = {
+    'rectangle': (f'\n            {_COLUMN}\n                ',
+                  '\n                <div style="margin-top:10px;">Find the <b>{0}</b>.</div>\n            </div>\n            '),
+    'square': (_COLUMN, '<div style="margin-top:10px;">Find the <b>{0}</b>.</div></div>'),
+    'circle': (_COLUMN, '<div style="margin-top:10px;">Find the <b>{0}</b> (π=3.14).</div></div>'),
+}
+_BAR = ('<rect x="{x}" y="{y}" width="40" height="{h}" fill="{color}" />'
+        '<text x="{tx}" y="135" font-family="Arial" font-size="12" text-anchor="middle">{lbl}</text>'
+        '<text x="{tx}" y="{vy}" font-family="Arial" font-size="12" text-anchor="middle" font-weight="bold">{val}</text>')
+_BAR_STYLE = "border-left:2px solid #333; border-bottom:2px solid #333;"
+_BAR_CHART_SVG = f'<svg width="300" height="150" viewBox="0 0 300 150" style="{_BAR_STYLE}">{{0}}</svg>'
+_BAR_CHART_HTML = (_COLUMN + '<h5>{0}</h5>', '<div style="margin-top:10px;">{0}</div></div>')
+# <img> stand-ins for url mode: same box, and the chart axes move onto the tag.
+_IMG = {
+    'rectangle': 'width="240" height="140"', 'square': 'width="180" height="180"', 'circle': 'width="180" height="180"',
+    'bar_chart': f'width="300" height="150" style="{_BAR_STYLE}"',
+}
+
+
+# --- RENDERED FIGURE CACHE ---
+@lru_cache(maxsize=1024)
+def geometry_svg(shape: str, dims: Tuple[int, ...]) -> str:
+    return _GEOMETRY_SVG[shape].format(*dims)
+
+@lru_cache(maxsize=4096)
+def _render_bar(i: int, lbl: str, val: int, max_val: int) -> str:
+    scale = 100 / max_val if max_val > 0 else 1
+    h = val * scale; y = 120 - h; x = 40 + i * 60; color = "#4caf50" if val == max_val else "#2196f3"
+    return _BAR.format(x=x, y=y, h=h, color=color, tx=x + 20, lbl=lbl, vy=y - 5, val=val)
+
+@lru_cache(maxsize=4096)
+def bar_chart_svg(labels: Tuple[str, ...], values: Tuple[int, ...]) -> str:
+    max_val = max(values)
+    return _BAR_CHART_SVG.format(''.join([_render_bar(i, lbl, val, max_val) for i, (lbl, val) in enumerate(zip(labels, values))]))
+
+
+# --- /figures/{hash}.svg ---
+# Hash -> (kind, params). Hashes depend only on the parameters, so a hash
+# missing here (another worker, or a restart) is recovered by re-enumerating
+# every figure the generators can draw.
+_registry: "OrderedDict[str, Tuple[str, tuple]]" = OrderedDict()
+_registry_lock = threading.Lock()
+_MAX_REGISTERED = 65536
+
+def figure_hash(kind: str, params: tuple) -> str:
+    canonical = json.dumps([TEMPLATE_VERSION, kind, params], separators=(",", ":"))
+    return hashlib.sha1(canonical.encode()).hexdigest()[:16]
+
+@lru_cache(maxsize=4096)
+def _register(kind: str, params: tuple) -> str:
+    h = figure_hash(kind, params)
+    with _registry_lock:
+        _registry[h] = (kind, params)
+        if len(_registry) > _MAX_REGISTERED:
+            _registry.popitem(last=False)
+    return h
+
+def _figure_tag(kind: str, params: tuple, inline_svg) -> str:
+    if FIGURE_MODE == 'url':
+        return f'<img src="/figures/{_register(kind, params)}.svg" {_IMG[kind]} alt="">'
+    return inline_svg(*params)
+
+def _enumerate_figures():
+    """Every (kind, params) the generators can produce: geometry dims and bar values 20..90 per DI topic."""
+    from math_utils import load_scenarios
+    for w in range(5, 18):
+        for h in range(3, 11):
+            yield 'rectangle', (w, h)
+    for s in range(4, 13):
+        yield 'square', (s,)
+    for r in range(3, 10):
+        yield 'circle', (r,)
+    topics = load_scenarios()['di_topics']
+    for labels in {tuple(t['labels']) for t in topics}:
+        for n in range(8 ** len(labels)):
+            yield 'bar_chart', (labels, tuple(20 + 10 * (n // 8 ** k % 8) for k in range(len(labels))))
+
+@lru_cache(maxsize=1)
+def _all_figures() -> Dict[str, Tuple[str, tuple]]:
+    return {figure_hash(k, p): (k, p) for k, p in _enumerate_figures()}
+
+@lru_cache(maxsize=1024)
+def _standalone_svg(kind: str, params: tuple) -> str:
+    svg = bar_chart_svg(*params) if kind == 'bar_chart' else geometry_svg(kind, params)
+    return svg.replace('<svg ', '<svg ' + SVG_NS, 1)
+
+def figure_svg(figure_id: str) -> Optional[str]:
+    """Standalone SVG document for a figure hash, or None if no figure has it."""
+    with _registry_lock:
+        entry = _registry.get(figure_id)
+    entry = entry or _all_figures().get(figure_id)
+    return _standalone_svg(*entry) if entry else None
+
+
+# --- QUESTION MARKUP ---
+def render_geometry(shape: str, mode: str, dims: Tuple[int, ...]) -> str:
+    before, after = _GEOMETRY_HTML[shape]
+    return before + _figure_tag(shape, tuple(dims), lambda *d: geometry_svg(shape, d)) + after.format(mode.title())
+
+def render_bar_chart(title: str, labels: List[str], values: List[int], text: str) -> str:
+    before, after = _BAR_CHART_HTML
+    return before.format(title) + _figure_tag('bar_chart', (tuple(labels), tuple(values)), bar_chart_svg) + after.format(text)
@@ -0,0 +1,198 @@
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from blueprints import answer_key
+
+# Integer answers must match to within NUMERIC_TOLERANCE (as the quiz page
+# always allowed); decimal answers (frac2dec, geometry areas) may also be off
+# by DECIMAL_TOLERANCE of the answer, so 3.14 vs math.pi rounding is accepted.
+NUMERIC_TOLERANCE = 0.01
+DECIMAL_TOLERANCE = 1e-3
+
+NO_ANSWER = "No Answer"
+
+
+# --- ANSWER KINDS ---
+def answer_kind(question_type: str, category: Optional[str] = None, question_text: str = "") -> str:
+    """dual, numeric, factors, fraction or text. Older attempts only have the question text to go on."""
+    if question_type == 'dual':
+        return 'dual'
+    if question_type == 'single':
+        return 'numeric'
+    if category == 'Factors' or 'prime factors' in question_text:
+        return 'factors'
+    if (category or '').startswith('Fractions') or 'fraction' in question_text:
+        return 'fraction'
+    return 'text'
+
+
+# --- NORMALIZATION ---
+def _number(value: Any) -> float:
+    try:
+        return float(str(value).strip())
+    except (TypeError, ValueError):
+        return math.nan
+
+def _part(value: Any, name: str) -> float:
+    return _number(value.get(name)) if isinstance(value, dict) else math.nan
+
+def _factors(value: Any) -> Optional[str]:
+    """'7, 2,2' -> '2,2,7': order-insensitive, but repeated factors still count."""
+    try:
+        return ','.join(map(str, sorted(int(p) for p in str(value).split(',') if p.strip())))
+    except ValueError:
+        return None
+
+def _fraction(value: Any) -> str:
+    return ''.join(str(value).split())
+
+def _text(value: Any) -> str:
+    return ' '.join(str(value).split()).casefold()
+
+_NORMALIZERS = {'factors': _factors, 'fraction': _fraction, 'text': _text}
+
+
+# --- GRADING ---
+def grade(kinds: Sequence[str], correct: Sequence[Any], user: Sequence[Any]) -> np.ndarray:
+    """
+    Vectorized answer check: one bool per (kind, correct answer, user answer).
+    Answers are parsed once into arrays per kind and compared in bulk, so
+    re-scoring a whole history costs one pass rather than one call per question.
+    """
+    kinds = np.asarray(kinds, dtype=object)
+    ok = np.zeros(len(kinds), dtype=bool)
+    unanswered = np.array([u is None or u == NO_ANSWER for u in user], dtype=bool)
+
+    idx = np.flatnonzero(kinds == 'numeric')
+    if idx.size:
+        c = np.array([_number(correct[i]) for i in idx])
+        u = np.array([_number(user[i]) for i in idx])
+        tol = np.where(np.mod(c, 1) == 0, NUMERIC_TOLERANCE, np.maximum(NUMERIC_TOLERANCE, np.abs(c) * DECIMAL_TOLERANCE))
+        ok[idx] = np.abs(u - c) < tol   # NaN (unparseable) compares False
+
+    idx = np.flatnonzero(kinds == 'dual')
+    if idx.size:
+        c = np.array([[_part(correct[i], 'quotient'), _part(correct[i], 'remainder')] for i in idx]).reshape(-1, 2)
+        u = np.array([[_part(user[i], 'quotient'), _part(user[i], 'remainder')] for i in idx]).reshape(-1, 2)
+        ok[idx] = (u == c).all(axis=1)
+
+    for kind, normalize in _NORMALIZERS.items():
+        idx = np.flatnonzero(kinds == kind)
+        if idx.size:
+            c = np.array([normalize(correct[i]) for i in idx], dtype=object)
+            u = np.array([normalize(user[i]) for i in idx], dtype=object)
+            ok[idx] = (u == c) & (c != None)   # noqa: E711 -- elementwise
+
+    return ok & ~unanswered
+
+
+def _summary(details: List[Dict[str, Any]], score: int) -> Dict[str, Any]:
+    total = len(details)
+    return {
+        "score_obtained": score,
+        "total_questions": total,
+        "percentage": round(score / total * 100, 2) if total else 0.0,
+        "total_time_seconds": sum(q.get("time_spent", 0) for q in details)
+    }
+
+
+def grade_submission(quiz_id: str, answers: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Grades submitted answers against the answer key regenerated from the
+    quiz descriptor. Whatever the client claims about correctness is ignored.
+    Questions the client left out are recorded as unanswered.
+    """
+    key = answer_key(quiz_id)
+    by_id = {a["question_id"]: a for a in answers}
+    unknown = set(by_id) - set(key)
+    if unknown:
+        raise ValueError(f"Questions not in this quiz: {', '.join(map(str, sorted(unknown)))}")
+
+    details = []
+    for qid, entry in key.items():
+        answer = by_id.get(qid, {})
+        user_answer = answer.get("user_answer")
+        details.append({
+            "question_id": qid,
+            "question_text": entry["question_text"],
+            "question_type": entry["type"],
+            "category": entry["category"],
+            "user_answer": NO_ANSWER if user_answer is None else user_answer,
+            "correct_answer": entry["correct_answer"],
+            "is_correct": False,
+            "time_spent": answer.get("time_spent", 0)
+        })
+
+    ok = grade([answer_kind(e["type"], e["category"]) for e in key.values()],
+               [d["correct_answer"] for d in details], [d["user_answer"] for d in details])
+    for d, correct in zip(details, ok.tolist()):
+        d["is_correct"] = correct
+    return {"quiz_id": quiz_id, "summary": _summary(details, int(ok.sum())), "details": details}
+
+
+def regrade(records: Dict[str, Dict[str, Any]]) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+    """
+    Re-scores stored attempts in one vectorized pass, e.g. after the
+    normalization rules above change. Attempts with a regenerable quiz_id
+    are checked against a fresh answer key; older ones against the answer
+    stored with them. Returns (regraded records, keys whose grading changed).
+    """
+    kinds, correct, user, owner = [], [], [], []
+    keys = list(records)
+    for n, k in enumerate(keys):
+        record = records[k]
+        try:
+            fresh = answer_key(record["quiz_id"]) if record.get("quiz_id") else {}
+        except ValueError:
+            fresh = {}
+        for q in record["details"]:
+            entry = fresh.get(q["question_id"])
+            kinds.append(answer_kind(q["question_type"], q.get("category"), q.get("question_text", "")))
+            correct.append(entry["correct_answer"] if entry else q.get("correct_answer"))
+            user.append(q.get("user_answer"))
+            owner.append(n)
+
+    ok = grade(kinds, correct, user)
+    scores = np.bincount(np.asarray(owner, dtype=np.intp), weights=ok, minlength=len(keys)).astype(int).tolist()
+
+    out, changed = {}, []
+    pos = 0
+    for n, k in enumerate(keys):
+        record = records[k]
+        details = []
+        for q in record["details"]:
+            details.append({**q, "correct_answer": correct[pos], "is_correct": bool(ok[pos])})
+            pos += 1
+        regraded = {**record, "summary": _summary(details, scores[n]), "details": details}
+        if regraded["summary"] != record["summary"] or details != record["details"]:
+            changed.append(k)
+        out[k] = regraded
+    return out, changed
+
+
+if __name__ == "__main__":
+    import sys
+    from skills import SkillModel
+    from stats import DashboardStats
+    from storage import open_store
+
+    if len(sys.argv) < 2 or sys.argv[1] != "regrade":
+        print("Usage: python grading.py regrade [--dry-run]")
+        sys.exit(1)
+    store = open_store()
+    rewrites, total = [], 0
+    for user_id in store.users():
+        regraded, changed = regrade(store.load(user_id))
+        rewrites.extend((k, regraded[k], user_id) for k in changed)
+        total += len(regraded)
+    print(f"{len(rewrites)} of {total} attempts grade differently under the current rules.")
+    if rewrites and "--dry-run" not in sys.argv:
+        store.append_many(rewrites)
+        store.close()
+        store = open_store()
+        DashboardStats().rebuild(store)
+        SkillModel().rebuild(store)   # ratings were folded from the old grades too
+        store.close()
+        print("Rewrote them and rebuilt stats.json and skills.json.")
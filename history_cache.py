@@ -0,0 +1,89 @@
+import hashlib
+import json
+import secrets
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+from storage import ResultsStore
+
+MAX_ENTRIES = 64
+
+
+class HistoryCache:
+    """
+    Serialized /api/history bodies, reused until the history changes. An
+    entry is valid for one store version: a generation counter bumped after
+    every write from this process, and the store's change token for the
+    requesting user, which also moves on writes from other processes (see
+    each backend's change_token). The version also makes a strong ETag, so
+    unchanged history costs a 304; it includes a per-process nonce, since
+    generations restart at 0 in every worker. A store without a change
+    token can't see other processes' writes, so its bodies are neither
+    cached nor given ETags.
+    """
+
+    def __init__(self, store: ResultsStore, max_entries: int = MAX_ENTRIES):
+        self.store = store
+        self.max_entries = max_entries
+        self.generation = 0
+        self.nonce = secrets.token_hex(4)
+        self._entries: "OrderedDict[Hashable, Tuple[str, bytes]]" = OrderedDict()
+        self._building: dict = {}   # params -> lock held while that body is being built
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self):
+        """Call after writing to the store."""
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def version(self, user_id: str = "guest") -> Optional[str]:
+        token = self.store.change_token(user_id)
+        if token is None:
+            return None
+        return f"{self.nonce}:{self.generation}:{token}"
+
+    def get(self, params: Hashable, build: Callable[[], Any], user_id: str = "guest") -> Tuple[bytes, Optional[str]]:
+        """(body, etag) for one user's request; `build` is only called when the cached body is stale."""
+        version = self.version(user_id)  # read before building, so a write during the build just makes the entry stale
+        if version is None:
+            self.misses += 1
+            return json.dumps(build(), separators=(",", ":")).encode("utf-8"), None
+        body = self._lookup(params, version)
+        if body is None:
+            # One build per request shape: concurrent misses right after a write wait for it instead of repeating it.
+            with self._lock:
+                build_lock = self._building.setdefault(params, threading.Lock())
+            with build_lock:
+                body = self._lookup(params, version)
+                if body is None:
+                    self.misses += 1
+                    try:
+                        body = json.dumps(build(), separators=(",", ":")).encode("utf-8")
+                    finally:
+                        with self._lock:
+                            self._building.pop(params, None)
+                    with self._lock:
+                        self._entries[params] = (version, body)
+                        self._entries.move_to_end(params)
+                        while len(self._entries) > self.max_entries:
+                            self._entries.popitem(last=False)
+        return body, self.etag(version, params)
+
+    def _lookup(self, params: Hashable, version: str):
+        with self._lock:
+            entry = self._entries.get(params)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(params)
+            self.hits += 1
+            return entry[1]
+
+    @staticmethod
+    def etag(version: Optional[str], params: Hashable) -> Optional[str]:
+        if version is None:
+            return None
+        return '"' + hashlib.sha1(repr((version, params)).encode()).hexdigest()[:20] + '"'
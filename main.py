@@ -1,22 +1,163 @@
-from fastapi import FastAPI, Request, Body
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, Request, Body, Query, HTTPException
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
-from typing import List, Any
+from pydantic import BaseModel, Field
+from typing import Annotated, List, Any, Iterable, Optional, Literal
 from datetime import datetime
+from contextlib import asynccontextmanager
+import asyncio
 import json
-import os
-import uvicorn
-from math_utils import MathGenerator
+import time
+from blueprints import STANDARD, new_seed, encode_descriptor, generate_quiz, blueprint_from_params
+from figures import figure_svg
+from math_utils import load_scenarios
+from numtheory import get_index
+from grading import grade_submission
+from storage import USER_ID_PATTERN, StoreBusy, attempt_key, open_store
+from stats import DashboardStats
+from skills import SkillModel
+from quiz_pool import QuizPool
+from results_writer import ResultsWriter
+from history_cache import HistoryCache
+from events import EventBroker
+import metrics
+from metrics import Gauge, MetricsMiddleware, TEMPLATE_SECONDS, TimedStore
 
-app = FastAPI()
+def build_quiz(blueprint=STANDARD):
+    quiz_id = encode_descriptor(new_seed(), blueprint)
+    return {"quiz_id": quiz_id, "questions": generate_quiz(quiz_id)}
+
+quiz_pool = QuizPool(build_quiz)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Before the worker takes traffic, so no request pays for cold caches.
+    await asyncio.to_thread(warmup)
+    refill_task = asyncio.create_task(quiz_pool.run())
+    writer_task = asyncio.create_task(results_writer.run())
+    yield
+    refill_task.cancel()
+    await results_writer.drain()
+    writer_task.cancel()
+    events.close()         # ends open /api/events streams
+    results_store.close()  # flushes batched or write-behind submissions
+    metrics.profiler.stop()
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
 
 templates = Jinja2Templates(directory="templates")
 
-if not os.path.exists("static"):
-    os.makedirs("static")
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", StaticFiles(directory="static", check_dir=False), name="static")
+
+# Backend picked by RESULTS_BACKEND (jsonl, sqlite, cosmos); the old results.json is imported on first use.
+results_store = TimedStore(open_store())
+
+# Running aggregates for the dashboard; restored (or rebuilt from the store) by warmup().
+dashboard_stats = DashboardStats("stats.json")
+
+# Per-category skill ratings for adaptive quizzes; likewise.
+skill_model = SkillModel("skills.json")
+
+# Serialized /api/history responses, dropped whenever the history changes.
+history_cache = HistoryCache(results_store)
+
+def before_write(batch):
+    dashboard_stats.before_write(results_store, {user_id for _, _, user_id in batch})
+
+def after_write(batch):
+    dashboard_stats.written(results_store, batch)   # folds the batch in; replays users other workers wrote for
+    dashboard_stats.save()
+    skill_model.save()
+    history_cache.invalidate()
+
+# Live dashboard updates, streamed from /api/events.
+events = EventBroker()
+
+def publish_written(batch):
+    # Published once written, so a client that reacts by fetching /api/history already sees the attempt.
+    for key, record, user_id in batch:
+        events.publish("submission", {"key": key, "summary": record["summary"]}, user_id)
+    for user_id in {user_id for _, _, user_id in batch}:
+        events.publish("stats", dashboard_stats.snapshot(user_id), user_id)   # once per user per batch
+
+# Sole writer of results_store: submits are queued and written in bursts, off the event loop.
+results_writer = ResultsWriter(results_store, before_write=before_write, after_write=after_write,
+                               on_written=publish_written)
+
+# Scraped from /metrics alongside the request, generator and store histograms.
+Gauge("mathfun_quiz_pool_depth", "Ready quizzes in the pool.", lambda: quiz_pool.metrics()["depth"])
+Gauge("mathfun_quiz_pool_hits_total", "Quizzes served from the pool.", lambda: quiz_pool.hits, kind="counter")
+Gauge("mathfun_quiz_pool_misses_total", "Quizzes built inline because the pool was empty.",
+      lambda: quiz_pool.misses, kind="counter")
+Gauge("mathfun_results_write_queue_depth", "Submissions waiting for the results writer.",
+      lambda: results_writer.metrics()["queued"])
+Gauge("mathfun_results_written_total", "Submissions written to the results store.",
+      lambda: results_writer.written, kind="counter")
+Gauge("mathfun_results_write_batches_total", "append_many() batches written.",
+      lambda: results_writer.batches, kind="counter")
+Gauge("mathfun_results_dead_lettered_total", "Submissions the results store rejected, set aside in the dead-letter file.",
+      lambda: results_writer.dead_lettered, kind="counter")
+Gauge("mathfun_history_cache_hits_total", "/api/history bodies served from cache.",
+      lambda: history_cache.hits, kind="counter")
+Gauge("mathfun_history_cache_misses_total", "/api/history bodies rebuilt.",
+      lambda: history_cache.misses, kind="counter")
+Gauge("mathfun_event_subscribers", "Open /api/events streams.", lambda: events.subscribers)
+Gauge("mathfun_events_published_total", "Server-sent events published.", lambda: events.published, kind="counter")
+
+warmup_seconds = 0.0
+Gauge("mathfun_warmup_seconds", "Time the last startup warmup took.", lambda: warmup_seconds)
+
+def warmup():
+    """
+    Slow one-time setup, run from the lifespan rather than at import so
+    that importing main stays cheap: opening the store (a JSONL scan or
+    a Cosmos connection), restoring the sidecar aggregates, and priming
+    the scenario data, number-theory index and templates.
+    """
+    global warmup_seconds
+    start = time.perf_counter()
+    results_store.warm()
+    if not dashboard_stats.load():
+        dashboard_stats.rebuild(results_store)
+    if not skill_model.load():
+        skill_model.rebuild(results_store)
+    load_scenarios()
+    get_index()
+    for name in ("quiz.html", "dashboard.html"):
+        templates.get_template(name)
+    warmup_seconds = time.perf_counter() - start
+
+def render(template: str, context):
+    with TEMPLATE_SECONDS.time(template=template):
+        return templates.TemplateResponse(template, context)
+
+def revalidate_headers(etag: Optional[str]):
+    # Always revalidate; a match costs a 304. No ETag when the store can't tell whether history changed.
+    headers = {"Cache-Control": "no-cache"}
+    if etag:
+        headers["ETag"] = etag
+    return headers
+
+NDJSON_CHUNK_BYTES = 64 * 1024
+
+def ndjson(rows: Iterable, chunk_bytes: int = NDJSON_CHUNK_BYTES):
+    """
+    One {"key": ..., **record} line per attempt (the JSONL store's own
+    format), serialized as the rows arrive and sent in ~64 KB chunks
+    rather than one tiny write per line.
+    """
+    chunk, size = [], 0
+    for key, record in rows:
+        line = (json.dumps({"key": key, **record}, separators=(",", ":")) + "\n").encode("utf-8")
+        chunk.append(line)
+        size += len(line)
+        if size >= chunk_bytes:
+            yield b"".join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield b"".join(chunk)
 
 # --- DATA MODELS ---
 
@@ -26,69 +167,186 @@ class QuizSummary(BaseModel):
     percentage: float
     total_time_seconds: int
 
+MAX_TIME_SPENT = 24 * 60 * 60   # seconds on one question; analytics packs times into uint32 columns
+
 class QuestionResult(BaseModel):
     question_id: int
-    question_text: str
-    question_type: str
+    question_text: str = ""
+    question_type: str = ""
     category: str = "General"  # <--- NEW FIELD (Default ensures compatibility)
-    user_answer: Any
-    correct_answer: Any
-    is_correct: bool
-    time_spent: int
+    user_answer: Any = None
+    correct_answer: Any = None  # ignored: the server grades against its own answer key
+    is_correct: bool = False    # ignored, as above
+    time_spent: int = Field(0, ge=0, le=MAX_TIME_SPENT)
 
 class QuizSubmission(BaseModel):
-    summary: QuizSummary
+    quiz_id: str  # quiz descriptor (see blueprints); regenerates the quiz and its answer key
+    user_id: str = Field("guest", pattern=USER_ID_PATTERN)  # whose history this joins; its storage partition
+    summary: Optional[QuizSummary] = None  # ignored: recomputed from the graded answers
     details: List[QuestionResult]
 
 # --- ROUTES ---
 
+# Every per-user route takes ?user_id= (default "guest"); there are no accounts, so it is taken on trust.
+UserId = Annotated[str, Query(pattern=USER_ID_PATTERN)]
+
 @app.get("/", response_class=HTMLResponse)
-def dashboard(request: Request):
-    return templates.TemplateResponse("dashboard.html", {"request": request})
+def dashboard(request: Request, user_id: UserId = "guest"):
+    return render("dashboard.html", {"request": request, "user_id": user_id})
 
 @app.get("/quiz", response_class=HTMLResponse)
-def quiz_view(request: Request):
-    generator = MathGenerator()
-    questions = generator.generate_all()
-    
-    for q in questions:
-        if isinstance(q['correct_answer'], float):
-            q['correct_answer'] = round(q['correct_answer'], 4)
-            
-    return templates.TemplateResponse("quiz.html", {"request": request, "questions": questions})
+def quiz_view(
+    request: Request,
+    blueprint: Optional[str] = None,
+    categories: Optional[str] = None,
+    count: int = Query(2, ge=1, le=20),
+    weights: Optional[str] = None,
+    total: Optional[int] = Query(None, ge=1),
+    difficulty: Optional[str] = None,
+    adaptive: bool = False,
+    user_id: UserId = "guest",
+):
+    try:
+        if adaptive:
+            # Categories and levels come from the skill model: an O(categories) lookup, no history scan.
+            if blueprint or categories or weights or difficulty:
+                raise ValueError("adaptive quizzes pick their own categories and difficulty")
+            bp = skill_model.blueprint(user_id, total=total)
+        else:
+            bp = blueprint_from_params(blueprint, categories, count, weights, total, difficulty)
+        # The pool only holds standard quizzes; drills are generated on demand, and only what they ask for.
+        quiz = quiz_pool.pop() if bp is STANDARD else build_quiz(bp)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Answers stay on the server, which grades the submission.
+    questions = [{k: v for k, v in q.items() if k != "correct_answer"} for q in quiz["questions"]]
+    return render("quiz.html", {"request": request, "quiz_id": quiz["quiz_id"], "questions": questions,
+                                "user_id": user_id})
+
+@app.get("/figures/{figure_id}.svg")
+def get_figure(figure_id: str, request: Request):
+    # Figure ids are content hashes, so the id doubles as a strong ETag and the body never changes.
+    svg = figure_svg(figure_id)
+    if svg is None:
+        raise HTTPException(status_code=404, detail="Unknown figure")
+    headers = {"ETag": f'"{figure_id}"', "Cache-Control": "public, max-age=31536000, immutable"}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=svg, media_type="image/svg+xml", headers=headers)
 
 @app.get("/api/history")
-def get_history():
-    file_path = "results.json"
-    if not os.path.exists(file_path):
-        return {}
-    
+def get_history(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    fields: Literal["full", "summary"] = "full",
+    output: Literal["json", "ndjson"] = Query("json", alias="format"),
+    user_id: UserId = "guest",
+):
+    # Attempt keys are naive local time, so compare against naive local time too.
+    since, until = [t.astimezone().replace(tzinfo=None) if t and t.tzinfo else t for t in (since, until)]
+
+    # format=ndjson: the whole window, one attempt per line, streamed from the store without building the body.
+    if output == "ndjson":
+        if limit is not None or cursor is not None:
+            raise HTTPException(status_code=400, detail="format=ndjson streams the whole window; use since/until")
+        etag = history_cache.etag(history_cache.version(user_id), ("ndjson", user_id, since, until, fields))
+        headers = revalidate_headers(etag)
+        if etag and request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+        rows = results_store.stream(since, until, summary=fields == "summary", user_id=user_id)
+        return StreamingResponse(ndjson(rows), media_type="application/x-ndjson", headers=headers)
+
+    def build():
+        # No limit/cursor: the original response, a single { key: attempt } dict.
+        if limit is None and cursor is None:
+            if since or until:
+                history = results_store.query(since, until, user_id=user_id)
+            else:
+                history = results_store.load(user_id)
+            if fields == "summary":
+                history = {k: {"summary": v["summary"]} for k, v in history.items()}
+            return history
+        items, next_cursor = results_store.page(since, until, cursor, limit or 50, summary=fields == "summary",
+                                                user_id=user_id)
+        return {"items": items, "next_cursor": next_cursor}
+
     try:
-        with open(file_path, "r") as f:
-            data = json.load(f)
-        return data
-    except json.JSONDecodeError:
-        return {}
+        body, etag = history_cache.get((user_id, limit, cursor, since, until, fields), build, user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = revalidate_headers(etag)
+    if etag and request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
-@app.post("/api/submit")
-async def submit_quiz(submission: QuizSubmission):
-    timestamp_key = datetime.now().strftime("%d-%m-%y-%H-%M")
-    file_path = "results.json"
-    db = {}
-    
-    if os.path.exists(file_path):
-        try:
-            with open(file_path, "r") as f:
-                db = json.load(f)
-        except json.JSONDecodeError:
-            db = {}
+@app.get("/api/events")
+async def get_events(request: Request, user_id: UserId = "guest"):
+    # Server-sent events: "submission" per written attempt, "stats" (the /api/stats body) per written batch.
+    await asyncio.to_thread(dashboard_stats.refresh, results_store, user_id)
+    stream = events.stream(user_id, request.headers.get("last-event-id"),
+                           initial=("stats", dashboard_stats.snapshot(user_id)))
+    return StreamingResponse(stream, media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/api/pool")
+def get_pool_metrics():
+    return quiz_pool.metrics()
+
+@app.get("/api/stats")
+def get_stats(user_id: UserId = "guest"):
+    dashboard_stats.refresh(results_store, user_id)
+    return dashboard_stats.snapshot(user_id)
+
+@app.get("/api/skills")
+def get_skills(user_id: UserId = "guest"):
+    return skill_model.profile(user_id)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
-    db[timestamp_key] = submission.model_dump()
+# Sampling profiler: only routed when PROFILER_ENABLED=1. GET returns collapsed stacks for a flame graph.
+if metrics.PROFILER_ENABLED:
+    @app.post("/debug/profiler")
+    def toggle_profiler(enabled: bool, reset: bool = False):
+        if reset:
+            metrics.profiler.reset()
+        if enabled:
+            metrics.profiler.start()
+        else:
+            metrics.profiler.stop()
+        return {"running": metrics.profiler.running, "samples": metrics.profiler.samples}
 
-    with open(file_path, "w") as f:
-        json.dump(db, f, indent=4)
+    @app.get("/debug/profiler", response_class=PlainTextResponse)
+    def get_profile():
+        return metrics.profiler.collapsed()
 
-    return JSONResponse(content={"status": "success", "key": timestamp_key})
+@app.post("/api/submit")
+async def submit_quiz(submission: QuizSubmission):
+    try:
+        record = grade_submission(submission.quiz_id, [q.model_dump() for q in submission.details])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    key = attempt_key()   # unique per submit; two in the same minute used to overwrite each other
+    user_id = submission.user_id
+    try:
+        results_writer.submit(key, record, user_id)
+    except StoreBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    skill_model.update(record, user_id)   # saved by the writer after the batch; stats are folded in once written
+    return JSONResponse(content={
+        "status": "success",
+        "key": key,
+        "summary": record["summary"],
+        "results": [{"question_id": q["question_id"], "is_correct": q["is_correct"],
+                     "correct_answer": q["correct_answer"]} for q in record["details"]]
+    })
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    import uvicorn
+    # Bounds how long shutdown waits for open /api/events streams.
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True, timeout_graceful_shutdown=5)
\ No newline at end of file
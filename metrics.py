@@ -0,0 +1,299 @@
+import bisect
+import math
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds; wide enough for a cached 304 and for a full-history rebuild.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Single generator calls are mostly microseconds; the SVG builders reach into milliseconds.
+FAST_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1)
+
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "0") == "1"
+PROFILER_INTERVAL = float(os.getenv("PROFILER_INTERVAL", "0.005"))
+
+REGISTRY: List["_Metric"] = []
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[Any]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple:
+        return tuple(labels[name] for name in self.label_names)
+
+    def labels(self, *values):
+        """The series for these label values; hot paths keep it rather than passing labels on every call."""
+        with self._lock:
+            child = self._series.get(values)
+            if child is None:
+                child = self._series[values] = self._child()
+            return child
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        raise NotImplementedError
+
+    def exposition(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{name}{labels} {_number(value)}" for name, labels, value in self.samples())
+        return "\n".join(lines)
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram; its _count series doubles as a call counter."""
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple, _HistogramChild] = {}
+
+    def _child(self):
+        return _HistogramChild(self._lock, self.buckets)
+
+    def observe(self, value: float, **labels):
+        self.labels(*self._key(labels)).observe(value)
+
+    def time(self, **labels):
+        return self.labels(*self._key(labels)).time()
+
+    def samples(self):
+        with self._lock:
+            series = sorted((key, (list(child.counts), child.total)) for key, child in self._series.items())
+        names = self.label_names + ("le",)
+        for key, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", _labels(names, key + (_number(bound),)), cumulative
+            yield f"{self.name}_sum", _labels(self.label_names, key), total
+            yield f"{self.name}_count", _labels(self.label_names, key), cumulative
+
+
+class _HistogramChild:
+    __slots__ = ("_lock", "_buckets", "counts", "total")
+
+    def __init__(self, lock, buckets):
+        self._lock = lock
+        self._buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # per bucket, not cumulative; the last is +Inf
+        self.total = 0.0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.total += value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Gauge(_Metric):
+    """A value read from `fn` at scrape time, e.g. a queue depth or a counter some other object keeps."""
+
+    def __init__(self, name: str, help: str, fn: Callable[[], float], kind: str = "gauge"):
+        super().__init__(name, help)
+        self.fn = fn
+        self.kind = kind
+
+    def samples(self):
+        yield self.name, "", self.fn()
+
+
+def render() -> str:
+    """Every registered metric in the Prometheus text format (version 0.0.4)."""
+    return "\n".join(metric.exposition() for metric in REGISTRY) + "\n"
+
+
+# --- METRICS ---
+HTTP_REQUEST_SECONDS = Histogram("mathfun_http_request_duration_seconds",
+                                 "Time to serve a request, by route template.", ("method", "route", "status"))
+GENERATOR_SECONDS = Histogram("mathfun_generator_duration_seconds",
+                              "Time per MathGenerator.generate_<name>() call; _count is the call counter.", ("generator",), FAST_BUCKETS)
+SCENARIO_LOAD_SECONDS = Histogram("mathfun_scenarios_load_seconds",
+                                  "Time to parse and validate scenarios.json (once per process).", (), FAST_BUCKETS)
+TEMPLATE_SECONDS = Histogram("mathfun_template_render_seconds",
+                             "Time to render a Jinja template.", ("template",))
+STORE_SECONDS = Histogram("mathfun_store_operation_duration_seconds",
+                          "Time per results store call.", ("backend", "operation"))
+
+
+# --- ASGI MIDDLEWARE ---
+class MetricsMiddleware:
+    """
+    Times every HTTP request into HTTP_REQUEST_SECONDS. Requests are
+    labelled with the matched route's template (/figures/{figure_id}.svg),
+    not the raw path, so label cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        root_path = scope.get("root_path", "")
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, method=scope["method"],
+                                         route=self._route(scope, root_path), status=status)
+
+    @staticmethod
+    def _route(scope, root_path: str) -> str:
+        # The router fills in the scope it was given: "route" for endpoints, a longer root_path for mounts.
+        route = scope.get("route")
+        if route is not None and getattr(route, "path", None):
+            return route.path
+        if scope.get("root_path", "") != root_path:
+            return scope["root_path"][len(root_path):] + "/{path}"
+        return "unmatched"
+
+
+# --- STORE TIMINGS ---
+class TimedStore:
+    """
+    Wraps a ResultsStore so its reads and writes land in STORE_SECONDS;
+    everything else passes through. A stream() is timed across the whole
+    iteration, counting only the time spent inside the store, not in the
+    caller's loop body.
+    """
+
+    TIMED = frozenset({"append", "append_many", "load", "query", "page", "stream", "summary_stats",
+                       "category_stats", "flush", "compact"})
+    STREAMED = frozenset({"stream"})
+
+    def __init__(self, store):
+        self._store = store
+        self._backend = type(store).__name__
+
+    def __getattr__(self, name):
+        attr = getattr(self._store, name)
+        if name not in self.TIMED:
+            return attr
+
+        series = STORE_SECONDS.labels(self._backend, name)
+        if name in self.STREAMED:
+            return lambda *args, **kwargs: _timed_iter(attr(*args, **kwargs), series)
+
+        def timed(*args, **kwargs):
+            with series.time():
+                return attr(*args, **kwargs)
+        return timed
+
+
+def _timed_iter(iterator, series):
+    iterator = iter(iterator)
+    spent = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                spent += time.perf_counter() - start
+            yield item
+    finally:
+        series.observe(spent)
+
+
+# --- SAMPLING PROFILER ---
+class SamplingProfiler:
+    """
+    Opt-in statistical profiler: a daemon thread snapshots every other
+    thread's stack each `interval` seconds and tallies them. collapsed()
+    returns the "frame;frame;frame count" lines that flamegraph.pl and
+    speedscope read. Costs nothing until start() is called.
+    """
+
+    def __init__(self, interval: float = PROFILER_INTERVAL):
+        self.interval = interval
+        self._stacks = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.samples = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def reset(self):
+        self._stacks = Counter()
+        self.samples = 0
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self._stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+
+profiler = SamplingProfiler()
+Gauge("mathfun_profiler_samples_total", "Stack samples taken by the sampling profiler.",
+      lambda: profiler.samples, kind="counter")
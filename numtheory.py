@@ -0,0 +1,114 @@
+import math
+import os
+import threading
+from functools import lru_cache
+from typing import List, Optional
+
+import numpy as np
+
+# Largest n the shared index covers; numbers above it still factor correctly, just by trial division.
+LIMIT = int(os.getenv("NUMTHEORY_LIMIT", str(10 ** 6)))
+# Optional prebuilt sieve (see `python numtheory.py build`), memory-mapped instead of rebuilt at startup.
+INDEX_PATH = os.getenv("NUMTHEORY_PATH", "spf.npy")
+
+
+def build_spf(limit: int) -> np.ndarray:
+    """Smallest-prime-factor sieve: spf[n] is the smallest prime dividing n (spf[0] = spf[1] = 0)."""
+    spf = np.zeros(limit + 1, dtype=np.uint32)
+    for p in range(2, math.isqrt(limit) + 1):
+        if spf[p] == 0:
+            multiples = spf[p * p::p]
+            multiples[multiples == 0] = p
+    primes = np.flatnonzero(spf == 0)
+    spf[primes[primes >= 2]] = primes[primes >= 2]
+    return spf
+
+
+class NumberTheoryIndex:
+    """
+    Prime factorizations and divisor lists in O(log n) per lookup, backed by
+    a smallest-prime-factor sieve. Built once per process, or memory-mapped
+    from a file written by save().
+    """
+
+    def __init__(self, spf: np.ndarray):
+        self.spf = spf
+        self.limit = len(spf) - 1
+        self.prime_factors = lru_cache(maxsize=65536)(self._prime_factors)
+        self.divisors = lru_cache(maxsize=4096)(self._divisors)
+
+    @classmethod
+    def build(cls, limit: int = LIMIT) -> "NumberTheoryIndex":
+        return cls(build_spf(limit))
+
+    @classmethod
+    def load(cls, path: str) -> "NumberTheoryIndex":
+        return cls(np.load(path, mmap_mode="r"))
+
+    def save(self, path: str):
+        np.save(path, np.asarray(self.spf))
+
+    def _prime_factors(self, n: int) -> List[int]:
+        """Prime factors with multiplicity, ascending: 12 -> [2, 2, 3]."""
+        factors = []
+        if n > self.limit:
+            i = 2
+            while i * i <= n and n > self.limit:
+                while n % i == 0:
+                    factors.append(i)
+                    n //= i
+                i += 1
+            if n > self.limit:
+                return factors + [n]   # no factor up to sqrt(n) left, so n is prime
+        while n > 1:
+            p = int(self.spf[n])
+            factors.append(p)
+            n //= p
+        return factors
+
+    def _divisors(self, n: int) -> List[int]:
+        """All divisors of n, ascending, including 1 and n."""
+        divs = [1]
+        factors = self.prime_factors(n)
+        i = 0
+        while i < len(factors):
+            p, k = factors[i], factors.count(factors[i])
+            divs = [d * p ** e for d in divs for e in range(k + 1)]
+            i += k
+        return sorted(divs)
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def lowest_terms(numer: int, denom: int) -> str:
+        g = math.gcd(numer, denom)
+        return f"{numer // g}/{denom // g}"
+
+
+_index: Optional[NumberTheoryIndex] = None
+_index_lock = threading.Lock()
+
+def get_index(limit: int = LIMIT) -> NumberTheoryIndex:
+    """The process-wide index, loaded from INDEX_PATH if present, else sieved on first use."""
+    global _index
+    if _index is None or _index.limit < limit:
+        with _index_lock:
+            if _index is None or _index.limit < limit:
+                index = None
+                if INDEX_PATH and os.path.exists(INDEX_PATH):
+                    index = NumberTheoryIndex.load(INDEX_PATH)
+                if index is None or index.limit < limit:
+                    index = NumberTheoryIndex.build(limit)
+                _index = index
+    return _index
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2 or sys.argv[1] != "build":
+        print("Usage: python numtheory.py build [limit] [path]")
+        sys.exit(1)
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else LIMIT
+    path = sys.argv[3] if len(sys.argv) > 3 else INDEX_PATH
+    NumberTheoryIndex.build(limit).save(path)
+    print(f"Wrote smallest-prime-factor sieve up to {limit} to {path}.")
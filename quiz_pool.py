@@ -0,0 +1,76 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Dict
+
+POOL_SIZE = int(os.getenv("QUIZ_POOL_SIZE", "32"))
+POOL_LOW_WATERMARK = int(os.getenv("QUIZ_POOL_LOW_WATERMARK", str(POOL_SIZE // 2)))
+
+
+class QuizPool:
+    """
+    Process-level pool of pre-built quizzes. /quiz pops from it; a
+    background task tops it back up to `size` whenever it drops below
+    `low_watermark`, so generator cost stays off the request path.
+    """
+
+    def __init__(self, factory: Callable[[], Dict[str, Any]],
+                 size: int = POOL_SIZE, low_watermark: int = POOL_LOW_WATERMARK):
+        self.factory = factory
+        self.size = size
+        self.low_watermark = min(low_watermark, size)
+        self._quizzes = deque()
+        self._wakeup = None
+        self._loop = None
+        self._built_at = deque(maxlen=100)   # completion times, for the refill rate
+        self.hits = 0
+        self.misses = 0
+        self.built = 0
+        self.build_seconds = 0.0
+
+    def pop(self) -> Dict[str, Any]:
+        """Takes a ready quiz, or builds one inline if the pool has run dry."""
+        try:
+            quiz = self._quizzes.popleft()
+            self.hits += 1
+        except IndexError:
+            self.misses += 1
+            quiz = self._build()
+        if len(self._quizzes) < self.low_watermark and self._loop is not None:
+            # pop() runs in FastAPI's threadpool; hand the wakeup to the loop that owns the Event.
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        return quiz
+
+    def _build(self) -> Dict[str, Any]:
+        start = time.perf_counter()
+        quiz = self.factory()
+        self.build_seconds += time.perf_counter() - start
+        self.built += 1
+        self._built_at.append(time.monotonic())
+        return quiz
+
+    async def run(self):
+        """Refill loop; start it as a background task from the app lifespan."""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._wakeup.set()
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while len(self._quizzes) < self.size:
+                # Generators are CPU-bound; keep them off the event loop.
+                self._quizzes.append(await asyncio.to_thread(self._build))
+
+    def metrics(self) -> Dict[str, Any]:
+        window = self._built_at[-1] - self._built_at[0] if len(self._built_at) > 1 else 0.0
+        return {
+            "depth": len(self._quizzes),
+            "size": self.size,
+            "low_watermark": self.low_watermark,
+            "hits": self.hits,
+            "misses": self.misses,
+            "built": self.built,
+            "refill_rate_per_second": round((len(self._built_at) - 1) / window, 2) if window > 0 else 0.0,
+            "avg_build_ms": round(self.build_seconds / self.built * 1000, 3) if self.built else 0.0
+        }
@@ -0,0 +1,172 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from storage import ResultsStore, StoreBusy
+
+QUEUE_SIZE = int(os.getenv("RESULTS_WRITE_QUEUE_SIZE", "1000"))
+MAX_BATCH = int(os.getenv("RESULTS_WRITE_MAX_BATCH", "256"))
+IDLE_FLUSH_SECONDS = float(os.getenv("RESULTS_IDLE_FLUSH_SECONDS", "1.0"))
+MAX_RETRIES = int(os.getenv("RESULTS_WRITE_MAX_RETRIES", "8"))   # ~20s of backoff
+# Submissions the store will not take (or not within MAX_RETRIES) are appended here instead of blocking the writer.
+DEAD_LETTER_PATH = os.getenv("RESULTS_DEAD_LETTER_PATH", "results.deadletter.jsonl")
+
+logger = logging.getLogger(__name__)
+
+
+class ResultsWriter:
+    """
+    Single writer for the results store. /api/submit only puts the attempt
+    on an asyncio.Queue; this task drains whatever has piled up, writes it
+    with one append_many() off the event loop, and keeps the store's
+    in-memory view current for readers. No two submits ever write at once.
+    `before_write` and `after_write` get each batch in the same worker
+    thread right before and once it is written, e.g. to persist
+    aggregates once per burst rather than once per submit;
+    `on_written` then gets the batch back on the event loop, once it is
+    readable from the store (e.g. to notify live dashboards). Once no
+    submit has arrived for `idle_flush` seconds, the store is flushed, so
+    the last batch before a quiet spell is not left waiting for its fsync.
+    A failed write is retried with backoff while the error looks transient
+    (I/O, a locked database, a full backend buffer), up to `max_retries`
+    times. A batch rejected for good is retried one row at a time, and
+    whatever still fails is dead-lettered, so one bad row never stalls
+    the queue behind it.
+    """
+
+    def __init__(self, store: ResultsStore, queue_size: int = QUEUE_SIZE, max_batch: int = MAX_BATCH,
+                 before_write: Optional[Callable[[List[Tuple[str, Dict[str, Any], str]]], None]] = None,
+                 after_write: Optional[Callable[[List[Tuple[str, Dict[str, Any], str]]], None]] = None,
+                 on_written: Optional[Callable[[List[Tuple[str, Dict[str, Any], str]]], None]] = None,
+                 idle_flush: float = IDLE_FLUSH_SECONDS, max_retries: int = MAX_RETRIES,
+                 dead_letter_path: str = DEAD_LETTER_PATH):
+        self.store = store
+        self.max_batch = max_batch
+        self.idle_flush = idle_flush
+        self.max_retries = max_retries
+        self.dead_letter_path = dead_letter_path
+        self.before_write = before_write
+        self.after_write = after_write
+        self.on_written = on_written
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self._unflushed = False
+        self.batches = 0
+        self.written = 0
+        self.largest_batch = 0
+        self.dead_lettered = 0
+
+    def submit(self, key: str, record: Dict[str, Any], user_id: str = "guest"):
+        """Queues one attempt. Raises StoreBusy if the writer has fallen that far behind."""
+        try:
+            self._queue.put_nowait((key, record, user_id))
+        except asyncio.QueueFull:
+            raise StoreBusy(f"Results writer is behind ({self._queue.qsize()} submissions queued)")
+
+    async def run(self):
+        """Writer loop; start it as a background task from the app lifespan."""
+        while True:
+            try:
+                batch = [await asyncio.wait_for(self._queue.get(), self.idle_flush if self._unflushed else None)]
+            except asyncio.TimeoutError:
+                await self._flush()
+                continue
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            await self._write(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    async def _write(self, batch):
+        error = await self._append(batch)
+        if error is not None:
+            if len(batch) > 1 and not _transient(error):
+                # Rejected for good: retry row by row, so only the rows to blame are dead-lettered.
+                written = []
+                for row in batch:
+                    row_error = await self._append([row])
+                    if row_error is None:
+                        written.append(row)
+                    else:
+                        self._dead_letter(row, row_error)
+                batch = written
+            else:
+                for row in batch:
+                    self._dead_letter(row, error)
+                batch = []
+            if not batch:
+                return
+        if self.after_write is not None:
+            try:
+                await asyncio.to_thread(self.after_write, batch)
+            except Exception:
+                logger.exception("after_write hook failed")
+        self._unflushed = True
+        self.batches += 1
+        self.written += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        if self.on_written is not None:
+            try:
+                self.on_written(batch)
+            except Exception:
+                logger.exception("on_written hook failed")
+
+    async def _flush(self):
+        try:
+            await asyncio.to_thread(self.store.flush)
+            self._unflushed = False
+        except Exception:
+            logger.exception("Flushing the results store failed; retrying when idle again")
+
+    async def _append(self, rows) -> Optional[Exception]:
+        """Writes rows, retrying transient errors; returns the last error if they never made it."""
+        delay = 0.1
+        for attempt in range(self.max_retries + 1):
+            try:
+                await asyncio.to_thread(self._append_sync, rows)
+                return None
+            except Exception as e:
+                if not _transient(e) or attempt == self.max_retries:
+                    logger.exception("Writing %d results failed", len(rows))
+                    return e
+                logger.warning("Writing %d results failed (%s); retrying in %.1fs", len(rows), e, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 5.0)
+
+    def _append_sync(self, rows):
+        if self.before_write is not None:
+            self.before_write(rows)
+        self.store.append_many(rows)
+
+    def _dead_letter(self, row, error: Exception):
+        key, record, user_id = row
+        self.dead_lettered += 1
+        logger.error("Results store rejected submission %s for user %s; dead-lettered to %s",
+                     key, user_id, self.dead_letter_path)
+        try:
+            with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"error": str(error), "key": key, "user_id": user_id,
+                                    "record": record}, separators=(",", ":"), default=repr) + "\n")
+        except Exception:
+            logger.exception("Dead-lettering submission %s failed; it is lost", key)
+
+    async def drain(self):
+        """Waits until everything submitted so far has been written."""
+        await self._queue.join()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "batches": self.batches,
+            "largest_batch": self.largest_batch,
+            "dead_lettered": self.dead_lettered,
+            "avg_batch": round(self.written / self.batches, 2) if self.batches else 0.0
+        }
+
+
+def _transient(error: Exception) -> bool:
+    """I/O errors, a locked SQLite database, a full write buffer; anything else means the store rejected the rows."""
+    return isinstance(error, (OSError, sqlite3.OperationalError, StoreBusy))
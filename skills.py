@@ -0,0 +1,153 @@
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from blueprints import GENERATOR_REGISTRY, STANDARD, TIERED_CATEGORIES, Blueprint, blueprint_for
+
+HALF_LIFE_DAYS = float(os.getenv("SKILL_HALF_LIFE_DAYS", "14"))
+TARGET_SUCCESS = 0.75        # pick the level where the user is expected to get about this share right
+LEVEL_OFFSETS = {'easy': -1.0, 'normal': 0.0, 'hard': 1.0}   # how much harder each level is, in rating units
+K_FACTOR = 0.4               # step size for a new category; shrinks as evidence accumulates
+MIN_K_FACTOR = 0.1
+MAX_RATING = 4.0
+SLOW_FACTOR = 2.0            # right, but over twice the usual time, counts as half right
+MIN_SHARE = 1                # every category keeps at least this many questions in an adaptive quiz
+
+
+def _sigmoid(x: float) -> float:
+    return 1.0 / (1.0 + math.exp(-x))
+
+
+class SkillModel:
+    """
+    Per-user, per-category skill ratings behind adaptive quizzes. A rating
+    is Elo-style in log-odds: a user with rating r answers a question at a
+    level with offset d correctly with probability sigmoid(r - d). Each
+    submit nudges the rating towards what happened; idle time decays it
+    (and the evidence behind it) towards the prior with a half-life, so
+    old results count less. Updates and lookups touch one entry per
+    category and never the raw history.
+    """
+
+    def __init__(self, path: str = "skills.json", half_life_days: float = HALF_LIFE_DAYS):
+        self.path = path
+        self.half_life = half_life_days * 86400
+        self._lock = threading.Lock()
+        # user_id -> category -> [rating, evidence, avg_time_spent, updated_at (epoch seconds)]
+        self.users: Dict[str, Dict[str, List[float]]] = {}
+
+    def _decayed(self, entry: List[float], now: float) -> Tuple[float, float]:
+        factor = 0.5 ** (max(0.0, now - entry[3]) / self.half_life)
+        return entry[0] * factor, entry[1] * factor
+
+    # --- UPDATES ---
+    def update(self, record: Dict[str, Any], user_id: str = "guest", when: Optional[datetime] = None):
+        """Folds one graded submission into the user's ratings: O(questions in the attempt)."""
+        now = (when or datetime.now()).timestamp()
+        blueprint = blueprint_for(record.get("quiz_id")) or STANDARD
+        outcomes: Dict[str, List[float]] = {}   # category -> [questions, score, time_spent]
+        with self._lock:
+            skills = self.users.setdefault(user_id, {})
+            for q in record["details"]:
+                category = q.get("category") or "General"
+                spent = q.get("time_spent") or 0
+                usual = skills[category][2] if category in skills else 0.0
+                score = 0.0
+                if q.get("is_correct"):
+                    score = 0.5 if usual and spent > SLOW_FACTOR * usual else 1.0
+                o = outcomes.setdefault(category, [0, 0.0, 0])
+                o[0] += 1
+                o[1] += score
+                o[2] += spent
+            for category, (n, score, spent) in outcomes.items():
+                entry = skills.get(category)
+                rating, evidence = self._decayed(entry, now) if entry else (0.0, 0.0)
+                offset = LEVEL_OFFSETS[blueprint.level(category)] if category in TIERED_CATEGORIES else 0.0
+                k = max(MIN_K_FACTOR, K_FACTOR / math.sqrt(1 + evidence / 10))
+                rating += k * (score - n * _sigmoid(rating - offset))
+                rating = max(-MAX_RATING, min(MAX_RATING, rating))
+                avg_time = spent / n if not entry or not entry[2] else 0.8 * entry[2] + 0.2 * spent / n
+                skills[category] = [rating, evidence + n, avg_time, now]
+
+    def rebuild(self, store):
+        """Replays every user's stored history, oldest first; only needed when the sidecar file is missing."""
+        from storage import parse_key
+        with self._lock:
+            self.users = {}
+        for user_id in store.users():
+            for key, record in store.stream(user_id=user_id):
+                self.update(record, user_id, parse_key(key))
+        self.save()
+
+    # --- READS ---
+    def profile(self, user_id: str = "guest") -> Dict[str, Dict[str, Any]]:
+        """Current (decayed) rating per category, with the level an adaptive quiz would use."""
+        now = time.time()
+        with self._lock:
+            skills = dict(self.users.get(user_id, {}))
+        out = {}
+        for category in GENERATOR_REGISTRY:
+            rating, evidence = self._decayed(skills[category], now) if category in skills else (0.0, 0.0)
+            out[category] = {
+                "rating": round(rating, 3),
+                "mastery": round(_sigmoid(rating), 3),
+                "evidence": round(evidence, 2),
+                "level": _level(rating) if category in TIERED_CATEGORIES else None
+            }
+        return out
+
+    def blueprint(self, user_id: str = "guest", total: Optional[int] = None) -> Blueprint:
+        """
+        An adaptive blueprint: weaker categories get more of the `total`
+        questions (default: the standard quiz's size), and each ranged
+        category is set to the level closest to TARGET_SUCCESS.
+        """
+        total = total or sum(STANDARD.counts.values())
+        profile = self.profile(user_id)
+        weights = {c: 0.25 + 1 - p["mastery"] for c, p in profile.items()}
+        return _adaptive_blueprint(tuple(_allocate(weights, total).items()),
+                                   tuple((c, p["level"]) for c, p in profile.items() if p["level"]))
+
+    # --- PERSISTENCE ---
+    def load(self) -> bool:
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return False
+        with self._lock:
+            self.users = data["users"]
+        return True
+
+    def save(self):
+        with self._lock:
+            data = json.dumps({"users": self.users}, separators=(",", ":"))
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+
+def _level(rating: float) -> str:
+    return min(LEVEL_OFFSETS, key=lambda level: abs(_sigmoid(rating - LEVEL_OFFSETS[level]) - TARGET_SUCCESS))
+
+def _allocate(weights: Dict[str, float], total: int) -> Dict[str, int]:
+    """Splits `total` questions in proportion to `weights` (largest remainder), MIN_SHARE each where possible."""
+    floor = MIN_SHARE if total >= MIN_SHARE * len(weights) else 0
+    spare = total - floor * len(weights)
+    scale = spare / sum(weights.values())
+    shares = {c: floor + int(w * scale) for c, w in weights.items()}
+    by_remainder = sorted(weights, key=lambda c: math.modf(weights[c] * scale)[0], reverse=True)
+    for c in by_remainder[:total - sum(shares.values())]:
+        shares[c] += 1
+    return {c: n for c, n in shares.items() if n}
+
+@lru_cache(maxsize=1024)
+def _adaptive_blueprint(counts: Tuple[Tuple[str, int], ...], levels: Tuple[Tuple[str, str], ...]) -> Blueprint:
+    # Counts and levels are discrete, so users with similar profiles share one blueprint.
+    return Blueprint('adaptive', counts=dict(counts), levels=dict(levels))
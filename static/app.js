@@ -89,81 +89,50 @@ function stopTimer(idx) {
     if (timers[idx]) { clearInterval(timers[idx]); timers[idx] = null; }
 }
 
-// --- 5. GRADING & SUBMISSION LOGIC ---
-
-function checkAnswer(idx, userAns) {
-    const q = questions[idx];
-    if (!isValidAnswer(userAns)) return false;
-
-    if (q.type === 'single') {
-        return Math.abs(Number(userAns) - Number(q.correct_answer)) < 0.01;
-    } else if (q.type === 'dual') {
-        return (Number(userAns.quotient) === q.correct_answer.quotient && Number(userAns.remainder) === q.correct_answer.remainder);
-    } else if (q.type === 'text') {
-        if (q.question_text.includes('prime factors')) {
-            let ans = q.correct_answer.split(',').map(x => x.trim()).filter(x => x).sort((a, b) => a - b);
-            let user = userAns.split(',').map(x => x.trim()).filter(x => x).sort((a, b) => a - b);
-            return (ans.length === user.length && ans.every((v, i) => v == user[i]));
-        } else if (q.question_text.includes('fraction')) {
-            return (userAns.replace(/\s/g, '') === q.correct_answer.replace(/\s/g, ''));
-        }
-        return userAns.trim() === q.correct_answer;
-    }
-    return false;
-}
+// --- 5. SUBMISSION & RESULTS ---
+// Grading happens on the server against the quiz's own answer key; the page only renders the verdicts.
 
 async function submitQuiz() {
-    let score = 0;
-    let detailsPayload = [];
+    let answersPayload = [];
 
     for (let i = 0; i < questions.length; i++) {
-        results[i] = checkAnswer(i, userAnswers[i]);
-        if (results[i]) score++;
-
-        detailsPayload.push({
+        answersPayload.push({
             question_id: questions[i].id,
-            question_text: questions[i].question_text,
-            question_type: questions[i].type,
-            category: questions[i].category || "General", // <--- NEW: PASSING CATEGORY
             user_answer: userAnswers[i] === null ? "No Answer" : userAnswers[i],
-            correct_answer: questions[i].correct_answer,
-            is_correct: results[i],
             time_spent: times[i]
         });
     }
 
-    let totalTime = times.reduce((a, b) => a + b, 0);
-    let percentage = (score / questions.length) * 100;
-
-    const fullPayload = {
-        summary: {
-            score_obtained: score,
-            total_questions: questions.length,
-            percentage: parseFloat(percentage.toFixed(2)),
-            total_time_seconds: totalTime
-        },
-        details: detailsPayload
-    };
-
+    let graded;
     try {
         const response = await fetch('/api/submit', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(fullPayload)
+            body: JSON.stringify({ quiz_id: quizId, user_id: userId, details: answersPayload })
         });
 
-        if (response.ok) {
-            const data = await response.json();
-            console.log("Quiz saved successfully. Key:", data.key);
-        } else {
+        if (!response.ok) {
             console.error("Server Error:", response.statusText);
             alert("Error saving quiz! Check console for details.");
+            return;
         }
+        graded = await response.json();
+        console.log("Quiz saved successfully. Key:", graded.key);
 
     } catch (error) {
         console.error("Network Error:", error);
         alert("Could not connect to server to save results.");
+        return;
+    }
+
+    const verdicts = new Map(graded.results.map(r => [r.question_id, r]));
+    for (let i = 0; i < questions.length; i++) {
+        const r = verdicts.get(questions[i].id);
+        results[i] = r ? r.is_correct : false;
+        if (r) questions[i].correct_answer = r.correct_answer;
     }
+    const score = graded.summary.score_obtained;
+    const totalTime = graded.summary.total_time_seconds;
 
     document.getElementById('quiz-form').classList.add('d-none');
     document.getElementById('result-area').classList.remove('d-none');
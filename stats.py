@@ -0,0 +1,216 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+TREND_LENGTH = int(os.getenv("STATS_TREND_LENGTH", "50"))
+REFRESH_SECONDS = float(os.getenv("STATS_REFRESH_SECONDS", "1.0"))
+
+
+class _Aggregates:
+    """One user's running totals."""
+
+    def __init__(self, trend_length: int):
+        self.count = 0
+        self.sum_percentage = 0.0
+        self.trend = deque(maxlen=trend_length)   # (key, percentage) of the latest attempts
+        self.categories: Dict[str, Dict[str, int]] = {}
+
+    def apply(self, key: str, record: Dict[str, Any]):
+        pct = record["summary"]["percentage"]
+        self.count += 1
+        self.sum_percentage += pct
+        self.trend.append((key, pct))
+        for q in record["details"]:
+            s = self.categories.setdefault(q.get("category") or "General", {"total": 0, "correct": 0, "time_spent": 0})
+            s["total"] += 1
+            s["correct"] += 1 if q.get("is_correct") else 0
+            s["time_spent"] += q.get("time_spent", 0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"count": self.count, "sum_percentage": self.sum_percentage,
+                "trend": list(self.trend), "categories": self.categories}
+
+    def restore(self, data: Dict[str, Any]):
+        self.count = data["count"]
+        self.sum_percentage = data["sum_percentage"]
+        self.trend.extend(tuple(t) for t in data["trend"])
+        self.categories = data["categories"]
+
+
+class DashboardStats:
+    """
+    Running aggregates behind /api/stats, one set per user. Updated once
+    per written batch and persisted to a small sidecar file, so serving
+    the dashboard never touches the raw history. Each user's aggregates
+    also remember the store's change token they match (see each backend's
+    change_token). The writer reads it around its own appends
+    (before_write/written), so only a token moved by another worker
+    costs a replay of that user's history; refresh() looks for such
+    moves at most every `refresh_interval` seconds per user. A store
+    without a change token can't show other workers' writes, so it only
+    suits a single worker.
+    """
+
+    def __init__(self, path: str = "stats.json", trend_length: int = TREND_LENGTH,
+                 refresh_interval: float = REFRESH_SECONDS):
+        self.path = path
+        self.trend_length = trend_length
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self.users: Dict[str, _Aggregates] = {}
+        self.tokens: Dict[str, str] = {}           # user_id -> change token (as JSON) the user's aggregates match
+        self._checked: Dict[str, float] = {}       # user_id -> when refresh() last read the token
+        self._before: Dict[str, Optional[str]] = {}  # tokens just before the write in progress
+        self._writes = 0                           # bumped by before_write; a replay spanning a write is dropped
+        self.replays = 0
+
+    def _user(self, user_id: str) -> _Aggregates:
+        aggregates = self.users.get(user_id)
+        if aggregates is None:
+            aggregates = self.users[user_id] = _Aggregates(self.trend_length)
+        return aggregates
+
+    # --- UPDATES ---
+    def update(self, key: str, record: Dict[str, Any], user_id: str = "guest", persist: bool = True):
+        """Folds one submission into the user's aggregates: O(questions in the attempt)."""
+        with self._lock:
+            self._user(user_id).apply(key, record)
+            if persist:
+                self._save()
+
+    def rebuild(self, store):
+        """Recomputes everything from the raw store, e.g. after a backfill or a bug fix; one user at a time."""
+        users, tokens = {}, {}
+        for user_id in store.users():
+            tokens[user_id] = _token(store.change_token(user_id))   # read first: a write during the replay just makes it stale
+            users[user_id] = self._replay(store, user_id)
+        with self._lock:
+            self.users = users
+            self.tokens = {user_id: token for user_id, token in tokens.items() if token is not None}
+            self._save()
+
+    def before_write(self, store, user_ids):
+        """Writer thread, right before appending: notes each user's token, to tell our append from others'."""
+        with self._lock:
+            self._writes += 1
+        self._before = {user_id: _token(store.change_token(user_id)) for user_id in user_ids}
+
+    def written(self, store, batch):
+        """
+        Writer thread, once `batch` is appended. A user whose token matched
+        their aggregates before the write gets the new attempts folded in,
+        O(questions); anyone else's history changed in between as well, so
+        it is replayed.
+        """
+        rows: Dict[str, list] = {}
+        for key, record, user_id in batch:
+            rows.setdefault(user_id, []).append((key, record))
+        for user_id, attempts in rows.items():
+            token = _token(store.change_token(user_id))
+            before = self._before.get(user_id)
+            with self._lock:
+                current = token is None or (before is not None and self.tokens.get(user_id) == before)
+                if current:
+                    aggregates = self._user(user_id)
+                    for key, record in attempts:
+                        aggregates.apply(key, record)
+                    if token is not None:
+                        self.tokens[user_id] = token
+            if not current:
+                aggregates = self._replay(store, user_id)
+                with self._lock:
+                    self.users[user_id] = aggregates
+                    self.tokens[user_id] = token
+        self._before = {}
+
+    def refresh(self, store, user_id: str = "guest"):
+        """Replays the user's history if another worker has changed it since their aggregates last matched it."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked.get(user_id, float("-inf")) < self.refresh_interval:
+                return
+            self._checked[user_id] = now
+            writes = self._writes
+        token = _token(store.change_token(user_id))
+        if token is None:
+            return
+        with self._lock:
+            if self.tokens.get(user_id) == token:
+                return
+        aggregates = self._replay(store, user_id)
+        if _token(store.change_token(user_id)) != token:
+            return   # written to during the replay; the next refresh tries again
+        with self._lock:
+            if self._writes != writes:
+                return   # our writer appended meanwhile and has settled this user itself
+            self.users[user_id] = aggregates
+            self.tokens[user_id] = token
+
+    def _replay(self, store, user_id: str) -> _Aggregates:
+        self.replays += 1
+        aggregates = _Aggregates(self.trend_length)
+        for key, record in store.stream(user_id=user_id):
+            aggregates.apply(key, record)
+        return aggregates
+
+    # --- PERSISTENCE ---
+    def load(self) -> bool:
+        """Restores the sidecar file. Returns False if there is nothing usable to restore."""
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return False
+        # Files from before per-user stats hold a single set of totals: guest's.
+        per_user = data["users"] if "users" in data else {"guest": data}
+        with self._lock:
+            self.users = {}
+            for user_id, totals in per_user.items():
+                self._user(user_id).restore(totals)
+            self.tokens = data.get("tokens", {})
+        return True
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"users": {user_id: a.to_dict() for user_id, a in self.users.items()}, "tokens": self.tokens},
+                      f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    # --- READS ---
+    def snapshot(self, user_id: str = "guest") -> Dict[str, Any]:
+        with self._lock:
+            a = self.users.get(user_id) or _Aggregates(0)
+            return {
+                "count": a.count,
+                "average_percentage": round(a.sum_percentage / a.count, 2) if a.count else 0.0,
+                "last_percentage": a.trend[-1][1] if a.trend else None,
+                # Labelled by the minute part of the attempt key, DD-MM-YY-HH-MM.
+                "trend": {"labels": [k[:14] for k, _ in a.trend], "scores": [p for _, p in a.trend]},
+                "categories": {cat: dict(s) for cat, s in a.categories.items()}
+            }
+
+
+def _token(value: Any) -> Optional[str]:
+    # Tokens are tuples in memory but lists once saved; compare them as JSON.
+    return None if value is None else json.dumps(value)
+
+
+if __name__ == "__main__":
+    import sys
+    from storage import open_store
+
+    if len(sys.argv) < 2 or sys.argv[1] != "rebuild":
+        print("Usage: python stats.py rebuild")
+        sys.exit(1)
+    stats = DashboardStats()
+    stats.rebuild(open_store())
+    print(f"Rebuilt {stats.path} from {sum(a.count for a in stats.users.values())} attempts "
+          f"by {len(stats.users)} users.")
@@ -0,0 +1,808 @@
+import base64
+import json
+import os
+import re
+import secrets
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:   # not POSIX: no cross-process file locks, so run a single server process
+    fcntl = None
+
+KEY_FORMAT = "%d-%m-%y-%H-%M"                   # legacy attempt keys: one per minute, so they could collide
+ATTEMPT_KEY_FORMAT = KEY_FORMAT + "-%S-%f"      # current keys add seconds, microseconds and a random suffix
+STREAM_BATCH = 200   # attempts fetched per round trip by stream()
+
+# User ids name partitions and shard files, so they are restricted to characters safe in both.
+USER_ID_PATTERN = r"^[A-Za-z0-9][A-Za-z0-9_.@-]{0,63}$"
+_USER_ID = re.compile(USER_ID_PATTERN)
+
+
+def attempt_key(when: Optional[datetime] = None, suffix: Optional[str] = None) -> str:
+    """A new attempt id, DD-MM-YY-HH-MM-SS-ffffff-<suffix>: unique even for submits in the same microsecond."""
+    return (when or datetime.now()).strftime(ATTEMPT_KEY_FORMAT) + "-" + (suffix or secrets.token_hex(4))
+
+
+def parse_key(key: str) -> Optional[datetime]:
+    """Attempt keys start with a DD-MM-YY-HH-MM[-SS-ffffff] timestamp; anything else has no time."""
+    try:
+        if len(key) > 14:
+            return datetime.strptime(key[:24], ATTEMPT_KEY_FORMAT)
+        return datetime.strptime(key, KEY_FORMAT)
+    except (TypeError, ValueError):
+        return None
+
+
+def check_user_id(user_id: str) -> str:
+    if not isinstance(user_id, str) or not _USER_ID.match(user_id):
+        raise ValueError(f"Invalid user id: {user_id!r}")
+    return user_id
+
+
+def encode_cursor(position: Any) -> str:
+    """Opaque, URL-safe pagination cursor."""
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Any:
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise ValueError("Invalid cursor")
+
+
+def summary_only(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Projection used by fields=summary: drops the per-question details (and their inline SVG)."""
+    return {"summary": record["summary"]}
+
+
+class StoreBusy(RuntimeError):
+    """Raised by append() when a backend's write buffer is full; the caller should retry later."""
+
+
+class ResultsStore:
+    """
+    Storage interface for quiz attempts. Backends must implement append()
+    and load(); the query helpers below fall back to scanning load() and
+    should be overridden by backends that can push them into the database.
+    Every read is scoped to one user's history (user_id, "guest" by default).
+    """
+
+    def append(self, key: str, record: Dict[str, Any], user_id: str = "guest"):
+        raise NotImplementedError
+
+    def append_many(self, rows):
+        """Appends (key, record, user_id) tuples; backends override this to write them in one go."""
+        for key, record, user_id in rows:
+            self.append(key, record, user_id)
+
+    def load(self, user_id: str = "guest") -> Dict[str, Any]:
+        """Returns { key: { "summary": ..., "details": ... } } oldest first."""
+        raise NotImplementedError
+
+    def users(self) -> List[str]:
+        """Every user with stored history; for rebuilds and exports that walk all of it."""
+        return ["guest"]
+
+    def change_token(self, user_id: str = "guest") -> Any:
+        """Cheap value that changes whenever the user's stored history does (None if the backend can't tell)."""
+        return None
+
+    def warm(self):
+        """Does now whatever slow setup the backend would otherwise do on first use (scans, connections)."""
+
+    def flush(self):
+        """Forces batched or buffered writes to durable storage; a no-op for backends that write through."""
+
+    def query(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+              category: Optional[str] = None, user_id: str = "guest") -> Dict[str, Any]:
+        """Attempts submitted in [since, until), optionally only those touching a category."""
+        out = {}
+        for key, record in self.load(user_id).items():
+            if not _in_window(parse_key(key), since, until):
+                continue
+            if category and not any(q.get("category") == category for q in record["details"]):
+                continue
+            out[key] = record
+        return out
+
+    def page(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+             cursor: Optional[str] = None, limit: int = 50,
+             summary: bool = False, user_id: str = "guest") -> Tuple[Dict[str, Any], Optional[str]]:
+        """
+        One page of attempts, oldest first. Returns (items, next_cursor);
+        next_cursor is None on the last page. The cursor is the key of the
+        last attempt returned, so pages stay stable while new attempts arrive.
+        """
+        keys = list(self.query(since, until, user_id=user_id).items())
+        start = 0
+        if cursor:
+            last_key = decode_cursor(cursor)
+            if not isinstance(last_key, str):
+                raise ValueError("Invalid cursor")
+            start = next((i + 1 for i, (k, _) in enumerate(keys) if k == last_key), len(keys))
+        chunk = keys[start:start + limit]
+        items = {k: summary_only(r) if summary else r for k, r in chunk}
+        has_more = start + limit < len(keys)
+        return items, encode_cursor(chunk[-1][0]) if has_more and chunk else None
+
+    def stream(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+               summary: bool = False, batch_size: int = STREAM_BATCH,
+               user_id: str = "guest") -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Yields (key, record) oldest first, fetched a page of `batch_size` at
+        a time, so a caller that serializes them one by one holds at most
+        one page in memory however large the window is.
+        """
+        cursor = None
+        while True:
+            items, cursor = self.page(since, until, cursor, batch_size, summary, user_id)
+            yield from items.items()
+            if cursor is None:
+                return
+
+    def summary_stats(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                      user_id: str = "guest") -> Dict[str, Any]:
+        """Attempt count, average percentage and total time over a window."""
+        attempts = self.query(since, until, user_id=user_id)
+        count = len(attempts)
+        pct = sum(r["summary"]["percentage"] for r in attempts.values())
+        secs = sum(r["summary"]["total_time_seconds"] for r in attempts.values())
+        return {"count": count, "avg_percentage": pct / count if count else 0.0, "total_time_seconds": secs}
+
+    def category_stats(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                       user_id: str = "guest") -> Dict[str, Dict[str, int]]:
+        """Per-category { total, correct, time_spent } over a window."""
+        stats: Dict[str, Dict[str, int]] = {}
+        for record in self.query(since, until, user_id=user_id).values():
+            for q in record["details"]:
+                s = stats.setdefault(q.get("category", "General"), {"total": 0, "correct": 0, "time_spent": 0})
+                s["total"] += 1
+                s["correct"] += 1 if q.get("is_correct") else 0
+                s["time_spent"] += q.get("time_spent", 0)
+        return stats
+
+    def close(self):
+        pass
+
+
+def _stat_token(path: str) -> Optional[Tuple[int, int, int]]:
+    # Appends from any process change size and mtime; a compaction (a replaced file) changes the inode.
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+def _in_window(ts: Optional[datetime], since: Optional[datetime], until: Optional[datetime]) -> bool:
+    if since is None and until is None:
+        return True
+    if ts is None:
+        return False
+    return (since is None or ts >= since) and (until is None or ts < until)
+
+
+class JsonlResultsStore(ResultsStore):
+    """
+    Append-only results store. Every submission is one compact JSON line,
+    so a submit costs O(1) no matter how much history exists. One log
+    holds one user's history (ShardedJsonlStore keeps a log per user), so
+    the user_id arguments are accepted for the interface and ignored.
+
+    Several processes (server workers, the compact CLI) may share a log:
+    appends and compactions hold an flock on it, every append first
+    indexes what other processes wrote, and a log replaced by another
+    process's compaction is reopened and reindexed.
+    """
+
+    def __init__(self, path: str = "results.jsonl", legacy_path: Optional[str] = "results.json",
+                 fsync_batch: int = 16, fsync_interval: float = 1.0, compact_ratio: float = 1.0):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.fsync_batch = fsync_batch          # fsync after this many appends...
+        self.fsync_interval = fsync_interval    # ...or after this many seconds, whichever comes first
+        self.compact_ratio = compact_ratio      # compact once dead lines exceed live records * ratio
+        self._lock = threading.Lock()
+        self._index: Dict[str, Any] = {}        # key -> latest record, in the order keys were first written
+        self._offset = 0                        # bytes of the log already parsed into _index
+        self._inode = None                      # which file _index and _offset describe
+        self._dead = 0                          # superseded or corrupt lines still on disk
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        self._fh = None
+        self._opened = False                    # the log is migrated and recovered on first use, not here
+
+    def warm(self):
+        with self._lock:
+            self._open()
+
+    def _open(self):
+        if not self._opened:
+            if not os.path.exists(self.path) and self.legacy_path and os.path.exists(self.legacy_path):
+                self._import_legacy()
+            self._recover()
+            self._opened = True
+
+    # --- RECOVERY ---
+    def recover(self):
+        """
+        Scans the log from the start. A torn final line (crash mid-write) is
+        truncated away; unparseable lines in the middle are skipped and left
+        for the next compaction.
+        """
+        with self._lock:
+            self._opened = False
+            self._open()
+
+    def _recover(self):
+        self._close_handle()
+        self._index = {}
+        self._offset = 0
+        self._dead = 0
+        self._inode = None
+        if not os.path.exists(self.path):
+            return
+        with self._file_lock() as fh:   # locked, so an incomplete last line is torn, not another writer's
+            self._scan_tail()
+            if self._offset < os.path.getsize(self.path):
+                fh.truncate(self._offset)
+                os.fsync(fh.fileno())
+
+    def _scan(self) -> int:
+        """Parses new lines from self._offset into the index. Returns the end of the last complete line."""
+        end = self._offset
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # torn write, stop before it
+                end += len(line)
+                try:
+                    entry = json.loads(line)
+                    key = entry.pop("key")
+                except (ValueError, KeyError, AttributeError):
+                    self._dead += 1
+                    continue
+                if key in self._index:
+                    self._dead += 1   # the latest write wins but keeps the key's first position, e.g. after a regrade
+                self._index[key] = entry
+        return end
+
+    def _import_legacy(self):
+        """One-time migration of the old pretty-printed results.json dict."""
+        try:
+            with open(self.legacy_path, "r") as f:
+                legacy = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        if isinstance(legacy, dict):
+            self._rewrite(legacy)
+
+    # --- WRITES ---
+    def append(self, key: str, record: Dict[str, Any], user_id: str = "guest"):
+        self.append_many([(key, record, user_id)])
+
+    def append_many(self, rows):
+        """Appends (key, record, user_id) tuples with a single write; fsync follows the usual batching."""
+        lines = [(key, record, (json.dumps({"key": key, **record}, separators=(",", ":")) + "\n").encode("utf-8"))
+                 for key, record, _ in rows]
+        with self._lock:
+            self._open()
+            with self._file_lock() as fh:
+                self._scan_tail()   # other processes' appends first, so the index keeps write order
+                fh.write(b"".join(line for _, _, line in lines))
+                fh.flush()
+                self._offset = fh.tell()
+            self._pending += len(lines)
+            if self._pending >= self.fsync_batch or time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+            for key, record, _ in lines:
+                if key in self._index:
+                    self._dead += 1
+                self._index[key] = record
+            needs_compaction = self._dead > max(64, len(self._index) * self.compact_ratio)
+        if needs_compaction:
+            self.compact()
+
+    def flush(self):
+        """Forces any batched appends to disk."""
+        with self._lock:
+            if self._fh and self._pending:
+                self._sync()
+
+    def compact(self):
+        """
+        Rewrites the log with only the latest record per key, atomically.
+        Safe while servers are appending: they wait on the lock, then see
+        the replaced file and reopen it.
+        """
+        with self._lock:
+            self._open()
+            with self._file_lock():
+                self._scan_tail()
+                self._rewrite(self._index)
+            self._close_handle()   # still open on the replaced file
+            self._dead = 0
+
+    def _rewrite(self, records: Dict[str, Any]):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for key, record in records.items():
+                f.write(json.dumps({"key": key, **record}, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        st = os.stat(self.path)
+        self._inode, self._offset = st.st_ino, st.st_size
+
+    def close(self):
+        with self._lock:
+            self._close_handle()
+
+    # --- READS ---
+    def load(self, user_id: str = "guest") -> Dict[str, Any]:
+        """
+        Returns { key: { "summary": ..., "details": ... } } in submission order.
+        Only lines appended since the previous read are parsed.
+        """
+        with self._lock:
+            self._open()
+            if os.path.exists(self.path):
+                self._scan_tail()
+            return dict(self._index)
+
+    def stream(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+               summary: bool = False, batch_size: int = STREAM_BATCH,
+               user_id: str = "guest") -> Iterator[Tuple[str, Dict[str, Any]]]:
+        # Records are already in memory, so walk a snapshot of the index rather than paging through query().
+        with self._lock:
+            self._open()
+            if os.path.exists(self.path):
+                self._scan_tail()
+            entries = list(self._index.items())
+        for key, record in entries:
+            if _in_window(parse_key(key), since, until):
+                yield key, summary_only(record) if summary else record
+
+    def change_token(self, user_id: str = "guest") -> Any:
+        return _stat_token(self.path)
+
+    def _scan_tail(self):
+        """Indexes lines appended since the last read, by this process or another; reindexes a replaced log."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if st.st_ino != self._inode or st.st_size < self._offset:
+            self._index, self._offset, self._dead, self._inode = {}, 0, 0, st.st_ino
+        if st.st_size > self._offset:
+            self._offset = self._scan()
+
+    # --- INTERNALS ---
+    def _handle(self):
+        if self._fh is None:
+            self._fh = open(self.path, "ab")
+        return self._fh
+
+    @contextmanager
+    def _file_lock(self):
+        """
+        Holds the cross-process lock on the log and yields the append handle.
+        A handle left on a file another process has since compacted away is
+        reopened first, so writes never land in the unlinked copy.
+        """
+        while True:
+            fh = self._handle()
+            if fcntl is None:
+                yield fh
+                return
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+            try:
+                current = os.stat(self.path).st_ino
+            except FileNotFoundError:
+                current = None
+            if current == os.fstat(fh.fileno()).st_ino:
+                break
+            fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+            self._close_handle()
+        try:
+            yield fh
+        finally:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+    def _sync(self):
+        os.fsync(self._fh.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def _close_handle(self):
+        if self._fh is not None:
+            if self._pending:
+                self._sync()
+            self._fh.close()
+            self._fh = None
+
+
+class ShardedJsonlStore(ResultsStore):
+    """
+    JSONL storage with one log per user: guest keeps `path` (so existing
+    history stays where it is) and every other user gets
+    <shard_dir>/<user_id>.jsonl. A read opens and indexes only that
+    user's log, so it costs in proportion to their own history rather
+    than everyone's, and an append touches only the writer's shard.
+    """
+
+    def __init__(self, path: str = "results.jsonl", shard_dir: Optional[str] = None,
+                 legacy_path: Optional[str] = "results.json", **options):
+        self.path = path
+        self.shard_dir = shard_dir or os.path.splitext(path)[0] + ".users"
+        self.legacy_path = legacy_path
+        self.options = options                  # passed on to each shard's JsonlResultsStore
+        self._lock = threading.Lock()
+        self._shards: Dict[str, JsonlResultsStore] = {}
+
+    def shard_path(self, user_id: str) -> str:
+        if user_id == "guest":
+            return self.path
+        return os.path.join(self.shard_dir, check_user_id(user_id) + ".jsonl")
+
+    def shard(self, user_id: str, create: bool = False) -> JsonlResultsStore:
+        """The user's log. Users without one get a throwaway empty store unless `create`, so reads never add shards."""
+        with self._lock:
+            store = self._shards.get(user_id)
+            if store is None:
+                path = self.shard_path(user_id)
+                legacy_path = self.legacy_path if user_id == "guest" else None
+                if not create and not os.path.exists(path) and not (legacy_path and os.path.exists(legacy_path)):
+                    return JsonlResultsStore(path, legacy_path=None, **self.options)
+                if user_id != "guest":
+                    os.makedirs(self.shard_dir, exist_ok=True)
+                store = self._shards[user_id] = JsonlResultsStore(path, legacy_path=legacy_path, **self.options)
+            return store
+
+    def _open_shards(self) -> List[JsonlResultsStore]:
+        with self._lock:
+            return list(self._shards.values())
+
+    def users(self) -> List[str]:
+        legacy = self.legacy_path and os.path.exists(self.legacy_path)
+        users = ["guest"] if legacy or os.path.exists(self.path) else []
+        try:
+            names = sorted(os.listdir(self.shard_dir))
+        except FileNotFoundError:
+            names = []
+        users.extend(name[:-len(".jsonl")] for name in names if name.endswith(".jsonl"))
+        return users
+
+    def warm(self):
+        self.shard("guest").warm()   # other users' shards open on their first request
+
+    # --- WRITES ---
+    def append(self, key: str, record: Dict[str, Any], user_id: str = "guest"):
+        self.append_many([(key, record, user_id)])
+
+    def append_many(self, rows):
+        """One append_many() per user in the batch."""
+        by_user: Dict[str, list] = {}
+        for row in rows:
+            by_user.setdefault(row[2], []).append(row)
+        for user_id, user_rows in by_user.items():
+            self.shard(user_id, create=True).append_many(user_rows)
+
+    def flush(self):
+        for store in self._open_shards():
+            store.flush()
+
+    def compact(self):
+        for user_id in self.users():
+            self.shard(user_id).compact()
+
+    def recover(self):
+        for user_id in self.users():
+            self.shard(user_id).recover()
+
+    def close(self):
+        for store in self._open_shards():
+            store.close()
+
+    # --- READS ---
+    def load(self, user_id: str = "guest") -> Dict[str, Any]:
+        return self.shard(user_id).load()
+
+    def query(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+              category: Optional[str] = None, user_id: str = "guest") -> Dict[str, Any]:
+        return self.shard(user_id).query(since, until, category)
+
+    def page(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+             cursor: Optional[str] = None, limit: int = 50,
+             summary: bool = False, user_id: str = "guest") -> Tuple[Dict[str, Any], Optional[str]]:
+        return self.shard(user_id).page(since, until, cursor, limit, summary)
+
+    def stream(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+               summary: bool = False, batch_size: int = STREAM_BATCH,
+               user_id: str = "guest") -> Iterator[Tuple[str, Dict[str, Any]]]:
+        return self.shard(user_id).stream(since, until, summary, batch_size)
+
+    def summary_stats(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                      user_id: str = "guest") -> Dict[str, Any]:
+        return self.shard(user_id).summary_stats(since, until)
+
+    def category_stats(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                       user_id: str = "guest") -> Dict[str, Dict[str, int]]:
+        return self.shard(user_id).category_stats(since, until)
+
+    def change_token(self, user_id: str = "guest") -> Any:
+        return _stat_token(self.shard_path(user_id))
+
+
+class SqliteResultsStore(ResultsStore):
+    """
+    Embedded SQLite backend (WAL mode). Attempts and per-question results
+    live in normalized tables so range and aggregate queries run in SQL;
+    every read is scoped to one user through the (user_id, submitted_at)
+    index, so it only visits that user's rows.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS attempts (
+        key TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL DEFAULT 'guest',
+        submitted_at TEXT NOT NULL DEFAULT '',  -- ISO timestamp, '' when the key has no time
+        score_obtained INTEGER NOT NULL,
+        total_questions INTEGER NOT NULL,
+        percentage REAL NOT NULL,
+        total_time_seconds INTEGER NOT NULL,
+        quiz_id TEXT                            -- quiz descriptor, NULL for attempts from before descriptors
+    );
+    CREATE TABLE IF NOT EXISTS question_results (
+        attempt_key TEXT NOT NULL REFERENCES attempts(key) ON DELETE CASCADE,
+        position INTEGER NOT NULL,
+        question_id INTEGER NOT NULL,
+        question_text TEXT NOT NULL,
+        question_type TEXT NOT NULL,
+        category TEXT NOT NULL,
+        user_answer TEXT,
+        correct_answer TEXT,
+        is_correct INTEGER NOT NULL,
+        time_spent INTEGER NOT NULL,
+        PRIMARY KEY (attempt_key, position)
+    );
+    CREATE TABLE IF NOT EXISTS user_versions (     -- bumped on every write, the per-user change token
+        user_id TEXT PRIMARY KEY,
+        version INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_attempts_submitted_at ON attempts(submitted_at);
+    CREATE INDEX IF NOT EXISTS idx_attempts_user ON attempts(user_id, submitted_at);
+    CREATE INDEX IF NOT EXISTS idx_question_results_category ON question_results(category, attempt_key);
+    """
+
+    def __init__(self, path: str = "results.db", legacy_path: Optional[str] = "results.json"):
+        self.path = path
+        self.legacy_path = legacy_path
+        self._lock = threading.Lock()
+        self._conn = None                       # connected, migrated and legacy-imported on first use, not here
+
+    def warm(self):
+        with self._lock:
+            self._open()
+
+    def _open(self):
+        """Called with _lock held."""
+        if self._conn is not None:
+            return
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.executescript(self.SCHEMA)
+            if "quiz_id" not in {row[1] for row in conn.execute("PRAGMA table_info(attempts)")}:
+                conn.execute("ALTER TABLE attempts ADD COLUMN quiz_id TEXT")   # databases from before the column
+            empty = conn.execute("SELECT COUNT(*) FROM attempts").fetchone()[0] == 0
+            if empty and self.legacy_path and os.path.exists(self.legacy_path):
+                try:
+                    with open(self.legacy_path, "r") as f:
+                        legacy = json.load(f)
+                except (OSError, json.JSONDecodeError):
+                    legacy = {}
+                with conn:
+                    self._insert(conn, [(key, record, "guest") for key, record in legacy.items()])
+        except Exception:
+            conn.close()
+            raise
+        self._conn = conn
+
+    # --- WRITES ---
+    def append(self, key: str, record: Dict[str, Any], user_id: str = "guest"):
+        self.append_many([(key, record, user_id)])
+
+    def append_many(self, rows):
+        """Inserts (key, record, user_id) tuples in a single transaction."""
+        with self._lock:
+            self._open()
+            with self._conn:
+                self._insert(self._conn, rows)
+
+    @staticmethod
+    def _insert(conn, rows):
+        for key, record, user_id in rows:
+            summary = record["summary"]
+            ts = parse_key(key)
+            # An upsert, not delete + insert: a rewritten attempt keeps its rowid and so its place in history.
+            conn.execute("DELETE FROM question_results WHERE attempt_key = ?", (key,))
+            conn.execute(
+                "INSERT INTO attempts VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(key) DO UPDATE SET "
+                "user_id = excluded.user_id, submitted_at = excluded.submitted_at, "
+                "score_obtained = excluded.score_obtained, total_questions = excluded.total_questions, "
+                "percentage = excluded.percentage, total_time_seconds = excluded.total_time_seconds, "
+                "quiz_id = excluded.quiz_id",
+                (key, user_id, ts.isoformat() if ts else "", summary["score_obtained"],
+                 summary["total_questions"], summary["percentage"], summary["total_time_seconds"],
+                 record.get("quiz_id")))
+            conn.executemany(
+                "INSERT INTO question_results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(key, pos, q["question_id"], q["question_text"], q["question_type"],
+                  q.get("category", "General"), json.dumps(q.get("user_answer")),
+                  json.dumps(q.get("correct_answer")), int(bool(q["is_correct"])), q["time_spent"])
+                 for pos, q in enumerate(record["details"])])
+        conn.executemany(
+            "INSERT INTO user_versions VALUES (?, 1) ON CONFLICT(user_id) DO UPDATE SET version = version + 1",
+            [(user_id,) for user_id in {user_id for _, _, user_id in rows}])
+
+    # --- READS ---
+    def load(self, user_id: str = "guest") -> Dict[str, Any]:
+        return self.query(user_id=user_id)
+
+    def users(self) -> List[str]:
+        with self._lock:
+            self._open()
+            return [row[0] for row in self._conn.execute("SELECT DISTINCT user_id FROM attempts ORDER BY user_id")]
+
+    def query(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+              category: Optional[str] = None, user_id: str = "guest") -> Dict[str, Any]:
+        where, params = self._window(since, until, user_id)
+        if category:
+            where.append("a.key IN (SELECT attempt_key FROM question_results WHERE category = ?)")
+            params.append(category)
+        with self._lock:
+            self._open()
+            return self._fetch(where, params)[0]
+
+    def page(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+             cursor: Optional[str] = None, limit: int = 50,
+             summary: bool = False, user_id: str = "guest") -> Tuple[Dict[str, Any], Optional[str]]:
+        # Keyset pagination on (submitted_at, rowid), which the (user_id, submitted_at) index serves directly.
+        where, params = self._window(since, until, user_id)
+        if cursor:
+            position = decode_cursor(cursor)
+            if not (isinstance(position, list) and len(position) == 2 and isinstance(position[0], str)
+                    and type(position[1]) is int):
+                raise ValueError("Invalid cursor")
+            last_ts, last_rowid = position
+            where.append("(a.submitted_at, a.rowid) > (?, ?)")
+            params.extend([last_ts, last_rowid])
+        with self._lock:
+            self._open()
+            items, last = self._fetch(where, params, limit=limit + 1, summary=summary)
+        if len(items) <= limit:
+            return items, None
+        items.popitem()
+        return items, encode_cursor(last[-2])
+
+    def _fetch(self, where, params, limit: Optional[int] = None, summary: bool = False):
+        """Runs the attempts query (and the details query unless summary) under the caller's lock."""
+        clause = f"WHERE {' AND '.join(where)}" if where else ""
+        limit_clause = f"LIMIT {int(limit)}" if limit is not None else ""
+        attempts = self._conn.execute(
+            f"SELECT a.key, a.score_obtained, a.total_questions, a.percentage, a.total_time_seconds, "
+            f"a.submitted_at, a.rowid, a.quiz_id FROM attempts a {clause} "
+            f"ORDER BY a.submitted_at, a.rowid {limit_clause}", params).fetchall()
+
+        out = {}
+        positions = []
+        for key, score, total, pct, secs, ts, rowid, quiz_id in attempts:
+            out[key] = {
+                "summary": {"score_obtained": score, "total_questions": total,
+                            "percentage": pct, "total_time_seconds": secs}
+            }
+            if not summary:
+                out[key]["details"] = []
+                if quiz_id:
+                    out[key]["quiz_id"] = quiz_id
+            positions.append([ts, rowid])
+        if summary or not out:
+            return out, positions
+
+        details = self._conn.execute(
+            f"SELECT q.attempt_key, q.question_id, q.question_text, q.question_type, q.category, "
+            f"q.user_answer, q.correct_answer, q.is_correct, q.time_spent "
+            f"FROM question_results q WHERE q.attempt_key IN (SELECT value FROM json_each(?)) "
+            f"ORDER BY q.attempt_key, q.position", (json.dumps(list(out)),)).fetchall()
+        for key, qid, text, qtype, cat, user_ans, correct_ans, ok, spent in details:
+            out[key]["details"].append({
+                "question_id": qid, "question_text": text, "question_type": qtype, "category": cat,
+                "user_answer": json.loads(user_ans), "correct_answer": json.loads(correct_ans),
+                "is_correct": bool(ok), "time_spent": spent
+            })
+        return out, positions
+
+    def change_token(self, user_id: str = "guest") -> Any:
+        # Per user, so one user's write leaves everyone else's cached history and stats valid.
+        with self._lock:
+            self._open()
+            row = self._conn.execute("SELECT version FROM user_versions WHERE user_id = ?", (user_id,)).fetchone()
+        return row[0] if row else 0
+
+    def summary_stats(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                      user_id: str = "guest") -> Dict[str, Any]:
+        where, params = self._window(since, until, user_id)
+        clause = f"WHERE {' AND '.join(where)}" if where else ""
+        with self._lock:
+            self._open()
+            count, avg, secs = self._conn.execute(
+                f"SELECT COUNT(*), AVG(percentage), SUM(total_time_seconds) FROM attempts a {clause}", params).fetchone()
+        return {"count": count, "avg_percentage": avg or 0.0, "total_time_seconds": secs or 0}
+
+    def category_stats(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                       user_id: str = "guest") -> Dict[str, Dict[str, int]]:
+        where, params = self._window(since, until, user_id)
+        clause = f"WHERE {' AND '.join(where)}" if where else ""
+        with self._lock:
+            self._open()
+            rows = self._conn.execute(
+                f"SELECT q.category, COUNT(*), SUM(q.is_correct), SUM(q.time_spent) "
+                f"FROM question_results q JOIN attempts a ON a.key = q.attempt_key {clause} "
+                f"GROUP BY q.category", params).fetchall()
+        return {cat: {"total": total, "correct": correct, "time_spent": spent} for cat, total, correct, spent in rows}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    @staticmethod
+    def _window(since: Optional[datetime], until: Optional[datetime], user_id: str):
+        where, params = ["a.user_id = ?"], [user_id]
+        if since is not None:
+            where.append("a.submitted_at >= ?")
+            params.append(since.isoformat())
+        if until is not None:
+            where.append("a.submitted_at < ?")
+            params.append(until.isoformat())
+        return where, params
+
+
+def open_store(backend: Optional[str] = None) -> ResultsStore:
+    """Builds the store named by `backend` or the RESULTS_BACKEND env var (jsonl, sqlite, cosmos)."""
+    backend = (backend or os.getenv("RESULTS_BACKEND", "jsonl")).lower()
+    if backend == "jsonl":
+        return ShardedJsonlStore("results.jsonl", legacy_path="results.json")
+    if backend == "sqlite":
+        return SqliteResultsStore("results.db", legacy_path="results.json")
+    if backend == "cosmos":
+        from db_client import db_manager
+        return db_manager
+    raise ValueError(f"Unknown results backend: {backend}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ("compact", "recover"):
+        print("Usage: python storage.py [compact|recover] [path]")
+        sys.exit(1)
+    store = ShardedJsonlStore(sys.argv[2] if len(sys.argv) > 2 else "results.jsonl")
+    if sys.argv[1] == "compact":
+        store.compact()
+    else:
+        store.recover()
+    users = store.users()
+    print(f"{store.path} + {store.shard_dir}/: {sum(len(store.load(u)) for u in users)} attempts, {len(users)} users")
@@ -1,74 +1,207 @@
+"""
+Synthetic quiz history for capacity testing.
+
+Streams realistic attempts (real generators, categories and question types;
+per-user, per-category skill that improves over time) into any results
+backend, a chunk at a time, so memory stays flat however many are written.
+
+    python testRes.py                                  # 15 attempts into results.jsonl
+    python testRes.py -n 100000 --users 50             # guest's in results.jsonl, the rest in results.users/
+    python testRes.py -n 1000000 --users 500 --backend sqlite
+    python testRes.py -n 5000 --backend json --path results.json
+    python testRes.py -n 100000 --backend cosmos-fake  # exercises the Cosmos write path only
+
+Run `python stats.py rebuild` afterwards to refresh the dashboard aggregates.
+"""
+import argparse
 import json
-import random
+import math
+import os
+import time
 from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, Tuple
+
+import numpy as np
+
+from batch import generate_batch
+from blueprints import BLUEPRINTS, GENERATOR_REGISTRY
+from storage import ShardedJsonlStore, attempt_key
+
+CATEGORIES = list(GENERATOR_REGISTRY)
+CHUNK_SIZE = 2000
+MAX_OPEN_SHARDS = 256   # write_jsonl closes its shard files past this many users
+
+# Typical seconds per question, by category; actual times are log-normal around these.
+_TYPICAL_SECONDS = {'Geometry': 40, 'Data Interpretation': 45, 'Logical Reasoning': 35, 'Data Sufficiency': 50,
+                    'Profit & Loss': 30, 'Unitary Method': 30, 'Factors': 25, 'Division': 20}
+
+
+# --- SYNTHETIC ATTEMPTS ---
+def _wrong_answer(answer: Any, rng: np.random.Generator) -> Any:
+    """A plausible mistake of the same shape as the right answer."""
+    if isinstance(answer, dict):
+        return {'quotient': str(answer['quotient'] + int(rng.integers(1, 3))), 'remainder': str(answer['remainder'])}
+    if isinstance(answer, float):
+        return str(round(answer * 1.1 + 1, 2))
+    if isinstance(answer, int) or (isinstance(answer, str) and answer.lstrip('-').isdigit()):
+        return str(int(answer) + int(rng.choice([-10, -1, 1, 10])))
+    if ',' in answer:
+        return answer.rsplit(',', 1)[0]   # forgot the last prime factor
+    return "I don't know"
+
+def synthetic_attempts(n: int, users: int = 1, seed: int = 0, blueprint: str = 'standard',
+                       chunk_size: int = CHUNK_SIZE) -> Iterator[Tuple[str, Dict[str, Any], str]]:
+    """
+    Yields n (key, record, user_id) rows, oldest first, one minute apart and
+    ending now. Each user has a base skill and a per-category skill; the
+    chance of a right answer grows with how far through the history we are.
+    """
+    rng = np.random.default_rng(seed)
+    user_ids = ['guest'] if users == 1 else [f"user-{u:05d}" for u in range(users)]
+    base_skill = rng.uniform(0.3, 0.85, len(user_ids))
+    category_skill = np.clip(base_skill[:, None] + rng.normal(0, 0.12, (len(user_ids), len(CATEGORIES))), 0.05, 0.97)
+    cat_index = {c: i for i, c in enumerate(CATEGORIES)}
+    start = datetime.now() - timedelta(minutes=n)
+
+    quizzes = generate_batch(n, BLUEPRINTS[blueprint], seed=seed, chunk_size=chunk_size)
+    for i, quiz in enumerate(quizzes):
+        user = int(rng.integers(len(user_ids)))
+        progress = i / max(1, n - 1)
+        cats = np.array([cat_index[q['category']] for q in quiz])
+        p = category_skill[user, cats]
+        p = p + (1 - p) * 0.35 * progress                  # everyone improves a little with practice
+        correct = (rng.random(len(quiz)) < p).tolist()
+        skipped = (rng.random(len(quiz)) < 0.04).tolist()
+        typical = np.array([_TYPICAL_SECONDS.get(q['category'], 15) for q in quiz])
+        spent = np.maximum(1, rng.lognormal(np.log(typical), 0.5)).astype(int).tolist()
+
+        details = []
+        for q, ok, skip, secs in zip(quiz, correct, skipped, spent):
+            ok = ok and not skip
+            user_answer = "No Answer" if skip else (q['correct_answer'] if ok else _wrong_answer(q['correct_answer'], rng))
+            details.append({
+                "question_id": q['id'], "question_text": q['question_text'], "question_type": q['type'],
+                "category": q['category'], "user_answer": user_answer, "correct_answer": q['correct_answer'],
+                "is_correct": ok, "time_spent": secs
+            })
+        score = sum(d["is_correct"] for d in details)
+        record = {
+            "summary": {
+                "score_obtained": score,
+                "total_questions": len(details),
+                "percentage": round(score / len(details) * 100, 2),
+                "total_time_seconds": sum(spent)
+            },
+            "details": details
+        }
+        yield attempt_key(start + timedelta(minutes=i), suffix=f"{i:08x}"), record, user_ids[user]
+
+
+# --- SINKS ---
+def write_json(rows, path: str) -> int:
+    """The legacy results.json dict, written entry by entry instead of built in memory; it has no users."""
+    count = 0
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("{")
+        for key, record, _ in rows:
+            f.write(("," if count else "") + "\n" + json.dumps(key) + ":" + json.dumps(record, separators=(",", ":")))
+            count += 1
+        f.write("\n}\n")
+    os.replace(tmp_path, path)
+    return count
+
+def write_jsonl(rows, path: str) -> int:
+    """
+    Appends in the JsonlResultsStore line format directly, into the
+    per-user files ShardedJsonlStore reads; the store itself would index
+    every record in memory.
+    """
+    shards = ShardedJsonlStore(path, legacy_path=None)
+    files = {}
+    count = 0
+    try:
+        for key, record, user_id in rows:
+            f = files.get(user_id)
+            if f is None:
+                if len(files) >= MAX_OPEN_SHARDS:
+                    for f in files.values():
+                        f.close()
+                    files.clear()
+                shard_path = shards.shard_path(user_id)
+                os.makedirs(os.path.dirname(shard_path) or ".", exist_ok=True)
+                f = files[user_id] = open(shard_path, "a", encoding="utf-8")
+            f.write(json.dumps({"key": key, **record}, separators=(",", ":")) + "\n")
+            count += 1
+    finally:
+        for f in files.values():
+            f.close()
+    return count
+
+class _CountingContainer:
+    """Stands in for a Cosmos container: accepts batches, keeps only counts."""
+
+    def __init__(self):
+        self.documents = 0
+        self.batches = 0
+
+    async def execute_item_batch(self, batch_operations, partition_key):
+        self.batches += 1
+        self.documents += len(batch_operations)
+
+def open_sink(backend: str, path: str = None):
+    from storage import SqliteResultsStore
+    if backend == "sqlite":
+        return SqliteResultsStore(path or "results.db", legacy_path=None)
+    if backend == "cosmos":
+        from db_client import db_manager
+        return db_manager
+    if backend == "cosmos-fake":
+        from db_client import CosmosDBManager
+        return CosmosDBManager(container=_CountingContainer())
+    raise ValueError(f"Unknown backend: {backend}")
+
+def write_store(rows, store, chunk_size: int = CHUNK_SIZE) -> int:
+    """Appends rows a chunk at a time; write-behind stores are flushed per chunk so their queue never fills."""
+    chunk_size = min(chunk_size, getattr(store, "queue_size", chunk_size))
+    count = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            count += _write_chunk(store, chunk)
+            chunk = []
+    if chunk:
+        count += _write_chunk(store, chunk)
+    store.close()
+    return count
+
+def _write_chunk(store, chunk) -> int:
+    store.append_many(chunk)
+    if hasattr(store, "flush"):
+        store.flush()
+    return len(chunk)
 
-def generate_dummy_data():
-    data = {}
-    # Start from 5 days ago
-    base_time = datetime.now() - timedelta(days=5)
-    
-    # The new categories we added to math_utils.py
-    categories = ['Algebra', 'Arithmetic', 'Number Theory', 'Fractions & %']
-    
-    # Simulate 5 days
-    for day in range(5):
-        # 3 tests per day (Morning, Afternoon, Evening)
-        times = [
-            (9, 30),  # 9:30 AM
-            (14, 15), # 2:15 PM
-            (19, 45)  # 7:45 PM
-        ]
-        
-        for hour, minute in times:
-            # 1. Create Timestamp Key (DD-MM-YY-HH-MM)
-            current_date = base_time + timedelta(days=day)
-            timestamp = current_date.replace(hour=hour, minute=minute)
-            key = timestamp.strftime("%d-%m-%y-%H-%M")
-            
-            # 2. Simulate Progressive Improvement
-            # Day 0: ~40% correct, Day 4: ~90% correct
-            base_score = 4 + day 
-            score = min(10, base_score + random.randint(0, 2)) 
-            
-            # 3. Generate Dummy Details
-            details = []
-            for q_id in range(1, 11):
-                # Determine if this specific question is "correct" based on the total score
-                is_correct = q_id <= score
-                
-                # Pick a random category to populate the Radar Chart
-                cat = random.choice(categories)
-                
-                details.append({
-                    "question_id": random.randint(100000, 999999),
-                    "question_text": f"Simulated {cat} Question {q_id}",
-                    "question_type": "single",
-                    "category": cat,  # <--- CRITICAL UPDATE FOR RADAR CHART
-                    "user_answer": "42",
-                    "correct_answer": "42" if is_correct else "99",
-                    "is_correct": is_correct,
-                    "time_spent": random.randint(5, 45)
-                })
-
-            # 4. Construct Summary
-            entry = {
-                "summary": {
-                    "score_obtained": score,
-                    "total_questions": 10,
-                    "percentage": float(score * 10),
-                    "total_time_seconds": random.randint(180, 400)
-                },
-                "details": details
-            }
-            
-            data[key] = entry
-
-    # Write to file
-    with open("results.json", "w") as f:
-        json.dump(data, f, indent=4)
-    
-    print(f"Successfully generated results.json with {len(data)} entries.")
-    print("Refresh your Dashboard to see the new Skill Radar!")
 
 if __name__ == "__main__":
-    generate_dummy_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Write synthetic quiz history to a results backend.")
+    parser.add_argument("-n", "--attempts", type=int, default=15)
+    parser.add_argument("--users", type=int, default=1, help="1 writes everything as 'guest'")
+    parser.add_argument("--backend", default="jsonl", choices=["json", "jsonl", "sqlite", "cosmos", "cosmos-fake"])
+    parser.add_argument("--path", help="output file (default: the backend's usual file)")
+    parser.add_argument("--blueprint", default="standard", choices=sorted(BLUEPRINTS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    rows = synthetic_attempts(args.attempts, args.users, args.seed, args.blueprint, args.chunk)
+    if args.backend == "json":
+        written = write_json(rows, args.path or "results.json")
+    elif args.backend == "jsonl":
+        written = write_jsonl(rows, args.path or "results.jsonl")
+    else:
+        written = write_store(rows, open_sink(args.backend, args.path), args.chunk)
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {written} attempts for {args.users} user(s) to {args.backend} "
+          f"in {elapsed:.1f}s ({written / elapsed if elapsed else math.inf:.0f}/s).")
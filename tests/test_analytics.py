@@ -0,0 +1,25 @@
+from fastapi.testclient import TestClient
+
+from analytics import HistoryColumns, export_history
+from storage import attempt_key
+
+
+def test_submit_rejects_an_out_of_range_time_spent():
+    import main
+
+    for spent in (-1, 2 ** 32):
+        response = TestClient(main.app).post("/api/submit", json={
+            "quiz_id": "0" * 32, "details": [{"question_id": 1, "time_spent": spent}]})
+        assert response.status_code == 422
+
+
+def test_export_clamps_times_stored_before_the_bound(tmp_path):
+    details = [{"category": "Algebra", "question_type": "single", "is_correct": True, "time_spent": spent}
+               for spent in (-5, 2 ** 40, 7)]
+    record = {"summary": {"score_obtained": 3, "total_questions": 3, "percentage": 100.0,
+                          "total_time_seconds": -5 + 2 ** 40 + 7}, "details": details}
+    path = str(tmp_path / "history.cols")
+    export_history([(attempt_key(), record, "guest")], path)
+    history = HistoryColumns(path)
+    assert history.questions["time_spent"].tolist() == [0, 2 ** 32 - 1, 7]
+    assert history.attempts["total_time_seconds"].tolist() == [2 ** 32 - 1]
@@ -0,0 +1,55 @@
+import pytest
+
+import blueprints
+from blueprints import blueprint_from_params, encode_descriptor, generate_quiz, new_seed
+from grading import grade_submission
+from skills import _adaptive_blueprint
+
+
+def _fresh_process(monkeypatch):
+    # What a restarted server, or another worker, knows: only the named blueprints, and no caches.
+    monkeypatch.setattr(blueprints, "_KNOWN", {})
+    blueprints._render_quiz.cache_clear()
+    blueprints.blueprint_from_spec.cache_clear()
+
+
+@pytest.mark.parametrize("blueprint", [
+    blueprint_from_params(None, "Division,Geometry", 5),
+    blueprint_from_params(None, None, 2, "Addition:3,Division:1", 20, "hard"),
+    blueprint_from_params("arithmetic", difficulty="hard"),
+    _adaptive_blueprint((("Addition", 3), ("Factors", 2)), (("Addition", "hard"), ("Factors", "easy"))),
+])
+def test_non_standard_quiz_grades_in_a_fresh_process(monkeypatch, blueprint):
+    quiz_id = encode_descriptor(new_seed(), blueprint)
+    questions = generate_quiz(quiz_id)
+    _fresh_process(monkeypatch)
+
+    record = grade_submission(quiz_id, [{"question_id": q["id"], "user_answer": q["correct_answer"]}
+                                        for q in questions])
+    assert record["summary"]["percentage"] == 100.0
+    assert [d["question_text"] for d in record["details"]] == [q["question_text"] for q in questions]
+    assert blueprints.blueprint_for(quiz_id).to_dict() == blueprint.to_dict()
+
+
+def test_tampered_spec_is_rejected():
+    quiz_id = encode_descriptor(new_seed(), blueprint_from_params(None, "Division", 5))
+    other = blueprint_from_params(None, "Division", 6)
+    with pytest.raises(ValueError):
+        generate_quiz(quiz_id.split(".")[0] + "." + other.spec())
+    with pytest.raises(ValueError):
+        generate_quiz(quiz_id + "x")
+
+
+@pytest.mark.parametrize("weights", ["Addition:nan", "Addition:inf", "Addition:-1,Division:2",
+                                     "Addition:1e308,Division:1e308"])
+def test_bad_weights_are_rejected(weights):
+    with pytest.raises(ValueError):
+        blueprint_from_params(None, None, 2, weights, 5)
+
+
+def test_quiz_route_answers_400_for_bad_weights():
+    from fastapi.testclient import TestClient
+    from main import app
+
+    response = TestClient(app).get("/quiz", params={"weights": "Addition:nan", "total": 5})
+    assert response.status_code == 400
@@ -0,0 +1,93 @@
+import json
+
+from db_client import CosmosDBManager
+from storage import attempt_key
+
+
+class _CosmosError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.headers = {}
+
+
+class _FakeContainer:
+    """Rejects documents with a "bad" summary (400) and throttles the first `throttle` calls (429)."""
+
+    def __init__(self, throttle=0):
+        self.throttle = throttle
+        self.docs = {}
+
+    def _check(self, docs):
+        if self.throttle:
+            self.throttle -= 1
+            raise _CosmosError(429)
+        if any(doc["summary"] == "bad" for doc in docs):
+            raise _CosmosError(400)
+
+    async def execute_item_batch(self, batch_operations, partition_key):
+        docs = [args[0] for _, args in batch_operations]
+        self._check(docs)
+        self.docs.update((doc["id"], doc) for doc in docs)
+
+    async def upsert_item(self, body):
+        self._check([body])
+        self.docs[body["id"]] = body
+
+    def query_items(self, query, parameters, partition_key=None, **kwargs):
+        docs = [d for d in self.docs.values() if d["user_id"] == partition_key]
+        return _AsyncList(docs)
+
+
+class _AsyncList:
+    def __init__(self, items):
+        self.items = list(items)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.items:
+            raise StopAsyncIteration
+        return self.items.pop(0)
+
+
+def test_rejected_documents_are_dead_lettered_and_do_not_block_the_queue(tmp_path):
+    container = _FakeContainer(throttle=2)
+    store = CosmosDBManager(container=container, flush_interval=60, dead_letter_path=str(tmp_path / "dead.jsonl"))
+    good = {"summary": {"percentage": 100}, "details": []}
+    keys = [attempt_key(suffix=f"{i:08x}") for i in range(3)]
+    try:
+        store.append(keys[0], good)
+        store.append(keys[1], {"summary": "bad", "details": []})
+        store.append(keys[2], good)
+        store.flush()
+        assert store.pending() == 0
+        assert set(container.docs) == {keys[0], keys[2]}
+        assert [json.loads(line)["document"]["id"] for line in open(tmp_path / "dead.jsonl")] == [keys[1]]
+    finally:
+        store.close()
+
+
+def test_reads_still_answer_while_writes_fail(tmp_path):
+    container = _FakeContainer(throttle=10 ** 6)   # throttled for good: writes never succeed
+    store = CosmosDBManager(container=container, flush_interval=60, max_retries=0,
+                            dead_letter_path=str(tmp_path / "dead.jsonl"))
+    try:
+        store.append(attempt_key(), {"summary": {"percentage": 100}, "details": []})
+        assert store.load() == {}
+        assert store.pending() == 1   # kept for the next attempt, not dropped
+    finally:
+        container.throttle = 0
+        store.close()
+
+
+def test_quiz_id_round_trips(tmp_path):
+    store = CosmosDBManager(container=_FakeContainer(), flush_interval=60, dead_letter_path=str(tmp_path / "dead.jsonl"))
+    record = {"quiz_id": "0" * 32, "summary": {"percentage": 100}, "details": []}
+    key = attempt_key()
+    try:
+        store.append(key, record)
+        assert store.load() == {key: record}
+    finally:
+        store.close()
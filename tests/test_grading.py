@@ -0,0 +1,58 @@
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+import pytest
+
+from storage import ShardedJsonlStore, SqliteResultsStore, attempt_key
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+
+def test_regrade_cli_rebuilds_skills(tmp_path):
+    # Graded wrong under older rules: "5.0" is the same number as "5".
+    details = [{"question_id": 1, "question_type": "single", "category": "Algebra", "question_text": "Solve for x",
+                "correct_answer": "5", "user_answer": "5.0", "is_correct": False, "time_spent": 3}]
+    record = {"summary": {"score_obtained": 0, "total_questions": 1, "percentage": 0.0, "total_time_seconds": 3},
+              "details": details}
+    store = ShardedJsonlStore(str(tmp_path / "results.jsonl"), legacy_path=None)
+    store.append_many([(attempt_key(), record, "guest")])
+    store.close()
+    (tmp_path / "skills.json").write_text(json.dumps({"users": {"guest": {"Algebra": [-0.4, 1, 3, 0]}}}))
+
+    subprocess.run([sys.executable, os.path.join(ROOT, "grading.py"), "regrade"], cwd=tmp_path, check=True,
+                   env={**os.environ, "RESULTS_BACKEND": "jsonl"}, capture_output=True)
+
+    skills = json.loads((tmp_path / "skills.json").read_text())["users"]
+    assert skills["guest"]["Algebra"][0] > 0
+    assert json.loads((tmp_path / "stats.json").read_text())
+
+
+@pytest.mark.parametrize("backend", ["jsonl", "sqlite"])
+def test_regrade_keeps_history_order(tmp_path, backend):
+    def attempt(answer):
+        details = [{"question_id": 1, "question_type": "single", "category": "Algebra", "question_text": "Solve for x",
+                    "correct_answer": "5", "user_answer": answer, "is_correct": answer == "5", "time_spent": 3}]
+        score = int(answer == "5")
+        return {"summary": {"score_obtained": score, "total_questions": 1, "percentage": score * 100.0,
+                            "total_time_seconds": 3}, "details": details}
+
+    when = datetime.now()   # one timestamp: order then rests on the backend's own tie-break
+    keys = [attempt_key(when, suffix=f"{i:08x}") for i in range(3)]
+    store = ShardedJsonlStore(str(tmp_path / "results.jsonl"), legacy_path=None) if backend == "jsonl" \
+        else SqliteResultsStore(str(tmp_path / "results.db"), legacy_path=None)
+    store.append_many([(keys[0], attempt("5"), "guest"), (keys[1], attempt("5.0"), "guest"),
+                       (keys[2], attempt("4"), "guest")])
+    store.close()
+
+    subprocess.run([sys.executable, os.path.join(ROOT, "grading.py"), "regrade"], cwd=tmp_path, check=True,
+                   env={**os.environ, "RESULTS_BACKEND": backend}, capture_output=True)
+
+    history = store.load()
+    assert list(history) == keys
+    assert [r["summary"]["score_obtained"] for r in history.values()] == [1, 1, 0]
+    page, cursor = store.page(limit=2)
+    assert list(page) == keys[:2] and list(store.page(cursor=cursor, limit=2)[0]) == keys[2:]
+    store.close()
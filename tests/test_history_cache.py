@@ -0,0 +1,34 @@
+from history_cache import HistoryCache
+from storage import JsonlResultsStore, ResultsStore, attempt_key
+
+
+def _record(pct):
+    return {"summary": {"score_obtained": 1, "total_questions": 1, "percentage": pct, "total_time_seconds": 1},
+            "details": []}
+
+
+def test_another_workers_write_invalidates_the_cache(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    mine, theirs = JsonlResultsStore(path, legacy_path=None), JsonlResultsStore(path, legacy_path=None)
+    cache = HistoryCache(mine)
+    mine.append(attempt_key(), _record(10))
+    body, etag = cache.get("all", mine.load)
+    theirs.append(attempt_key(), _record(20))   # the other worker's write never calls our invalidate()
+    new_body, new_etag = cache.get("all", mine.load)
+    assert new_etag != etag and new_body != body
+
+
+def test_workers_never_share_etags(tmp_path):
+    store = JsonlResultsStore(str(tmp_path / "results.jsonl"), legacy_path=None)
+    store.append(attempt_key(), _record(10))
+    assert HistoryCache(store).get("all", store.load)[1] != HistoryCache(store).get("all", store.load)[1]
+
+
+def test_no_etag_without_a_change_token():
+    class Opaque(ResultsStore):
+        def load(self, user_id="guest"):
+            return {}
+
+    cache = HistoryCache(Opaque())
+    assert cache.get("all", dict)[1] is None
+    assert cache.etag(cache.version(), "all") is None
@@ -0,0 +1,13 @@
+from metrics import STORE_SECONDS, TimedStore
+from storage import JsonlResultsStore, attempt_key
+
+
+def test_stream_is_timed_once_per_iteration(tmp_path):
+    store = TimedStore(JsonlResultsStore(str(tmp_path / "results.jsonl"), legacy_path=None))
+    record = {"summary": {"score_obtained": 1, "total_questions": 1, "percentage": 100.0, "total_time_seconds": 1},
+              "details": []}
+    store.append_many([(attempt_key(suffix=f"{i:08x}"), record, "guest") for i in range(3)])
+    series = STORE_SECONDS.labels("JsonlResultsStore", "stream")
+    before = sum(series.counts)
+    assert len(list(store.stream())) == 3
+    assert sum(series.counts) == before + 1
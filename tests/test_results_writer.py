@@ -0,0 +1,74 @@
+import asyncio
+import json
+
+from results_writer import ResultsWriter
+from storage import JsonlResultsStore, ResultsStore, attempt_key
+
+
+def test_idle_writer_flushes_the_last_batch(tmp_path):
+    store = JsonlResultsStore(str(tmp_path / "results.jsonl"), legacy_path=None, fsync_batch=16, fsync_interval=60)
+    record = {"summary": {"score_obtained": 1, "total_questions": 1, "percentage": 100.0, "total_time_seconds": 1},
+              "details": []}
+
+    async def scenario():
+        writer = ResultsWriter(store, idle_flush=0.05)
+        task = asyncio.create_task(writer.run())
+        writer.submit(attempt_key(), record)
+        await writer.drain()
+        assert store._pending == 1     # below fsync_batch and inside fsync_interval
+        await asyncio.sleep(0.2)
+        task.cancel()
+
+    asyncio.run(scenario())
+    assert store._pending == 0
+
+
+class _PickyStore(ResultsStore):
+    """Rejects records marked "bad" for good, and fails with an I/O error for the first `flaky` writes."""
+
+    def __init__(self, flaky=0):
+        self.flaky = flaky
+        self.rows = []
+
+    def append_many(self, rows):
+        if self.flaky:
+            self.flaky -= 1
+            raise OSError("disk busy")
+        if any(record.get("bad") for _, record, _ in rows):
+            raise TypeError("Object of type set is not JSON serializable")
+        self.rows.extend(rows)
+
+
+def test_rejected_rows_are_dead_lettered_and_do_not_stall_the_writer(tmp_path):
+    store = _PickyStore(flaky=2)
+    dead = tmp_path / "dead.jsonl"
+    written = []
+
+    async def scenario():
+        writer = ResultsWriter(store, max_retries=3, dead_letter_path=str(dead), after_write=written.extend)
+        task = asyncio.create_task(writer.run())
+        for key, record in (("a", {}), ("b", {"bad": True}), ("c", {})):
+            writer.submit(key, record)
+        await asyncio.wait_for(writer.drain(), 5)
+        task.cancel()
+        return writer
+
+    writer = asyncio.run(scenario())
+    assert [key for key, _, _ in store.rows] == ["a", "c"] == [key for key, _, _ in written]
+    assert [json.loads(line)["key"] for line in dead.read_text().splitlines()] == ["b"]
+    assert writer.dead_lettered == 1
+
+
+def test_a_store_that_never_recovers_gives_up_after_max_retries(tmp_path):
+    store = _PickyStore(flaky=10 ** 6)
+    dead = tmp_path / "dead.jsonl"
+
+    async def scenario():
+        writer = ResultsWriter(store, max_retries=1, dead_letter_path=str(dead))
+        task = asyncio.create_task(writer.run())
+        writer.submit("a", {})
+        await asyncio.wait_for(writer.drain(), 5)
+        task.cancel()
+
+    asyncio.run(scenario())
+    assert [json.loads(line)["error"] for line in dead.read_text().splitlines()] == ["disk busy"]
@@ -0,0 +1,64 @@
+from stats import DashboardStats
+from storage import JsonlResultsStore, SqliteResultsStore, attempt_key
+
+
+def _record(pct):
+    return {"summary": {"score_obtained": 1, "total_questions": 1, "percentage": pct, "total_time_seconds": 1},
+            "details": []}
+
+
+def _write(stats, store, key, record, user_id="guest"):
+    # What the results writer does around each batch.
+    batch = [(key, record, user_id)]
+    stats.before_write(store, {user_id})
+    store.append_many(batch)
+    stats.written(store, batch)
+
+
+def test_own_writes_are_folded_in_without_a_replay(tmp_path):
+    store = JsonlResultsStore(str(tmp_path / "results.jsonl"), legacy_path=None)
+    stats = DashboardStats(str(tmp_path / "stats.json"), refresh_interval=0)
+    _write(stats, store, attempt_key(), _record(10))   # first write: nothing to match yet
+    replays = stats.replays
+    for pct in (20, 30, 40, 50, 60):
+        _write(stats, store, attempt_key(), _record(pct))
+        stats.refresh(store)
+    assert stats.replays == replays
+    assert stats.snapshot()["count"] == 6 and stats.snapshot()["average_percentage"] == 35.0
+
+
+def test_another_workers_write_reaches_the_aggregates(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    mine, theirs = JsonlResultsStore(path, legacy_path=None), JsonlResultsStore(path, legacy_path=None)
+    stats = DashboardStats(str(tmp_path / "stats.json"), refresh_interval=0)
+    _write(stats, mine, attempt_key(), _record(10))
+    theirs.append(attempt_key(), _record(30))   # never passes through our writer
+    stats.refresh(mine)
+    snapshot = stats.snapshot()
+    assert snapshot["count"] == 2 and snapshot["average_percentage"] == 20.0
+    _write(stats, mine, attempt_key(), _record(50))
+    theirs.append(attempt_key(), _record(70))
+    _write(stats, mine, attempt_key(), _record(90))   # their write landed since our last one: replayed
+    assert stats.snapshot()["count"] == 5 and stats.snapshot()["average_percentage"] == 50.0
+
+
+def test_sqlite_tokens_are_per_user(tmp_path):
+    store = SqliteResultsStore(str(tmp_path / "results.db"), legacy_path=None)
+    store.append(attempt_key(), _record(10), "ann")
+    token = store.change_token("ann")
+    store.append(attempt_key(), _record(20), "bob")
+    assert store.change_token("ann") == token
+    store.append(attempt_key(), _record(30), "ann")
+    assert store.change_token("ann") != token
+    store.close()
+
+
+def test_saved_tokens_spare_the_replay_after_a_restart(tmp_path, monkeypatch):
+    store = JsonlResultsStore(str(tmp_path / "results.jsonl"), legacy_path=None)
+    store.append(attempt_key(), _record(10))
+    DashboardStats(str(tmp_path / "stats.json")).rebuild(store)
+    restarted = DashboardStats(str(tmp_path / "stats.json"))
+    assert restarted.load()
+    monkeypatch.setattr(restarted, "_replay", None)   # any replay would fail
+    restarted.refresh(store)
+    assert restarted.snapshot()["count"] == 1
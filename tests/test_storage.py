@@ -0,0 +1,129 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from storage import JsonlResultsStore, ShardedJsonlStore, SqliteResultsStore, attempt_key, encode_cursor
+
+
+def _record(pct):
+    return {"summary": {"score_obtained": 1, "total_questions": 1, "percentage": pct, "total_time_seconds": 1},
+            "details": []}
+
+
+def test_jsonl_stores_sharing_a_log_see_each_others_appends(tmp_path):
+    # Two server workers: each opens its own store on the same file.
+    path = str(tmp_path / "results.jsonl")
+    a, b = JsonlResultsStore(path, legacy_path=None), JsonlResultsStore(path, legacy_path=None)
+    keys = [attempt_key(suffix=f"{i:08x}") for i in range(3)]
+    a.append(keys[0], _record(10))
+    b.append(keys[1], _record(20))
+    a.append(keys[2], _record(30))
+    assert list(a.load()) == keys
+    assert list(b.load()) == keys
+    assert a._dead == b._dead == 0
+
+
+def test_jsonl_compaction_by_another_process_is_picked_up(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    server, cli = JsonlResultsStore(path, legacy_path=None), JsonlResultsStore(path, legacy_path=None)
+    first, second = attempt_key(suffix="00000001"), attempt_key(suffix="00000002")
+    server.append(first, _record(10))
+    server.append(first, _record(15))   # superseded line, dropped by the compaction
+    cli.compact()
+    server.append(second, _record(20))  # the server's handle still points at the replaced file
+    assert list(JsonlResultsStore(path, legacy_path=None).load()) == [first, second]
+    assert server.load()[first]["summary"]["percentage"] == 15
+    assert list(cli.load()) == [first, second]
+
+
+
+def test_sqlite_store_touches_nothing_until_first_use(tmp_path):
+    legacy = tmp_path / "results.json"
+    legacy.write_text('{"%s": %s}' % (attempt_key(suffix="00000001"), json.dumps(_record(40))))
+    path = tmp_path / "results.db"
+    store = SqliteResultsStore(str(path), legacy_path=str(legacy))
+    assert not path.exists()
+    store.close()                       # closing a store that never opened is fine
+    assert [r["summary"]["percentage"] for r in store.load().values()] == [40]
+    store.close()
+
+
+# Not base64, base64 of a bare int ("MQ" is 1), and base64 of a list with the wrong shape.
+MALFORMED_CURSORS = ["***", "MQ", encode_cursor(["a", "b", "c"]), encode_cursor({"k": 1})]
+
+
+@pytest.fixture(params=["jsonl", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "jsonl":
+        store = ShardedJsonlStore(str(tmp_path / "results.jsonl"), legacy_path=None)
+    else:
+        store = SqliteResultsStore(str(tmp_path / "results.db"), legacy_path=None)
+    store.append_many([(attempt_key(suffix=f"{i:08x}"), _record(i), "guest") for i in range(5)])
+    yield store
+    store.close()
+
+
+def test_records_round_trip_with_their_quiz_id(store):
+    record = {"quiz_id": "0" * 32,
+              "summary": {"score_obtained": 1, "total_questions": 1, "percentage": 100.0, "total_time_seconds": 4},
+              "details": [{"question_id": 7, "question_text": "2 + 2", "question_type": "single", "category": "Addition",
+                           "user_answer": "4", "correct_answer": "4", "is_correct": True, "time_spent": 4}]}
+    key = attempt_key(suffix="ffffffff")
+    store.append(key, record)
+    assert store.load()[key] == record
+    assert dict(store.stream())[key] == record
+    assert store.page(limit=10)[0][key] == record
+
+
+@pytest.mark.parametrize("cursor", MALFORMED_CURSORS)
+def test_malformed_cursor_is_a_value_error(store, cursor):
+    with pytest.raises(ValueError):
+        store.page(cursor=cursor, limit=2)
+
+
+def test_history_route_answers_400_for_a_malformed_cursor(store, monkeypatch):
+    import main
+
+    monkeypatch.setattr(main.history_cache, "store", store)
+    monkeypatch.setattr(main, "results_store", store)
+    response = TestClient(main.app).get("/api/history", params={"limit": 3, "cursor": "MQ"})
+    assert response.status_code == 400
+
+
+class _BadTokenError(Exception):
+    status_code = 400   # what the SDK raises for a continuation token it can't parse
+
+
+class _FakePager:
+    def __init__(self, token):
+        self.token = token
+        self.continuation_token = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.token:
+            raise _BadTokenError("Invalid continuation token")
+        raise StopAsyncIteration
+
+
+class _FakeContainer:
+    def query_items(self, **kwargs):
+        return self
+
+    def by_page(self, token):
+        return _FakePager(token)
+
+
+def test_cosmos_malformed_cursor_is_a_value_error():
+    from db_client import CosmosDBManager
+
+    store = CosmosDBManager(container=_FakeContainer())
+    try:
+        assert store.page(limit=2) == ({}, None)
+        with pytest.raises(ValueError):
+            store.page(cursor="MQ", limit=2)
+    finally:
+        store.close()